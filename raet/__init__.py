@@ -5,7 +5,7 @@ raet modules
 __init__.py file for raet package
 '''
 
-__all__ = ['raeting', 'nacling', 'keeping', 'lotting', 'stacking', 'road', 'lane']
+__all__ = ['raeting', 'nacling', 'crcing', 'zipping', 'keeping', 'lotting', 'timing', 'stacking', 'driving', 'road', 'lane']
 
 import  importlib
 for m in __all__:
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+'''
+crcing.py raet protocol integrity check functions for the sha2 and crc foot
+and coat kinds
+
+These detect corruption only. Anyone can compute them so they do not
+authenticate the sender. Meant for trusted isolated networks.
+'''
+# pylint: skip-file
+# pylint: disable=W0611
+
+# Import python libs
+import struct
+import hashlib
+import binascii
+
+try:
+    import crcmod
+except ImportError:
+    crcmod = None
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+CRC16_PACKER = struct.Struct('>H')
+CRC64_PACKER = struct.Struct('>Q')
+
+CRC64_POLY = 0xC96C5795D7870F42 # ECMA-182 reflected as used by xz
+CRC64_MASK = 0xFFFFFFFFFFFFFFFF
+
+def crc16(msg):
+    '''
+    Returns 2 byte big endian CRC-16/XMODEM (CCITT polynomial) of msg
+    '''
+    return CRC16_PACKER.pack(binascii.crc_hqx(msg, 0))
+
+def _crc64Table():
+    '''
+    Returns list of 256 crc64 byte remainders
+    '''
+    table = []
+    for i in range(256):
+        crc = i
+        for j in range(8):
+            crc = (crc >> 1) ^ CRC64_POLY if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+CRC64_TABLE = _crc64Table()
+
+def _crc64(msg):
+    '''
+    Returns crc64 value of msg table driven in pure python
+    '''
+    table = CRC64_TABLE
+    crc = CRC64_MASK
+    for b in bytearray(msg):
+        crc = table[(crc ^ b) & 0xFF] ^ (crc >> 8)
+    return crc ^ CRC64_MASK
+
+if crcmod: # c extension is orders of magnitude faster than pure python
+    _crc64 = crcmod.mkCrcFun((1 << 64) | 0x42F0E1EBA9EA3693, # unreflected poly
+                             initCrc=0,
+                             rev=True,
+                             xorOut=CRC64_MASK)
+
+def crc64(msg):
+    '''
+    Returns 8 byte big endian CRC-64/XZ (ECMA-182) of msg
+    '''
+    return CRC64_PACKER.pack(_crc64(msg))
+
+def sha2(msg):
+    '''
+    Returns 32 byte SHA-256 digest of msg
+    '''
+    return hashlib.sha256(msg).digest()
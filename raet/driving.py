@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+'''
+driving.py raet protocol event driven stack servicing
+
+Driver waits on the server sockets of one or more stacks with epoll, or select
+where epoll is not available, and wakes when a socket is readable, when a
+blocked socket is writable again or when the next transaction or presence
+timer is due. It then services only the parts of the stacks that have work
+to do, including .manage of remote presence (keep alives and reaping).
+'''
+# pylint: skip-file
+# pylint: disable=W0611
+
+# Import python libs
+import select
+import errno
+import time
+
+# Import ioflo libs
+from ioflo.base.odicting import odict
+
+from . import raeting
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+class Driver(object):
+    '''
+    RAET protocol event driven servicer of one or more RoadStack or LaneStack
+
+    Replaces busy calling of .serviceAll on each stack. Each call to
+    .serviceOnce waits until there is something to do and then does only that.
+    When real is True the stack stores are advanced by real elapsed time.
+    '''
+    Timeout = 1.0 # default max seconds to wait when nothing is due
+
+    def __init__(self, stacks=None, timeout=None, real=True):
+        '''
+        Setup instance
+
+        stacks is sequence of stacks to service
+        timeout is max seconds to wait when no timer is due
+        real is True means advance the .store stamp of the stacks by real time
+        '''
+        self.timeout = timeout if timeout is not None else self.Timeout
+        self.real = real
+        self.stacks = odict() # stacks keyed by server socket fileno
+        self.masks = odict() # epoll event masks keyed by server socket fileno
+        self.poller = select.epoll() if hasattr(select, 'epoll') else None
+        self.stamp = None # real time of last advance of stack stores
+        for stack in (stacks or []):
+            self.add(stack)
+
+    def add(self, stack):
+        '''
+        Add stack to be serviced. Stack server must be open
+        '''
+        fileno = stack.server.ss.fileno()
+        if fileno in self.stacks:
+            emsg = "Stack '{0}' already driven".format(stack.name)
+            raise raeting.StackError(emsg)
+        self.stacks[fileno] = stack
+        self.masks[fileno] = select.EPOLLIN if self.poller else None
+        if self.poller:
+            self.poller.register(fileno, self.masks[fileno])
+
+    def remove(self, stack):
+        '''
+        Remove stack from being serviced
+        '''
+        for fileno, driven in self.stacks.items():
+            if driven is stack:
+                del self.stacks[fileno]
+                del self.masks[fileno]
+                if self.poller:
+                    self.poller.unregister(fileno)
+                return
+
+    def close(self):
+        '''
+        Release the poller. Does not close the stack servers
+        '''
+        if self.poller:
+            self.poller.close()
+            self.poller = None
+
+    def advance(self):
+        '''
+        Advance the stores of the driven stacks by real time elapsed since the
+        last advance. Stacks that share a store advance it only once.
+        '''
+        now = time.time()
+        if self.stamp is not None and self.real:
+            delta = now - self.stamp
+            stores = odict()
+            for stack in self.stacks.values():
+                stores[id(stack.store)] = stack.store
+            for store in stores.values():
+                store.advanceStamp(delta)
+        self.stamp = now
+
+    def wait(self, timeout):
+        '''
+        Wait up to timeout seconds on the server sockets
+        Returns duple (readables, writables) of filenos
+        '''
+        writers = [fileno for fileno, stack in self.stacks.items() if stack.txes]
+        try:
+            if self.poller:
+                for fileno in self.stacks:
+                    mask = select.EPOLLIN
+                    if fileno in writers:
+                        mask |= select.EPOLLOUT
+                    if mask != self.masks[fileno]:
+                        self.poller.modify(fileno, mask)
+                        self.masks[fileno] = mask
+                events = self.poller.poll(timeout)
+                readables = [fileno for fileno, event in events if event & select.EPOLLIN]
+                writables = [fileno for fileno, event in events if event & select.EPOLLOUT]
+            else:
+                readables, writables, errs = select.select(self.stacks.keys(),
+                                                          writers, [], timeout)
+        except (select.error, IOError) as ex: # py2 select.error is not OSError
+            if ex.args and ex.args[0] == errno.EINTR:
+                return ([], [])
+            raise
+        return (readables, writables)
+
+    def serviceOnce(self, timeout=None):
+        '''
+        Flush pending transmits, wait until a server socket is ready or the
+        next timer is due but no longer than timeout, then service receives,
+        timer based processing and transmits only of the stacks that need it.
+        '''
+        timeout = timeout if timeout is not None else self.timeout
+
+        for stack in self.stacks.values(): # flush anything queued since last time
+            if stack.txMsgs or stack.txes:
+                stack.serviceAllTx()
+
+        self.advance()
+        dues = odict() # seconds until timers due keyed by fileno
+        manages = odict() # seconds until presence timers due keyed by fileno
+        for fileno, stack in self.stacks.items():
+            remaining = stack.remaining()
+            if remaining is not None:
+                dues[fileno] = remaining
+                timeout = min(timeout, remaining)
+            remaining = stack.remainingManage()
+            if remaining is not None:
+                manages[fileno] = remaining
+                timeout = min(timeout, remaining)
+            if stack.rxes:
+                timeout = 0.0
+
+        start = self.stamp
+        readables, writables = self.wait(max(0.0, timeout))
+        self.advance()
+        elapsed = self.stamp - start
+
+        for fileno, stack in self.stacks.items():
+            received = False
+            if fileno in readables:
+                stack.serviceReceives()
+            if stack.rxes:
+                stack.serviceRxes()
+                received = True
+            if fileno in manages and manages[fileno] <= elapsed:
+                stack.manage()
+            if received or (fileno in dues and dues[fileno] <= elapsed):
+                stack.process()
+            if stack.txMsgs or stack.txes:
+                stack.serviceAllTx()
+
+    def service(self, duration):
+        '''
+        Call .serviceOnce repeatedly for duration seconds of real time
+        '''
+        end = time.time() + duration
+        while True:
+            remaining = end - time.time()
+            if remaining <= 0.0:
+                break
+            self.serviceOnce(timeout=min(self.timeout, remaining))
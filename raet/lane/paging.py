@@ -24,6 +24,11 @@ from ioflo.base.consoling import getConsole
 console = getConsole()
 
 from .. import raeting
+from .. import zipping
+
+# serialization pack kind keyed by compressed pack kind
+ZIPPED = {raeting.packKinds.zjson: raeting.packKinds.json,
+          raeting.packKinds.zpack: raeting.packKinds.pack, }
 
 class Part(object):
     '''
@@ -149,11 +154,12 @@ class TxBody(Body):
         '''
         self.packed = ''
         pk = self.page.data['pk']
+        sk = ZIPPED.get(pk, pk) # serialization kind
 
-        if pk == raeting.packKinds.json:
+        if sk == raeting.packKinds.json:
             if self.data:
                 self.packed = json.dumps(self.data, separators=(',', ':'))
-        elif pk == raeting.packKinds.pack:
+        elif sk == raeting.packKinds.pack:
             if self.data:
                 if not msgpack:
                     emsg = "Msgpack not installed."
@@ -164,6 +170,9 @@ class TxBody(Body):
             console.terse(emsg)
             raise raeting.PageError(emsg)
 
+        if pk in ZIPPED and self.packed:
+            self.packed = zipping.compress(self.packed)
+
         if self.size > raeting.MAX_MESSAGE_SIZE:
             emsg = "Packed message length of {0}, exceeds max of {1}".format(
                      self.size, raeting.MAX_MESSAGE_SIZE)
@@ -185,15 +194,25 @@ class RxBody(Body):
             emsg = "Unrecognizable page body."
             raise raeting.PageError(emsg)
 
+        packed = self.packed
+        if pk in ZIPPED:
+            if packed:
+                try:
+                    packed = zipping.decompress(packed)
+                except ValueError as ex:
+                    emsg = "Failed body decompression. {0}".format(ex)
+                    raise raeting.PageError(emsg)
+            pk = ZIPPED[pk]
+
         if pk == raeting.packKinds.json:
-            if self.packed:
-                self.data = json.loads(self.packed, object_pairs_hook=odict)
+            if packed:
+                self.data = json.loads(packed, object_pairs_hook=odict)
         elif pk == raeting.packKinds.pack:
-            if self.packed:
+            if packed:
                 if not msgpack:
                     emsg = "Msgpack not installed."
                     raise raeting.PacketError(emsg)
-                self.data = msgpack.loads(self.packed, object_pairs_hook=odict)
+                self.data = msgpack.loads(packed, object_pairs_hook=odict)
 
         if not isinstance(self.data, Mapping):
             emsg = "Message body not a mapping\n"
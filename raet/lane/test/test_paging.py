@@ -223,6 +223,47 @@ class BasicTestCase(unittest.TestCase):
         self.assertEqual(book1.data['si'], sid)
         self.assertEqual(book1.data['bi'], 1)
 
+    def testCompressedJson(self):
+        '''
+        Test compressed json pack kind pack and parse
+        '''
+        console.terse("{0}\n".format(self.testCompressedJson.__doc__))
+        data = odict(pk=raeting.packKinds.zjson)
+        sid = nacling.uuid(size=18)
+        data.update(odict(sn="boy", dn='girl', si=sid, bi=1))
+
+        body = odict([('content', "Hello all yards.")]) # below threshold
+        page0 = paging.TxPage(data=data, embody=body)
+        page0.pack()
+        self.assertEqual(page0.body.packed[0], chr(raeting.zipKinds.nada))
+        page1 = paging.RxPage(packed=page0.packed)
+        page1.parse()
+        self.assertDictEqual(page1.body.data, body)
+
+        stuff = []
+        for i in range(20000):
+            stuff.append("minion{0:04d}: True\n".format(i % 1000))
+        stuff = "".join(stuff)
+        self.assertTrue(len(stuff) > raeting.UXD_MAX_PACKET_SIZE)
+        body = odict([('content', stuff)])
+        book0 = paging.TxBook(data=data, body=body)
+        book0.pack()
+        self.assertEqual(book0.packed[0], chr(raeting.zipKinds.zlib))
+        self.assertTrue(len(book0.packed) < len(stuff) // 2)
+        self.assertEqual(len(book0.pages), 1)
+
+        book1 = paging.RxBook()
+        for page in book0.pages:
+            page = paging.RxPage(packed=page.packed)
+            page.head.parse() #parse head to get data
+            book1.parse(page)
+        self.assertDictEqual(book1.body, body)
+
+        # corrupt compressed body checksum
+        packed = book0.pages[0].packed
+        page = paging.RxPage(packed=packed[:-1] + chr(ord(packed[-1]) ^ 0xff))
+        self.assertRaises(raeting.PageError, page.parse)
+
 
 def runOne(test):
     '''
@@ -238,7 +279,8 @@ def runSome():
     names = ['testPackParseJson',
              'testPackParseMsgpack',
              'testSectionedJson',
-             'testSectionedMsgpack', ]
+             'testSectionedMsgpack',
+             'testCompressedJson', ]
     tests.extend(map(BasicTestCase, names))
 
     suite = unittest.TestSuite(tests)
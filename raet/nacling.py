@@ -6,7 +6,9 @@ nacling.py raet protocol nacl (crypto) management classes
 # Import python libs
 import sys
 import time
+import struct
 import binascii
+import ctypes
 import six
 import libnacl
 
@@ -438,11 +440,20 @@ class Verifier(object):
     def verify(self, signature, msg):
         '''
         Verify the message
+
+        msg is string or bytearray. A bytearray is verified in place without
+        copying when libnacl supports detached signatures
+        signature of wrong length is rejected before libnacl reads it
         '''
-        if not self.key:
+        if not self.key or len(signature) != libnacl.crypto_sign_BYTES:
             return False
         try:
-            self.key.verify(signature + msg)
+            if hasattr(libnacl, 'crypto_sign_verify_detached'):
+                if isinstance(msg, bytearray):
+                    msg = (ctypes.c_char * len(msg)).from_buffer(msg)
+                libnacl.crypto_sign_verify_detached(signature, msg, self.keyraw)
+            else:
+                self.key.verify(signature + bytes(msg))
         except ValueError:
             return False
         return True
@@ -468,10 +479,19 @@ class Publican(object):
             self.keyhex = ''
             self.keyraw = ''
 
+NONCE_COUNTER_PACKER = struct.Struct('!Q')  # trailing 8 bytes of nonce
+NONCE_COUNTER_MAX = (1 << 64) - 1
+
+# exceptions of failed decryption, later libnacl raises CryptError
+CRYPT_ERRORS = ((ValueError, libnacl.CryptError)
+                if hasattr(libnacl, 'CryptError') else (ValueError, ))
+
 class Privateer(object):
     '''
     Container for local nacl key pair
         .key is the private key
+        .noncePrefix is random per key leading bytes of generated nonces
+        .nonceCount is counter for trailing bytes of next generated nonce
     '''
     def __init__(self, key=None):
         if key:
@@ -487,13 +507,30 @@ class Privateer(object):
         self.keyraw = self.key.encode(encoding.RawEncoder)
         self.pubhex = self.key.public_key.encode(encoding.HexEncoder)
         self.pubraw = self.key.public_key.encode(encoding.RawEncoder)
+        self.renonce()
+
+    def renonce(self):
+        '''
+        Draw new random nonce prefix and restart nonce counter
+        '''
+        self.noncePrefix = libnacl.randombytes(Box.NONCE_SIZE -
+                                               NONCE_COUNTER_PACKER.size)
+        self.nonceCount = 0
 
     def nonce(self):
         '''
         Generate a safe nonce value (safe assuming only this method is used to
         create nonce values)
+        Random 16 byte prefix plus 8 byte big endian counter so no syscall per
+        nonce. Nonces are unique for the life of the key since the counter
+        never repeats under a prefix. Both ends of a session share the
+        box key but each draws its own prefix.
         '''
-        return libnacl.randombytes(Box.NONCE_SIZE)
+        if self.nonceCount > NONCE_COUNTER_MAX:
+            self.renonce()
+        nonce = self.noncePrefix + NONCE_COUNTER_PACKER.pack(self.nonceCount)
+        self.nonceCount += 1
+        return nonce
 
     def encrypt(self, msg, pubkey, enhex=False):
         '''
@@ -543,6 +580,79 @@ class Privateer(object):
         return box.decrypt(cipher, nonce, decoder)
 
 
+class Boxer(object):
+    '''
+    Container for precomputed shared key Box between local Privateer and
+    remote public key. The Curve25519 key agreement (crypto_box_beforenm) is done
+    once at creation so encrypt/decrypt only do crypto_box_afternm
+        .box is the Box with precomputed shared key
+        .privateer is the local Privateer used to generate nonces
+        .authkey is session authenticator key derived from the shared key
+    '''
+    def __init__(self, privateer, pubkey):
+        if not isinstance(pubkey, PublicKey):
+            if len(pubkey) == 32:
+                pubkey = PublicKey(pubkey, encoding.RawEncoder)
+            else:
+                pubkey = PublicKey(pubkey, encoding.HexEncoder)
+        self.privateer = privateer
+        self.box = Box(privateer.key, pubkey)
+        # keyed hash so authenticator key is independent of encryption key
+        self.authkey = libnacl.crypto_generichash(b'raet session auth',
+                                                  key=bytes(self.box))
+
+    def auth(self, msg):
+        '''
+        Return session authenticator (HMAC-SHA512-256) of msg
+        Either end of the session can compute it so it is not a signature
+
+        msg is string
+        '''
+        return libnacl.crypto_auth(msg, self.authkey)
+
+    def verify(self, authenticator, msg):
+        '''
+        Return True if authenticator of msg is valid for session else False
+
+        authenticator is string
+        msg is string
+        '''
+        if len(authenticator) != libnacl.crypto_auth_BYTES:
+            return False
+        try:
+            libnacl.crypto_auth_verify(authenticator, msg, self.authkey)
+        except ValueError:
+            return False
+        return True
+
+    def encrypt(self, msg, enhex=False):
+        '''
+        Return duple of (cyphertext, nonce) resulting from encrypting the message
+        using precomputed shared key
+        If enhex is True then use HexEncoder otherwise use RawEncoder
+
+        msg is string
+        '''
+        nonce = self.privateer.nonce()
+        encoder = encoding.HexEncoder if enhex else encoding.RawEncoder
+        encrypted = self.box.encrypt(msg, nonce, encoder)
+        return (encrypted.ciphertext, encrypted.nonce)
+
+    def decrypt(self, cipher, nonce, dehex=False):
+        '''
+        Return decrypted msg contained in cypher using nonce and precomputed
+        shared key
+        If dehex is True then use HexEncoder otherwise use RawEncoder
+
+        cypher is string
+        nonce is string
+        '''
+        decoder = encoding.HexEncoder if dehex else encoding.RawEncoder
+        if dehex and len(nonce) != self.box.NONCE_SIZE:
+            nonce = decoder.decode(nonce)
+        return self.box.decrypt(cipher, nonce, decoder)
+
+
 def uuid(size=16):
     '''
     Generate universally unique id hex string with size characters
@@ -32,6 +32,13 @@ Header encoding.
         Lengths are encoded as hex strings
         The flags are encoded as a double char hex string in field 'fg'
 
+    When the head kind is binary = 2, then the header is a fixed length
+    struct packed with BINARY_HEAD_PACKER in the field order given by
+    BINARY_HEAD_FIELDS. All fields are always included at fixed offsets
+    so the header is parsed with a single unpack.
+        Integer fields are little endian unsigned
+        The flags are packed as a single byte in field 'fg'
+
 header data =
 {
     ri: raet id Default 'RAET'
@@ -64,6 +71,10 @@ header data =
     sc: Segment Count  (SgmtCnt) Default 1
     sf: Segment Flag  (SgmtFlag) Default 0
         This packet is part of a segmented message
+    pb: Parity Block (PrtyBlck) Default 0
+        Segments per XOR parity segment, parity segments are numbered from sc
+    mc: Message Count (MsgCnt) Default 0
+        Number of coalesced message bodies in body list, 0 is a single body
     af: All Flag (AllFlag) Default 0
         Resend all segments not just one
 
@@ -139,37 +150,39 @@ headKinds = HeadKind(**HEAD_KINDS)  # headKinds.json is '00'
 
 
 BODY_KINDS = odict([('nada', 0), ('json', 1), ('raw', 2), ('msgpack', 3),
-                    ('unknown', 255)])
+                    ('zjson', 4), ('zmsgpack', 5), ('unknown', 255)])
 BODY_KIND_NAMES = odict((v, k) for k, v in BODY_KINDS.iteritems())  # inverse map
 BodyKind = namedtuple('BodyKind', BODY_KINDS.keys())
 bodyKinds = BodyKind(**BODY_KINDS)
 
 
 FOOT_KINDS = odict([('nada', 0), ('nacl', 1), ('sha2', 2),
-                     ('crc64', 2), ('unknown', 255)])
+                     ('auth', 3), ('crc64', 4), ('unknown', 255)])
 FOOT_KIND_NAMES = odict((v, k) for k, v in FOOT_KINDS.iteritems())  # inverse map
 FootKind = namedtuple('FootKind', FOOT_KINDS.keys())
 footKinds = FootKind(**FOOT_KINDS)
 
 # bytes
-FOOT_SIZES = odict([('nada', 0), ('nacl', 64), ('sha2', 0),
-                     ('crc64', 8), ('unknown', 0)])
+FOOT_SIZES = odict([('nada', 0), ('nacl', 64), ('sha2', 32),
+                     ('auth', 32), ('crc64', 8), ('unknown', 0)])
 FootSize = namedtuple('FootSize', FOOT_SIZES.keys())
 footSizes = FootSize(**FOOT_SIZES)
 
 
 COAT_KINDS = odict([('nada', 0), ('nacl', 1), ('crc16', 2), ('crc64', 3),
-                    ('unknown', 255)])
+                    ('segnacl', 4), ('unknown', 255)])
 COAT_KIND_NAMES = odict((v, k) for k, v in COAT_KINDS.iteritems())  # inverse map
 CoatKind = namedtuple('CoatKind', COAT_KINDS.keys())
 coatKinds = CoatKind(**COAT_KINDS)
 
 # bytes
 TAIL_SIZES = odict([('nada', 0), ('nacl', 24), ('crc16', 2), ('crc64', 8),
-                    ('unknown', 0)])
+                    ('segnacl', 24), ('unknown', 0)])
 TailSize = namedtuple('TailSize', TAIL_SIZES.keys())
 tailSizes = TailSize(**TAIL_SIZES)
 
+BOX_MAC_SIZE = 16 # bytes of authenticator in each nacl box of coat
+
 TRNS_KINDS = odict([('message', 0), ('join', 1),
                     ('bind', 2), ('allow', 3),
                     ('alive', 4), ('unknown', 255)])
@@ -203,11 +216,20 @@ AUTO_MODE_NAMES = odict((v, k) for k, v in AUTO_MODES.iteritems())  # inverse ma
 AutoMode = namedtuple('AutoMode', AUTO_MODES.keys())
 autoModes = AutoMode(**AUTO_MODES)
 
-PACK_KINDS = odict([('json', 0), ('pack', 1)])
+PACK_KINDS = odict([('json', 0), ('pack', 1), ('zjson', 2), ('zpack', 3)])
 PACK_KIND_NAMES = odict((v, k) for k, v in PACK_KINDS.iteritems())  # inverse map
 PackKind = namedtuple('PackKind', PACK_KINDS.keys())
 packKinds = PackKind(**PACK_KINDS)
 
+# codec of compressed body and pack kinds, first byte of compressed body
+ZIP_KINDS = odict([('nada', 0), ('zlib', 1), ('zdict', 2), ('zdef', 3),
+                   ('unknown', 255)])
+ZIP_KIND_NAMES = odict((v, k) for k, v in ZIP_KINDS.iteritems())  # inverse map
+ZipKind = namedtuple('ZipKind', ZIP_KINDS.keys())
+zipKinds = ZipKind(**ZIP_KINDS)
+
+ZIP_THRESHOLD = 256 # bytes, smaller bodies of compressed kinds not compressed
+
 # head fields that may be included in packet header if not default value
 PACKET_DEFAULTS = odict([
                             ('sh', DEFAULT_SRC_HOST),
@@ -236,6 +258,8 @@ PACKET_DEFAULTS = odict([
                             ('sn', 0),
                             ('sc', 1),
                             ('ml', 0),
+                            ('pb', 0),
+                            ('mc', 0),
                             ('sf', False),
                             ('af', False),
                             ('bk', 0),
@@ -248,12 +272,12 @@ PACKET_DEFAULTS = odict([
 PACKET_FIELDS = ['sh', 'sp', 'dh', 'dp',
                  'ri', 'vn', 'pk', 'pl', 'hk', 'hl',
                  'se', 'de', 'cf', 'bf', 'nf', 'df', 'vf', 'si', 'ti', 'tk',
-                 'dt', 'oi', 'wf', 'sn', 'sc', 'ml', 'sf', 'af',
+                 'dt', 'oi', 'wf', 'sn', 'sc', 'ml', 'pb', 'mc', 'sf', 'af',
                  'bk', 'ck', 'fk', 'fl', 'fg']
 
 PACKET_HEAD_FIELDS = ['ri', 'vn', 'pk', 'pl', 'hk', 'hl',
                'se', 'de', 'cf', 'bf', 'nf', 'df', 'vf', 'si', 'ti', 'tk',
-               'dt', 'oi', 'wf', 'sn', 'sc', 'ml', 'sf', 'af',
+               'dt', 'oi', 'wf', 'sn', 'sc', 'ml', 'pb', 'mc', 'sf', 'af',
                'bk', 'bl', 'ck', 'cl', 'fk', 'fl', 'fg']
 
 PACKET_FLAGS = ['vf', 'df', 'nf' 'af', 'sf', 'wf', 'bf', 'cf']
@@ -282,6 +306,8 @@ PACKET_FIELD_FORMATS = odict([
                     ('sn', 'x'),
                     ('sc', 'x'),
                     ('ml', 'x'),
+                    ('pb', 'x'),
+                    ('mc', 'x'),
                     ('sf', ''),
                     ('af', ''),
                     ('bk', 'x'),
@@ -304,6 +330,12 @@ PAGE_DEFAULTS = odict([
                         ('pc', 1),
                       ])
 
+# fixed layout of binary head kind, little endian, field order matches packer
+BINARY_HEAD_FIELDS = ['ri', 'hk', 'vn', 'pk', 'hl', 'pl',
+                      'se', 'de', 'si', 'ti', 'tk', 'dt', 'oi',
+                      'sn', 'sc', 'ml', 'bk', 'ck', 'fk', 'fl', 'fg']
+BINARY_HEAD_PACKER = struct.Struct('<4sBBBBIIIIIBdIHHIBBBBB')
+
 PAGE_FIELD_FORMATS = odict([
                             ('ri', '.4s'),
                             ('vn', 'x'),
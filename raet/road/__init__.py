@@ -4,7 +4,7 @@ road.raet package
 modules associated with UDP socket communications
 '''
 
-__all__ = ['estating', 'keeping', 'packeting', 'stacking', 'transacting']
+__all__ = ['estating', 'keeping', 'packeting', 'serving', 'stacking', 'transacting', 'asyncing']
 
 import  importlib
 for m in __all__:
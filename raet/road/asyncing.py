@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+'''
+asyncing.py raet protocol asyncio road stack classes
+
+AsyncRoadStack runs a RoadStack on an asyncio event loop. Datagrams are fed to
+.rxes by a DatagramProtocol and .txes are flushed through its transport, so no
+polling of .serviceAll is needed. Messages return futures:
+
+    yield From(stack.open())  # or await stack.open()
+    yield From(stack.message(body, uid)) # or await stack.message(body, uid)
+
+Uses asyncio where available else the trollius backport.
+'''
+# pylint: skip-file
+# pylint: disable=W0611
+
+# Import python libs
+import socket
+import errno
+
+try:
+    import asyncio
+except ImportError:
+    try:
+        import trollius as asyncio
+    except ImportError:
+        asyncio = None
+
+# Import ioflo libs
+from ioflo.base.odicting import odict
+
+from .. import raeting
+from . import stacking
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+class RoadProtocol(asyncio.DatagramProtocol if asyncio else object):
+    '''
+    Datagram protocol that feeds received datagrams to its stack
+    '''
+    def __init__(self, stack):
+        '''
+        Setup instance
+        '''
+        self.stack = stack
+
+    def connection_made(self, transport):
+        '''
+        Save transport on stack server
+        '''
+        self.stack.server.transport = transport
+
+    def datagram_received(self, data, addr):
+        '''
+        Queue datagram on stack .rxes and wake stack to service it
+        '''
+        self.stack.rxes.append((data, addr))
+        self.stack.wake()
+
+    def error_received(self, exc):
+        '''
+        Log socket error such as ICMP port unreachable from a send
+        '''
+        console.terse("Stack {0}: Datagram error {1}\n".format(self.stack.name, exc))
+        self.stack.incStat('datagram_error')
+
+    def connection_lost(self, exc):
+        '''
+        Drop transport from stack server
+        '''
+        self.stack.server.transport = None
+
+class DatagramServer(object):
+    '''
+    Server with the interface of aiding.SocketUdpNb used by Stack backed by
+    an asyncio datagram transport. Sends before the transport is made raise
+    EAGAIN so the stack keeps them on .txes until later.
+    '''
+    def __init__(self, ha=None):
+        '''
+        Setup instance
+        '''
+        self.ha = ha
+        self.transport = None
+
+    def open(self):
+        '''
+        Transport is made by AsyncRoadStack.open so nothing to do here
+        '''
+        return True
+
+    def reopen(self):
+        '''
+        Transport is made by AsyncRoadStack.open so nothing to do here
+        '''
+        return True
+
+    def close(self):
+        '''
+        Close transport
+        '''
+        if self.transport:
+            self.transport.close()
+            self.transport = None
+
+    def receive(self):
+        '''
+        Datagrams arrive through RoadProtocol so always returns ('', None)
+        '''
+        return ('', None)
+
+    def send(self, data, da):
+        '''
+        Send data to destination address da through transport
+        '''
+        if not self.transport:
+            raise socket.error(errno.EAGAIN, "Transport not open")
+        self.transport.sendto(data, da)
+        return len(data)
+
+class AsyncRoadStack(stacking.RoadStack):
+    '''
+    RAET protocol RoadStack serviced by an asyncio event loop
+
+    loop
+        The event loop, defaults to asyncio.get_event_loop()
+    '''
+    def __init__(self, loop=None, **kwa):
+        '''
+        Setup instance
+        '''
+        if asyncio is None:
+            raise raeting.StackError("AsyncRoadStack requires asyncio or trollius")
+        self.loop = loop or asyncio.get_event_loop()
+        self.handle = None # handle of scheduled .service call
+        self.due = None # loop time of scheduled .service call
+        super(AsyncRoadStack, self).__init__(**kwa)
+        self.epoch = self.store.stamp - self.loop.time() # store stamp at loop time zero
+
+    def serverFromLocal(self):
+        '''
+        Create server that is bound by .open
+        '''
+        return DatagramServer(ha=self.ha)
+
+    def open(self):
+        '''
+        Bind datagram endpoint at .ha
+        Returns future that is done when bound
+        '''
+        future = asyncio.ensure_future(self.loop.create_datagram_endpoint(
+                                            lambda: RoadProtocol(self),
+                                            local_addr=self.ha),
+                                       loop=self.loop)
+        future.add_done_callback(self.opened)
+        return future
+
+    def opened(self, future):
+        '''
+        Update host address once datagram endpoint is bound
+        '''
+        if future.cancelled() or future.exception() is not None:
+            console.terse("Stack {0}: Failed opening at {1}\n".format(self.name, self.ha))
+            return
+        transport, protocol = future.result()
+        self.ha = self.server.ha = transport.get_extra_info('sockname')[:2]
+        console.verbose("Stack '{0}': Opened transport at '{1}'\n".format(self.name,
+                                                                          self.ha))
+        self.wake()
+
+    def close(self):
+        '''
+        Close transport and cancel scheduled servicing
+        '''
+        if self.handle:
+            self.handle.cancel()
+            self.handle = None
+        self.server.close()
+
+    def wake(self, delay=0.0):
+        '''
+        Schedule .service in delay seconds unless already scheduled sooner
+        '''
+        due = self.loop.time() + delay
+        if self.handle:
+            if self.due <= due:
+                return
+            self.handle.cancel()
+        self.due = due
+        self.handle = self.loop.call_at(due, self.service)
+
+    def advance(self):
+        '''
+        Advance .store to current loop time
+        Never moves stamp backwards so stacks may share a store
+        '''
+        stamp = self.epoch + self.loop.time()
+        if stamp > self.store.stamp:
+            self.store.changeStamp(stamp)
+
+    def service(self):
+        '''
+        Service received datagrams, presence, timers and transmits then
+        schedule the next call for when a transaction or presence timer is
+        next due
+        '''
+        self.handle = None
+        self.advance()
+        self.serviceRxes()
+        remaining = self.remainingManage()
+        if remaining is not None and remaining <= 0.0:
+            self.manage()
+        self.process()
+        self.serviceAllTx()
+        dues = [remaining for remaining in (self.remaining(), self.remainingManage())
+                if remaining is not None]
+        if dues:
+            self.wake(min(dues))
+
+    def transmit(self, msg, duid=None):
+        '''
+        Augment transmit to wake for servicing
+        '''
+        super(AsyncRoadStack, self).transmit(msg, duid=duid)
+        self.wake()
+
+    def tx(self, packed, duid):
+        '''
+        Augment tx to wake for servicing so packets queued by transactions
+        such as join or allow are flushed
+        '''
+        super(AsyncRoadStack, self).tx(packed, duid)
+        if self.server.transport:
+            self.wake()
+
+    def  _handleOneTxMsg(self):
+        '''
+        Take one message from .txMsgs deque and handle it without a future
+        Entry is duple (body, duid) or triple (body, duid, callback)
+        '''
+        entry = self.txMsgs.popleft()
+        body, duid = entry[:2]
+        callback = entry[2] if len(entry) > 2 else None
+        super(AsyncRoadStack, self).message(body, duid, callback=callback)
+        console.verbose("{0} sending\n{1}\n".format(self.name, body))
+
+    def message(self, body=None, uid=None, timeout=None, callback=None):
+        '''
+        Initiate message transaction to remote at uid
+        Returns future whose result is True when the message completes
+        or whose exception is TransactionError when it fails or times out
+        '''
+        future = asyncio.Future(loop=self.loop)
+
+        def done(success):
+            if future.done():
+                return
+            if success:
+                future.set_result(True)
+            else:
+                future.set_exception(raeting.TransactionError(
+                        "Message to remote '{0}' failed".format(uid)))
+            if callback:
+                callback(success)
+
+        super(AsyncRoadStack, self).message(body=body,
+                                            uid=uid,
+                                            timeout=timeout,
+                                            callback=done)
+        self.wake()
+        return future
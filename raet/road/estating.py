@@ -19,7 +19,10 @@ from ioflo.base import storing
 
 from .. import raeting
 from .. import nacling
+from .. import zipping
 from .. import lotting
+from .. import timing
+from . import packeting
 
 from ioflo.base.consoling import getConsole
 console = getConsole()
@@ -186,7 +189,17 @@ class RemoteEstate(Estate):
     .alive = False, dead, recently have not received valid signed packets from remote
 
     .fuid is the far uid of the remote as owned by the farside stack
+
+    .srtt and .rttvar are the smoothed round trip time and its variation
+    estimated (Jacobson/Karels) from samples taken by initiator transactions.
+    .rto is the redo timeout derived from them or None until first sample.
+    It is never less than the stack .interval between service passes since
+    an answer cannot be processed sooner.
     '''
+    RttAlpha = 0.125 # gain of smoothed round trip time
+    RttBeta = 0.25 # gain of round trip time variation
+    RtoMin = 0.2 # min redo timeout from estimate
+    RtoMax = 60.0 # max redo timeout from estimate
 
     def __init__(self,
                  stack,
@@ -226,14 +239,25 @@ class RemoteEstate(Estate):
         self.main = main
         self.kind = kind
         self.joined = joined
-        self.allowed = None
-        self.alived = None
-        self.reaped = None
+        self._allowed = None
+        self._alived = None
+        self._reaped = None
+        self.authed = False # remote advertised session authenticator at join
+        self.fk = None # foot kind of session traffic if not stack default
+        self.ck = None # coat kind of session traffic if not stack default
+        self.zipped = False # remote advertised session compression at join
+        self.gapped = False # remote advertised resend gap ranges at join
+        self.acking = False # remote advertised piggybacked acks at join
+        self.zipper = None # session compression dictionaries, set when allowed
         self.acceptance = acceptance
         self.privee = nacling.Privateer() # short term key manager
         self.publee = nacling.Publican() # correspondent short term key  manager
         self.verfer = nacling.Verifier(verkey) # correspondent verify key manager
         self.pubber = nacling.Publican(pubkey) # correspondent long term key manager
+        self.boxer = None # precomputed short term shared key box, set when allowed
+        self.srtt = None # smoothed round trip time
+        self.rttvar = None # round trip time variation
+        self.rto = None # redo timeout from round trip estimate
 
         self.rsid = rsid # last sid received from remote when RmtFlag is True
 
@@ -244,12 +268,16 @@ class RemoteEstate(Estate):
             duration = self.stack.period
         else:
             duration = self.stack.period + self.stack.offset
-        self.timer = aiding.StoreTimer(store=self.stack.store,
-                                       duration=duration)
+        self.timer = timing.StoreTimer(store=self.stack.store,
+                                       duration=duration,
+                                       scheduler=self.stack.remoteTimers,
+                                       owner=self)
 
-        self.reapTimer = aiding.StoreTimer(self.stack.store,
-                                           duration=self.stack.interim)
-        self.messages = deque() # deque of saved stale message body data to remote.uid
+        self.reapTimer = timing.StoreTimer(self.stack.store,
+                                           duration=self.stack.interim,
+                                           scheduler=self.stack.remoteTimers,
+                                           owner=self)
+        self.messages = deque() # deque of saved stale (body, callback) duples to remote.uid
 
     @property
     def nuid(self):
@@ -282,13 +310,93 @@ class RemoteEstate(Estate):
         '''
         self.nuid, self.fuid = value
 
+    @property
+    def allowed(self):
+        '''
+        property that returns allowed status
+        '''
+        return self._allowed
+
+    @allowed.setter
+    def allowed(self, value):
+        '''
+        setter for allowed status, marks presence of remote changed in stack
+        '''
+        if value != self._allowed:
+            self._allowed = value
+            self.stack.changePresence(self)
+
+    @property
+    def alived(self):
+        '''
+        property that returns alived status
+        '''
+        return self._alived
+
+    @alived.setter
+    def alived(self, value):
+        '''
+        setter for alived status, marks presence of remote changed in stack
+        '''
+        if value != self._alived:
+            self._alived = value
+            self.stack.changePresence(self)
+
+    @property
+    def reaped(self):
+        '''
+        property that returns reaped status
+        '''
+        return self._reaped
+
+    @reaped.setter
+    def reaped(self, value):
+        '''
+        setter for reaped status, marks presence of remote changed in stack
+        '''
+        if value != self._reaped:
+            self._reaped = value
+            self.stack.changePresence(self)
+
     def rekey(self):
         '''
         Regenerate short term keys
         '''
         self.allowed = None
-        self.privee = nacling.Privateer() # short term key
+        self.privee = nacling.Privateer() # short term key and nonce prefix
         self.publee = nacling.Publican() # correspondent short term key  manager
+        self.boxer = None # drop stale precomputed shared key
+        self.zipper = None # drop stale session compression dictionaries
+
+    def rebox(self):
+        '''
+        Precompute short term shared key box from .privee and .publee
+        Called when allow transaction completes so session packets do not
+        repeat key agreement on every encrypt or decrypt
+        Also starts fresh session compression dictionaries if both ends zipped
+        '''
+        self.boxer = nacling.Boxer(self.privee, self.publee.key)
+        self.zipper = (zipping.Zipper() if (self.stack.zipped and self.zipped)
+                       else None)
+
+    def sampleRtt(self, rtt):
+        '''
+        Update round trip estimate with sample rtt in seconds and derive .rto
+        '''
+        if rtt < 0.0:
+            return
+        if self.srtt is None: # first sample
+            self.srtt = rtt
+            self.rttvar = rtt / 2.0
+        else:
+            self.rttvar = ((1.0 - self.RttBeta) * self.rttvar +
+                           self.RttBeta * abs(self.srtt - rtt))
+            self.srtt = (1.0 - self.RttAlpha) * self.srtt + self.RttAlpha * rtt
+        rtoMin = max(self.RtoMin, self.stack.interval)
+        self.rto = min(max(rtoMin, self.srtt + 4.0 * self.rttvar), self.RtoMax)
+        self.stack.incStat('rtt_sample')
+        self.stack.updateStat('srtt_{0}'.format(self.name), self.srtt)
+        self.stack.updateStat('rto_{0}'.format(self.name), self.rto)
 
     def validRsid(self, rsid):
         '''
@@ -428,10 +536,38 @@ class RemoteEstate(Estate):
         Message is Messenger compatible transaction
         Save copy of body data from stale initiated message on .messages deque
         for retransmitting later after new session is established
-        '''
-        self.messages.append(odict(messenger.tray.body))
+        Streams are not saved since their source is partly read so the nack
+        of the stale Streamer fails its callback instead
+        Coalesced bodies are saved individually with their own callbacks so
+        each is resent on its own
+        '''
+        if isinstance(messenger.tray, packeting.TxStream):
+            emsg = ("Stack {0}: Dropped stale stream with remote {1} at {2}"
+                                                "\n".format(self.stack.name, self.name,
+                                                            self.stack.store.stamp))
+            console.concise(emsg)
+            self.stack.incStat('stale_stream')
+            return
+        body = messenger.tray.body
+        if isinstance(body, packeting.BatchBody): # coalesced so unpack
+            for item, callback in zip(body.data, body.callbacks):
+                self.messages.append((odict(item), callback))
+            body.callbacks = [None] * body.count # callbacks follow bodies when resent
+            messenger.callback = None
+            emsg = ("Stack {0}: Saved {1} stale coalesced messages with remote {2} at {3}"
+                        "\n".format(self.stack.name, body.count, self.name,
+                                    self.stack.store.stamp))
+            console.concise(emsg)
+            return
+        if isinstance(body, packeting.PackedBody): # broadcast so resend its data
+            body = body.data
+        if not isinstance(body, packeting.RxBody): # forwarded lazy body as is
+            body = odict(body)
+        self.messages.append((body, messenger.callback))
+        messenger.callback = None # callback follows message when resent
         emsg = ("Stack {0}: Saved stale message with remote {1} at {2}"
-                                                "\n".format(self.stack.name, index, self.name))
+                                                "\n".format(self.stack.name, self.name,
+                                                            self.stack.store.stamp))
         console.concise(emsg)
 
     def sendSavedMessages(self):
@@ -440,10 +576,11 @@ class RemoteEstate(Estate):
         Save stale initiated message for retransmitting later after new session is established
         '''
         while self.messages:
-            body = self.messages.popleft()
-            self.stack.message(body=body, uid=self.uid)
+            body, callback = self.messages.popleft()
+            self.stack.message(body=body, uid=self.uid, callback=callback)
             emsg = ("Stack {0}: Resent saved message with remote {1} at {2}"
-                                        "\n".format(self.stack.name, index, self.name))
+                                        "\n".format(self.stack.name, self.name,
+                                                    self.stack.store.stamp))
             console.concise(emsg)
 
     def allowInProcess(self):
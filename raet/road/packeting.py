@@ -6,6 +6,8 @@ packeting module provides classes for Raet packets
 '''
 
 # Import python libs
+import struct
+import binascii
 from collections import Mapping
 try:
     import simplejson as json
@@ -25,6 +27,62 @@ from ioflo.base.consoling import getConsole
 console = getConsole()
 
 from .. import raeting
+from .. import nacling
+from .. import crcing
+from .. import zipping
+
+# integrity check functions keyed by coat kind of check tail
+CHECKS = {raeting.coatKinds.crc16: crcing.crc16,
+          raeting.coatKinds.crc64: crcing.crc64, }
+
+# integrity check functions keyed by foot kind of check foot
+DIGESTS = {raeting.footKinds.sha2: crcing.sha2,
+           raeting.footKinds.crc64: crcing.crc64, }
+
+# serialization body kind keyed by compressed body kind
+ZIPPED = {raeting.bodyKinds.zjson: raeting.bodyKinds.json,
+          raeting.bodyKinds.zmsgpack: raeting.bodyKinds.msgpack, }
+
+# coat bytes added by each box of segnacl coat
+SEAL_SIZE = raeting.BOX_MAC_SIZE + raeting.tailSizes.segnacl
+
+def dumps(data, sk):
+    '''
+    Returns data serialized with serialization body kind sk
+    Raises PacketError if msgpack kind and msgpack not installed
+    '''
+    if sk == raeting.bodyKinds.json:
+        if data:
+            return json.dumps(data, separators=(',', ':'))
+    elif sk == raeting.bodyKinds.msgpack:
+        if data:
+            if not msgpack:
+                emsg = "Msgpack not installed."
+                raise raeting.PacketError(emsg)
+            return msgpack.dumps(data)
+    elif sk == raeting.bodyKinds.raw:
+        return data # data is already formatted string
+    return ''
+
+def xorValue(chunk, size):
+    '''
+    Returns long of chunk zero padded to size bytes for XOR parity
+    '''
+    if not len(chunk):
+        return 0L
+    return long(binascii.hexlify(chunk), 16) << (8 * (size - len(chunk)))
+
+def xorChunk(value, size):
+    '''
+    Returns size byte string of XOR parity long value
+    '''
+    return binascii.unhexlify("{0:0{1}x}".format(value, 2 * size))
+
+def parities(sc, pb):
+    '''
+    Returns number of parity segments of sc segments with parity block pb
+    '''
+    return ((sc + pb - 1) // pb) if pb else 0
 
 class Part(object):
     '''
@@ -63,6 +121,103 @@ class Head(Part):
         '''
         super(Head, self).__init__(**kwa)
 
+class HeadTemplate(object):
+    '''
+    Precompiled raet or json head of tx packet data
+
+    Fields that are constant within a transaction are formatted once at compile
+    so packing only formats the .Variables fields and the lengths. Compiled
+    from the constant field values in .key and recompiled whenever they change
+    so a template may be shared by all the packets of a transaction.
+    '''
+    Variables = ['pk', 'dt', 'sn', 'sc', 'ml', 'fl', 'fg'] # vary per packet
+
+    def __init__(self):
+        '''
+        Setup instance
+        '''
+        self.fields = [k for k in raeting.PACKET_DEFAULTS
+                       if (k in raeting.PACKET_HEAD_FIELDS and
+                           k not in raeting.PACKET_FLAGS and
+                           k not in ('ri', 'pl', 'hl'))]
+        self.fixed = ['ri'] + [k for k in self.fields if k not in self.Variables]
+        self.key = None # values of .fixed fields compiled from
+        self.hk = None # head kind compiled for
+        self.prefix = '' # head before packet length value
+        self.infix = '' # head between packet length and head length values
+        self.slots = [] # list of (constant text, variable field) duples
+        self.suffix = '' # head after last variable field
+
+    def line(self, key, value):
+        '''
+        Returns key value formatted for head kind .hk with leading separator
+        '''
+        if self.hk == raeting.headKinds.json:
+            return ',"{0}":{1}'.format(key, json.dumps(value, encoding='ascii'))
+        return "\n{0} {1:{2}}".format(key, value, raeting.PACKET_FIELD_FORMATS[key])
+
+    def compile(self, data, key):
+        '''
+        Precompile head text of constant fields in data with values key
+        '''
+        self.key = key
+        self.hk = data['hk']
+        if self.hk == raeting.headKinds.json:
+            self.prefix = '{{{0},"pl":"'.format(self.line('ri', data['ri'])[1:])
+            self.infix = '","hl":"'
+            text = '"'
+            end = '}}{0}'.format(raeting.JSON_END)
+        else:
+            self.prefix = '{0}\npl '.format(self.line('ri', data['ri'])[1:])
+            self.infix = '\nhl '
+            text = ''
+            end = raeting.HEAD_END
+
+        defaults = raeting.PACKET_DEFAULTS
+        self.slots = []
+        for k in self.fields:
+            if k in self.Variables:
+                self.slots.append((text, k))
+                text = ''
+            elif data[k] != defaults[k]: # include if not equal to default
+                text += self.line(k, data[k])
+        self.suffix = text + end
+
+    def pack(self, data, size):
+        '''
+        Returns packed head of data for coat of length size
+        Updates hl and pl in data
+        Raises PacketError exception If head too long
+        '''
+        key = tuple(data[k] for k in self.fixed)
+        if key != self.key or data['hk'] != self.hk:
+            self.compile(data, key)
+
+        defaults = raeting.PACKET_DEFAULTS
+        parts = []
+        for text, k in self.slots:
+            parts.append(text)
+            if data[k] != defaults[k]:
+                parts.append(self.line(k, data[k]))
+        parts.append(self.suffix)
+        rest = ''.join(parts)
+
+        plsize = 7 if self.hk == raeting.headKinds.json else 4 # hex digits
+        hl = len(self.prefix) + plsize + len(self.infix) + 2 + len(rest)
+        if hl > raeting.MAX_HEAD_SIZE:
+            emsg = "Head length of {0}, exceeds max of {1}".format(hl, raeting.MAX_HEAD_SIZE)
+            raise raeting.PacketError(emsg)
+        data['hl'] = hl
+        pl = hl + size + data['fl']
+        data['pl'] = pl
+        # Tray checks for packet length greater than UDP_MAX_PACKET_SIZE
+        # and segments appropriately so pl may be truncated below in this case
+        return ''.join([self.prefix,
+                        "{0:0{1}x}".format(pl, plsize)[-plsize:],
+                        self.infix,
+                        "{0:02x}".format(hl)[-2:],
+                        rest])
+
 class TxHead(Head):
     '''
     RAET protocol transmit packet header class
@@ -70,80 +225,72 @@ class TxHead(Head):
     def pack(self):
         '''
         Composes .packed, which is the packed form of this part
+        Uses .packet.template if any so constant fields are not reformatted
         '''
         self.packed = ''
         data = self.packet.data  # for speed
         data['fl'] = self.packet.foot.size
+
+        if data['hk'] == raeting.headKinds.binary:
+            self.packBinary()
+            return
+
+        if data['hk'] not in (raeting.headKinds.raet, raeting.headKinds.json):
+            return
+
         data['fg'] = "{0:02x}".format(self.packFlags())
 
-        # kit always includes raet id, packet length, and header kind fields
-        kit = odict([('ri', 'RAET'), ('pl', 0), ('hl', 0)])
-        for k, v in raeting.PACKET_DEFAULTS.items():  # include if not equal to default
-            if ((k in raeting.PACKET_HEAD_FIELDS) and
-                (k not in raeting.PACKET_FLAGS) and
-                (data[k] != v)):
-                kit[k] = data[k]
-
-        if data['hk'] == raeting.headKinds.raet:
-            packed = ''
-            lines = []
-            for k, v in kit.items():
-                lines.append("{key} {val:{fmt}}".format(
-                        key=k, val=v, fmt=raeting.PACKET_FIELD_FORMATS[k]))
-
-            packed = "\n".join(lines)
-            packed = '{0}{1}'.format(packed, raeting.HEAD_END)
-            hl = len(packed)
-            if hl > raeting.MAX_HEAD_SIZE:
-                emsg = "Head length of {0}, exceeds max of {1}".format(hl, MAX_HEAD_SIZE)
-                raise raeting.PacketError(emsg)
-            data['hl'] = hl
+        if self.packet.coat.size > raeting.MAX_MESSAGE_SIZE:
+            emsg = "Packed message length of {0}, exceeds max of {1}".format(
+                     self.packet.coat.size, raeting.MAX_MESSAGE_SIZE)
+            raise raeting.PacketError(emsg)
 
-            if self.packet.coat.size > raeting.MAX_MESSAGE_SIZE:
-                emsg = "Packed message length of {0}, exceeds max of {1}".format(
-                         self.packet.coat.size, raeting.MAX_MESSAGE_SIZE)
-                raise raeting.PacketError(emsg)
-            pl = hl + self.packet.coat.size + data['fl']
-            data['pl'] = pl
-            # Tray checks for packet length greater than UDP_MAX_PACKET_SIZE
-            # and segments appropriately so pl may be truncated below in this case
-            # substitute true lengths
-            packed = packed.replace('\npl {val:{fmt}}\n'.format(
-                                        val=kit['pl'],
-                                        fmt=raeting.PACKET_FIELD_FORMATS['pl']),
-                                    '\npl {0}\n'.format("{val:{fmt}}".format(
-                                        val=pl,
-                                        fmt=raeting.PACKET_FIELD_FORMATS['pl'])[-4:]),
-                                    1)
-            packed = packed.replace('\nhl {val:{fmt}}\n'.format(
-                                        val=kit['hl'],
-                                        fmt=raeting.PACKET_FIELD_FORMATS['hl']),
-                                    '\nhl {0}\n'.format("{val:{fmt}}".format(
-                                            val=hl,
-                                            fmt=raeting.PACKET_FIELD_FORMATS['hl'])[-2:]),
-                                    1)
-            self.packed = packed
+        template = self.packet.template or HeadTemplate()
+        self.packed = template.pack(data, self.packet.coat.size)
 
-        elif data['hk'] == raeting.headKinds.json:
-            kit['pl'] = '0000000'  # need hex string so fixed length and jsonable
-            kit['hl'] = '00'  # need hex string so fixed length and jsonable
-            packed = json.dumps(kit, separators=(',', ':'), encoding='ascii',)
-            packed = '{0}{1}'.format(packed, raeting.JSON_END)
-            hl = len(packed)
-            if hl > raeting.MAX_HEAD_SIZE:
-                emsg = "Head length of {0}, exceeds max of {1}".format(hl, MAX_HEAD_SIZE)
-                raise raeting.PacketError(emsg)
-            data['hl'] = hl
+    def packBinary(self):
+        '''
+        Composes .packed for binary head kind as fixed layout struct
+        All fields are included so no default elision or length substitution
+        '''
+        data = self.packet.data  # for speed
+        hl = raeting.BINARY_HEAD_PACKER.size
+        data['hl'] = hl
 
-            if self.packet.coat.size > raeting.MAX_MESSAGE_SIZE:
-                emsg = "Packed message length of {0}, exceeds max of {1}".format(
-                         self.packet.coat.size, raeting.MAX_MESSAGE_SIZE)
-                raise raeting.PacketError(emsg)
-            pl = hl + self.packet.coat.size + data['fl']
-            data['pl'] = pl
-            #substitute true length converted to 2 byte hex string
-            packed = packed.replace('"pl":"0000000"', '"pl":"{0}"'.format("{0:07x}".format(pl)[-7:]), 1)
-            self.packed = packed.replace('"hl":"00"', '"hl":"{0}"'.format("{0:02x}".format(hl)[-2:]), 1)
+        if self.packet.coat.size > raeting.MAX_MESSAGE_SIZE:
+            emsg = "Packed message length of {0}, exceeds max of {1}".format(
+                     self.packet.coat.size, raeting.MAX_MESSAGE_SIZE)
+            raise raeting.PacketError(emsg)
+        pl = hl + self.packet.coat.size + data['fl']
+        data['pl'] = pl
+
+        fg = self.packFlags()
+        data['fg'] = "{0:02x}".format(fg)
+        try:
+            self.packed = raeting.BINARY_HEAD_PACKER.pack(data['ri'],
+                                                          data['hk'],
+                                                          data['vn'],
+                                                          data['pk'],
+                                                          hl,
+                                                          pl,
+                                                          data['se'],
+                                                          data['de'],
+                                                          data['si'],
+                                                          data['ti'],
+                                                          data['tk'],
+                                                          data['dt'],
+                                                          data['oi'],
+                                                          data['sn'],
+                                                          data['sc'],
+                                                          data['ml'],
+                                                          data['bk'],
+                                                          data['ck'],
+                                                          data['fk'],
+                                                          data['fl'],
+                                                          fg)
+        except struct.error as ex:
+            emsg = "Invalid binary head field value. {0}".format(ex)
+            raise raeting.PacketError(emsg)
 
     def packFlags(self):
         '''
@@ -168,10 +315,16 @@ class RxHead(Head):
         data = self.packet.data  # for speed
         packed = self.packet.packed  # for speed
 
-        if packed.startswith('ri RAET\n') and raeting.HEAD_END in packed: # raet head
+        if packed.startswith('ri RAET\n'): # raet head
             hk = raeting.headKinds.raet
-            front, sep, back = packed.partition(raeting.HEAD_END)
-            self.packed = "{0}{1}".format(front, sep)
+            # search only where head may be and slice only head not whole packet
+            end = packed.find(raeting.HEAD_END, 0,
+                              raeting.MAX_HEAD_SIZE + len(raeting.HEAD_END))
+            if end < 0:
+                emsg = "Unrecognizable packet head."
+                raise raeting.PacketError(emsg)
+            front = packed[:end]
+            self.packed = packed[:end + len(raeting.HEAD_END)]
             kit = odict()
             lines = front.split('\n')
             for line in lines:
@@ -206,10 +359,15 @@ class RxHead(Head):
                 raise raeting.PacketError(emsg)
 
 
-        elif packed.startswith('{"ri":"RAET",') and raeting.JSON_END in packed: # json head
+        elif packed.startswith('{"ri":"RAET",'): # json head
             hk = raeting.headKinds.json
-            front, sep, back = packed.partition(raeting.JSON_END)
-            self.packed = "{0}{1}".format(front, sep)
+            end = packed.find(raeting.JSON_END, 0,
+                              raeting.MAX_HEAD_SIZE + len(raeting.JSON_END))
+            if end < 0:
+                emsg = "Unrecognizable packet head."
+                raise raeting.PacketError(emsg)
+            front = packed[:end]
+            self.packed = packed[:end + len(raeting.JSON_END)]
             kit = json.loads(front,
                              encoding='ascii',
                              object_pairs_hook=odict)
@@ -232,6 +390,30 @@ class RxHead(Head):
                 raise raeting.PacketError(emsg)
             data['pl'] = pl
 
+        elif (packed.startswith('RAET') and
+                len(packed) >= raeting.BINARY_HEAD_PACKER.size): # binary head
+            hk = raeting.headKinds.binary
+            kit = odict(zip(raeting.BINARY_HEAD_FIELDS,
+                            raeting.BINARY_HEAD_PACKER.unpack_from(packed)))
+            kit['fg'] = "{0:02x}".format(kit['fg'])
+            data.update(kit)
+            self.unpackFlags(data['fg'])
+
+            if data['hk'] != hk:
+                emsg = 'Recognized head kind does not match head field value.'
+                raise raeting.PacketError(emsg)
+
+            if data['hl'] != raeting.BINARY_HEAD_PACKER.size:
+                emsg = 'Actual head length = {0} not match head field = {1}'.format(
+                        raeting.BINARY_HEAD_PACKER.size, data['hl'])
+                raise raeting.PacketError(emsg)
+            self.packed = packed[:data['hl']]
+
+            if data['pl'] != self.packet.size:
+                emsg = 'Actual packet length = {0} not match head field = {1}'.format(
+                    self.packet.size, data['pl'])
+                raise raeting.PacketError(emsg)
+
         else:  # notify unrecognizable packet head
             data['hk'] = raeting.headKinds.unknown
             emsg = "Unrecognizable packet head."
@@ -264,28 +446,151 @@ class TxBody(Body):
     '''
     RAET protocol tx packet body class
     '''
+    def __init__(self, **kwa):
+        '''
+        Setup TxBody instance
+        '''
+        self.zv = None # session dictionary version defined by .packed if any
+        super(TxBody, self).__init__(**kwa)
+
     def pack(self):
         '''
         Composes .packed, which is the packed form of this part
         '''
         self.packed = ''
         bk = self.packet.data['bk']
-        if bk == raeting.bodyKinds.json:
-            if self.data:
-                self.packed = json.dumps(self.data, separators=(',', ':'))
-        elif bk == raeting.bodyKinds.msgpack:
-            if self.data:
-                if not msgpack:
-                    emsg = "Msgpack not installed."
-                    raise raeting.PacketError(emsg)
-                self.packed = msgpack.dumps(self.data)
-        elif bk == raeting.bodyKinds.raw:
-            self.packed = self.data # data is already formatted string
+        if isinstance(self.data, RxBody): # forward received body
+            # compressed kinds may use a session dictionary of the source remote
+            if self.data.packet.data['bk'] == bk and bk not in ZIPPED:
+                if self.data.packet.coat.lazy:
+                    self.data.packet.coat.parse()
+                self.packed = self.data.packed
+                return
+            self.data = self.data.data
+        sk = ZIPPED.get(bk, bk) # serialization kind
+        if isinstance(self.data, PackedBody): # serialized once for many packets
+            self.packed = self.data.serialized(sk)
+        else:
+            self.packed = dumps(self.data, sk)
+
+        if bk in ZIPPED and self.packed: # compress before coat encrypts
+            self.packed = self.packet.compress(self.packed)
+            self.zv = zipping.defined(self.packed)
+
+class PackedBody(object):
+    '''
+    Message body serialized once to be sent to many remotes such as a
+    broadcast fan out. Compression and coats still apply per packet since
+    they may depend on the remote.
+    '''
+    def __init__(self, data=None, bk=raeting.bodyKinds.json):
+        '''
+        Setup instance
+        data is body mapping or raw string
+        bk is body kind whose serialization kind .packed is serialized with
+        '''
+        self.data = data
+        self.sk = ZIPPED.get(bk, bk)
+        self.packed = dumps(data, self.sk)
+
+    def serialized(self, sk):
+        '''
+        Returns .data serialized with serialization kind sk, .packed if same
+        '''
+        if sk == self.sk:
+            return self.packed
+        return dumps(self.data, sk)
+
+class BatchBody(PackedBody):
+    '''
+    Small message bodies to one remote coalesced into one body list that is
+    joined from each body already serialized by .add. Sent with head field mc
+    of .count so the receiver splits the list back into individual messages.
+    '''
+    def __init__(self, bk=raeting.bodyKinds.json):
+        '''
+        Setup instance
+        bk is body kind whose serialization kind the bodies are serialized with
+        '''
+        self.data = [] # coalesced bodies
+        self.callbacks = [] # callback of each coalesced body or None
+        self.sk = ZIPPED.get(bk, bk)
+        self.parts = [] # serialized bodies
+        self.size = 1 # size of packed json list, packed msgpack list is not larger
+
+    @property
+    def count(self):
+        '''
+        Property is number of coalesced bodies
+        '''
+        return len(self.data)
+
+    @property
+    def packed(self):
+        '''
+        Property is body list serialized from .parts
+        '''
+        if self.sk == raeting.bodyKinds.msgpack:
+            return (msgpack.Packer().pack_array_header(len(self.parts)) +
+                    ''.join(self.parts))
+        return "[{0}]".format(",".join(self.parts))
+
+    def add(self, data, part, callback=None):
+        '''
+        Add body data whose serialization with .sk is part
+        callback is called with True when data is delivered else False
+        '''
+        self.data.append(data)
+        self.parts.append(part)
+        self.callbacks.append(callback)
+        self.size += len(part) + 1
+
+    def finish(self, success):
+        '''
+        Call the callback of each body once with success
+        '''
+        callbacks, self.callbacks = self.callbacks, [None] * len(self.callbacks)
+        for callback in callbacks:
+            if callback:
+                callback(success)
+
+    def fits(self, part, size):
+        '''
+        Returns True if part can be added without .size exceeding size
+        '''
+        return (self.size + len(part) + 1 <= size)
 
 class RxBody(Body):
     '''
     RAET protocol rx packet body class
+
+    When .lazy the coat is decrypted and the body deserialized on first access
+    of .data so bodies that are never read are never decoded
     '''
+    def __init__(self, **kwa):
+        '''
+        Setup RxBody instance
+        '''
+        self.lazy = False # True when .data not yet parsed from .packed
+        super(RxBody, self).__init__(**kwa)
+
+    @property
+    def data(self):
+        '''
+        Property is body data, parses coat and body first when .lazy
+        Raises PacketError exception If failure
+        '''
+        if self.lazy:
+            if self.packet.coat.lazy:
+                self.packet.coat.parse()
+            self.parse()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self.lazy = False
+
     def parse(self):
         '''
         Parses body. Assumes already unpacked.
@@ -298,30 +603,54 @@ class RxBody(Body):
             emsg = "Unrecognizable packet body."
             raise raeting.PacketError(emsg)
 
-        self.data = odict()
+        data = odict()
+        packed = self.packed
 
-        if bk == raeting.bodyKinds.json:
-            if self.packed:
-                kit = json.loads(self.packed, object_pairs_hook=odict)
-                if not isinstance(kit, Mapping):
-                    emsg = "Packet body not a mapping."
+        if bk in ZIPPED:
+            if packed:
+                try:
+                    packed = self.packet.decompress(packed)
+                except ValueError as ex:
+                    emsg = "Failed body decompression. {0}".format(ex)
                     raise raeting.PacketError(emsg)
-                self.data = kit
+            bk = ZIPPED[bk]
+
+        if bk == raeting.bodyKinds.json:
+            if packed:
+                kit = json.loads(packed, object_pairs_hook=odict)
+                self.validate(kit)
+                data = kit
         elif bk == raeting.bodyKinds.msgpack:
-            if self.packed:
+            if packed:
                 if not msgpack:
                     emsg = "Msgpack not installed."
                     raise raeting.PacketError(emsg)
-                kit = msgpack.loads(self.packed, object_pairs_hook=odict)
-                if not isinstance(kit, Mapping):
-                    emsg = "Packet body not a mapping."
-                    raise raeting.PacketError(emsg)
-                self.data = kit
+                kit = msgpack.loads(packed, object_pairs_hook=odict)
+                self.validate(kit)
+                data = kit
         elif bk == raeting.bodyKinds.raw:
-            self.data = self.packed # return as string
+            data = packed # return as string
         elif bk == raeting.bodyKinds.nada:
             pass
 
+        self.data = data
+
+    def validate(self, kit):
+        '''
+        Raises PacketError exception if deserialized kit is not a mapping or
+        when head mc is not zero a list of mc mappings
+        '''
+        mc = self.packet.data['mc']
+        if not mc:
+            if not isinstance(kit, Mapping):
+                emsg = "Packet body not a mapping."
+                raise raeting.PacketError(emsg)
+            return
+        if (not isinstance(kit, list) or len(kit) != mc or
+                not all(isinstance(item, Mapping) for item in kit)):
+            emsg = "Packet body not a list of {0} mappings.".format(mc)
+            raise raeting.PacketError(emsg)
+
 class Coat(Part):
     '''
     RAET protocol packet coat class
@@ -348,13 +677,49 @@ class TxCoat(Coat):
                 cipher, nonce = self.packet.encrypt(msg)
                 self.packed = "".join([cipher, nonce])
 
+        elif ck == raeting.coatKinds.segnacl: # sized now boxed by .seal
+            msg = self.packet.body.packed
+            if msg:
+                self.packed = "".join([msg, "".rjust(SEAL_SIZE, '\x00')])
+
+        elif ck in CHECKS: # integrity check tail
+            msg = self.packet.body.packed
+            if msg:
+                self.packed = "".join([msg, CHECKS[ck](msg)])
+
         if ck == raeting.coatKinds.nada:
             self.packed = self.packet.body.packed
 
+    def seal(self, segsize=0):
+        '''
+        Box body .packed into segnacl coat .packed with one box per segsize
+        bytes of coat so each segment decrypts on its own. 0 means one box
+        '''
+        msg = self.packet.body.packed
+        if not msg:
+            self.packed = msg
+            return
+        chunksize = (segsize - SEAL_SIZE) if segsize else len(msg)
+        if chunksize <= 0:
+            emsg = "Invalid coat segment size '{0}'".format(segsize)
+            raise raeting.PacketError(emsg)
+        boxes = []
+        for offset in xrange(0, len(msg), chunksize):
+            cipher, nonce = self.packet.encrypt(msg[offset:offset + chunksize])
+            boxes.extend([cipher, nonce])
+        self.packed = "".join(boxes)
+
 class RxCoat(Coat):
     '''
     RAET protocol rx packet coat class
     '''
+    def __init__(self, **kwa):
+        '''
+        Setup RxCoat instance
+        '''
+        super(RxCoat, self).__init__(**kwa)
+        self.lazy = False # True when not yet parsed into body .packed
+
     def parse(self):
         '''
         Parses coat. Assumes already unpacked.
@@ -366,19 +731,35 @@ class RxCoat(Coat):
             emsg = "Unrecognizable packet coat."
             raise raeting.PacketError(emsg)
 
-        if ck == raeting.coatKinds.nacl:
-            if self.packed:
+        packed = self.packed
+        if isinstance(packed, memoryview): # view into packet so copy out once
+            packed = packed.tobytes()
+
+        if ck in (raeting.coatKinds.nacl, raeting.coatKinds.segnacl):
+            if packed: # segmented segnacl boxes are opened by RxTray
                 tl = raeting.tailSizes.nacl # nonce length
-                cipher = self.packed[:-tl]
-                nonce = self.packed[-tl:]
+                cipher = packed[:-tl]
+                nonce = packed[-tl:]
                 msg = self.packet.decrypt(cipher, nonce)
                 self.packet.body.packed = msg
             else:
-                self.packet.body.packed = self.packed
+                self.packet.body.packed = packed
+
+        elif ck in CHECKS:
+            if packed:
+                tl = raeting.TAIL_SIZES[raeting.COAT_KIND_NAMES[ck]] # check length
+                msg = packed[:-tl]
+                if len(packed) <= tl or CHECKS[ck](msg) != packed[-tl:]:
+                    emsg = "Failed coat integrity check"
+                    raise raeting.PacketError(emsg)
+                self.packet.body.packed = msg
+            else:
+                self.packet.body.packed = packed
 
         if ck == raeting.coatKinds.nada:
-            self.packet.body.packed = self.packed
-            pass
+            self.packet.body.packed = packed
+
+        self.lazy = False
 
 class Foot(Part):
     '''
@@ -411,6 +792,12 @@ class TxFoot(Foot):
         if fk == raeting.footKinds.nacl:
             self.packed = "".rjust(raeting.footSizes.nacl, '\x00')
 
+        elif fk == raeting.footKinds.auth:
+            self.packed = "".rjust(raeting.footSizes.auth, '\x00')
+
+        elif fk in DIGESTS:
+            self.packed = "".rjust(raeting.FOOT_SIZES[raeting.FOOT_KIND_NAMES[fk]], '\x00')
+
         elif fk == raeting.footKinds.nada:
             pass
 
@@ -427,6 +814,13 @@ class TxFoot(Foot):
         if fk == raeting.footKinds.nacl:
             self.packed = self.packet.signature(self.packet.packed)
 
+        elif fk == raeting.footKinds.auth: # session authenticator of head and coat
+            self.packed = self.packet.auth(self.packet.packed[:-raeting.footSizes.auth])
+
+        elif fk in DIGESTS: # integrity check of head and coat
+            fl = raeting.FOOT_SIZES[raeting.FOOT_KIND_NAMES[fk]]
+            self.packed = DIGESTS[fk](self.packet.packed[:-fl])
+
         elif fk == raeting.footKinds.nada:
             pass
 
@@ -460,15 +854,35 @@ class RxFoot(Foot):
                 raise raeting.PacketError(emsg)
 
             signature = self.packed
-            blank = "".rjust(raeting.footSizes.nacl, '\x00')
-
-            front = self.packet.packed[:self.packet.size - fl]
-
-            msg = "".join([front, blank])
+            # signed msg is packet with blank foot so copy once and blank in place
+            msg = bytearray(self.packet.packed)
+            msg[self.packet.size - fl:] = "".rjust(raeting.footSizes.nacl, '\x00')
             if not self.packet.verify(signature, msg):
                 emsg = "Failed verification"
                 raise raeting.PacketError(emsg)
 
+        elif fk == raeting.footKinds.auth:
+            if self.size != raeting.footSizes.auth:
+                emsg = ("Actual foot size '{0}' does not match "
+                    "kind size '{1}'".format(self.size, raeting.footSizes.auth))
+                raise raeting.PacketError(emsg)
+
+            if not self.packet.authenticate(self.packed,
+                                            self.packet.packed[:self.packet.size - fl]):
+                emsg = "Failed authentication"
+                raise raeting.PacketError(emsg)
+
+        elif fk in DIGESTS:
+            size = raeting.FOOT_SIZES[raeting.FOOT_KIND_NAMES[fk]]
+            if self.size != size:
+                emsg = ("Actual foot size '{0}' does not match "
+                    "kind size '{1}'".format(self.size, size))
+                raise raeting.PacketError(emsg)
+
+            if DIGESTS[fk](self.packet.packed[:self.packet.size - fl]) != self.packed:
+                emsg = "Failed integrity check"
+                raise raeting.PacketError(emsg)
+
         if fk == raeting.footKinds.nada:
             pass
 
@@ -518,11 +932,13 @@ class TxPacket(Packet):
     '''
     RAET Protocol Transmit Packet object
     '''
-    def __init__(self, embody=None, **kwa):
+    def __init__(self, embody=None, template=None, **kwa):
         '''
         Setup TxPacket instance
+        template is HeadTemplate shared by packets of a transaction if any
         '''
         super(TxPacket, self).__init__(**kwa)
+        self.template = template
         self.head = TxHead(packet=self)
         self.body = TxBody(packet=self, data=embody)
         self.coat = TxCoat(packet=self)
@@ -556,14 +972,38 @@ class TxPacket(Packet):
                                self.coat.packed,
                                self.foot.packed])
 
+    def auth(self, msg):
+        '''
+        Return session authenticator of msg with short term keys
+        Raises PacketError exception If session not allowed
+        '''
+        remote = self.stack.remotes[self.data['se']]
+        if not (remote.allowed and remote.boxer):
+            emsg = "Session authenticator requires allowed remote."
+            raise raeting.PacketError(emsg)
+        return (remote.boxer.auth(msg))
+
     def encrypt(self, msg):
         '''
         Return (cipher, nonce) duple resulting from encrypting message
         with short term keys
         '''
         remote = self.stack.remotes[self.data['se']]
+        if remote.boxer:
+            return (remote.boxer.encrypt(msg))
         return (remote.privee.encrypt(msg, remote.publee.key))
 
+    def compress(self, msg):
+        '''
+        Return msg compressed with session dictionary of remote if any
+        Only message bodies train and define the dictionary since only their
+        Messenger confirms or abandons it so control packets are stateless
+        '''
+        remote = self.stack.remotes.get(self.data['se']) if self.stack else None
+        if remote and remote.zipper and self.data['pk'] == raeting.pcktKinds.message:
+            return (remote.zipper.compress(msg))
+        return (zipping.compress(msg))
+
     def prepack(self):
         '''
         Pre Pack the parts of the packet .packed but do not sign so can see
@@ -577,6 +1017,15 @@ class TxPacket(Packet):
                                self.coat.packed,
                                self.foot.packed])
 
+    def seal(self):
+        '''
+        Box segnacl coat sized by prepack once known to be unsegmented
+        '''
+        if self.data['ck'] == raeting.coatKinds.segnacl:
+            self.coat.seal()
+            self.packed = ''.join([self.head.packed,
+                                   self.coat.packed,
+                                   self.foot.packed])
 
     def pack(self):
         '''
@@ -588,6 +1037,7 @@ class TxPacket(Packet):
                     self.size, raeting.UDP_MAX_PACKET_SIZE)
             raise raeting.PacketError(emsg)
 
+        self.seal()
         self.sign()
 
 class RxPacket(Packet):
@@ -627,14 +1077,36 @@ class RxPacket(Packet):
             return False
         return (self.stack.remotes[nuid].verfer.verify(signature, msg))
 
+    def authenticate(self, authenticator, msg):
+        '''
+        Return result of authenticating msg with session authenticator
+        Only allowed remotes of stacks that accept authenticators qualify
+        '''
+        nuid = self.data['de']
+        remote = self.stack.remotes.get(nuid)
+        if not (remote and self.stack.authed and remote.allowed and remote.boxer):
+            return False
+        return (remote.boxer.verify(authenticator, msg))
+
     def decrypt(self, cipher, nonce):
         '''
         Return msg resulting from decrypting cipher and nonce
         with short term keys
         '''
         remote = self.stack.remotes[self.data['de']]
+        if remote.boxer:
+            return (remote.boxer.decrypt(cipher, nonce))
         return (remote.privee.decrypt(cipher, nonce, remote.publee.key))
 
+    def decompress(self, packed):
+        '''
+        Return msg from packed compressed with session dictionary of remote if any
+        '''
+        remote = self.stack.remotes.get(self.data['de']) if self.stack else None
+        if remote and remote.zipper:
+            return (remote.zipper.decompress(packed))
+        return (zipping.decompress(packed))
+
     def parse(self, packed=None):
         '''
         Parses raw packet completely
@@ -677,20 +1149,25 @@ class RxPacket(Packet):
         '''
         hl = self.data['hl']
         fl = self.data['fl']
-        self.coat.packed = self.packed[hl:self.size - fl] #coat.parse loads body.packed
+        # view not copy, coat.parse loads body.packed
+        self.coat.packed = memoryview(self.packed)[hl:self.size - fl]
 
-    def parseInner(self):
+    def parseInner(self, lazy=False):
         '''
         Assumes the head as already been parsed so self.data is valid
         Assumes packet as already been unpacked
         Assumes foot signature has already been verified if any
         Parses coat if given and decrypts enclosed body
         Parses decrypted body and deserializes
+        If lazy defers both until .body.data is first read
         Returns True if decrypted deserialize successful Otherwise False
         Result is .body.data and .data
         Raises PacketError exception If failure
         '''
         self.unpackInner()
+        if lazy:
+            self.coat.lazy = self.body.lazy = True
+            return
         self.coat.parse()
         self.body.parse()
 
@@ -719,15 +1196,26 @@ class Tray(object):
 class TxTray(Tray):
     '''
     Manages an outgoing message and ites associated packet(s)
+
+    When .fec is set a segmented message is followed by one XOR parity
+    segment per block of .fec segments so the receiver can rebuild one lost
+    segment per block without a resend. Parity segment numbers start at sc
+    so .packets index is still segment number. Binary heads have no parity
+    block field so are sent without parity.
     '''
-    def __init__(self, **kwa):
+    def __init__(self, template=None, fec=0, **kwa):
         '''
         Setup instance
+        template is HeadTemplate for the packets if any
+        fec is segments per XOR parity segment of segmented message, 0 is none
         '''
         super(TxTray, self).__init__(**kwa)
+        self.template = template
+        self.fec = fec
         self.packets = []
         self.current = 0 # next  packet to send
         self.last = 0 # last packet sent
+        self.zv = None # session dictionary version defined by message if any
 
     def pack(self, data=None, body=None):
         '''
@@ -737,68 +1225,328 @@ class TxTray(Tray):
             self.data.update(data)
         if body is not None:
             self.body = body
+        if isinstance(self.body, BatchBody):
+            self.data['mc'] = self.body.count
 
         self.current = 0
         self.packets = []
         packet = TxPacket(stack=self.stack,
                           kind=raeting.pcktKinds.message,
                           embody=self.body,
-                          data=self.data)
+                          data=self.data,
+                          template=self.template)
 
         packet.prepack()
+        self.zv = packet.body.zv
         if packet.size <= raeting.UDP_MAX_PACKET_SIZE:
+            packet.seal()
             packet.sign()
             self.packets.append(packet)
         else:
+            segsize = self.segmentSize(headsize=packet.head.size,
+                                       footsize=packet.foot.size)
+            if self.data['ck'] == raeting.coatKinds.segnacl: # box per segment
+                packet.coat.seal(segsize=segsize)
             self.packed = packet.coat.packed
-            self.packetize(headsize=packet.head.size, footsize=packet.foot.size)
+            self.packetize(segsize=segsize)
 
-    def packetize(self, headsize, footsize):
+    @property
+    def parity(self):
         '''
-        Create packeted segments from .packed using headsize footsize
+        Property is segments per parity segment, 0 if none for head kind
+        '''
+        return (self.fec if self.data['hk'] != raeting.headKinds.binary else 0)
+
+    def segmentSize(self, headsize, footsize):
+        '''
+        Returns coat bytes per segment given unsegmented headsize footsize
         '''
         extrasize = 0
         if self.data['hk'] == raeting.headKinds.raet:
             extrasize = 27 # extra header size as a result of segmentation
+            if self.parity:
+                extrasize += len("\npb {0:x}".format(self.parity))
         elif self.data['hk'] == raeting.headKinds.json:
             extrasize = 36 # extra header size as a result of segmentation
+            if self.parity:
+                extrasize += len(',"pb":{0}'.format(self.parity))
+        # binary head is fixed length so no extra size
 
         hotelsize = headsize + extrasize + footsize
-        segsize = raeting.UDP_MAX_PACKET_SIZE - hotelsize
+        return (raeting.UDP_MAX_PACKET_SIZE - hotelsize)
 
+    def packetize(self, segsize):
+        '''
+        Create packeted segments from .packed of segsize bytes each
+        '''
         segcount = (self.size // segsize) + (1 if self.size % segsize else 0)
+        pb = self.parity
+        if segcount + parities(segcount, pb) > raeting.MAX_SEGMENT_COUNT:
+            pb = 0 # no room for parity segment numbers
+        values = [0L] * parities(segcount, pb) # XOR of segments per block
         for i in range(segcount):
             if i == segcount - 1: #last segment
                 segment = self.packed[i * segsize:]
             else:
                 segment = self.packed[i * segsize: (i+1) * segsize]
+            if pb:
+                values[i // pb] ^= xorValue(segment, segsize)
+            self.packets.append(self.packetSegment(segment, sn=i, sc=segcount, pb=pb))
+
+        for j, value in enumerate(values): # parity segments follow data segments
+            self.packets.append(self.packetSegment(xorChunk(value, segsize),
+                                                   sn=segcount + j,
+                                                   sc=segcount,
+                                                   pb=pb))
+
+    def packetSegment(self, segment, sn, sc, pb=0):
+        '''
+        Returns signed packet of segment number sn of sc with parity block pb
+        '''
+        packet = TxPacket( stack=self.stack,
+                            data=self.data,
+                            template=self.template)
+        packet.data.update(sn=sn, sc=sc, ml=self.size, sf=True, pb=pb)
+        packet.coat.packed = packet.body.packed = segment
+        packet.foot.pack()
+        packet.head.pack()
+        packet.packed = ''.join([  packet.head.packed,
+                                    packet.coat.packed,
+                                    packet.foot.packed])
+        packet.sign()
+        return packet
+
+
+class Segments(object):
+    '''
+    Lazy sequence of the packets of a TxStream
+    Packet sn is packed on first access and kept until released
+    '''
+    def __init__(self, stream):
+        '''
+        Setup instance
+        '''
+        self.stream = stream
+        self.packets = dict() # packed but unreleased packets keyed by sn
 
-            packet = TxPacket( stack=self.stack,
-                                data=self.data)
-            packet.data.update(sn=i, sc=segcount, ml=self.size, sf=True)
-            packet.coat.packed = packet.body.packed = segment
-            packet.foot.pack()
-            packet.head.pack()
-            packet.packed = ''.join([  packet.head.packed,
-                                        packet.coat.packed,
-                                        packet.foot.packed])
-            packet.sign()
-            self.packets.append(packet)
+    def __len__(self):
+        '''
+        Returns segment count of stream
+        '''
+        return self.stream.sc
+
+    def __getitem__(self, sn):
+        '''
+        Returns packet sn or list of packets if sn is slice
+        Raises PacketError if packet sn was released or source fails
+        '''
+        if isinstance(sn, slice):
+            return [self[i] for i in xrange(*sn.indices(len(self)))]
+        if sn < 0:
+            sn += len(self)
+        if not 0 <= sn < len(self):
+            raise IndexError("Segment number '{0}' out of range".format(sn))
+        if sn not in self.packets:
+            self.packets[sn] = self.stream.segment(sn)
+        return self.packets[sn]
+
+    def release(self, sn):
+        '''
+        Drop packet sn once acked
+        '''
+        self.packets.pop(sn, None)
+
+class TxStream(TxTray):
+    '''
+    Manages an outgoing raw message streamed from a file like or chunk
+    iterator source. Segments are read, encrypted and signed only when the
+    send window first reaches them and released once acked so memory is
+    bounded by the window not the message size.
+
+    Nacl coats become segnacl so each segment is its own box. Integrity
+    check coats need the whole body so become nada.
+    '''
+    def __init__(self, source=None, length=None, **kwa):
+        '''
+        Setup instance
+        source is file like with .read or iterable of string chunks
+        length is number of bytes in source, found by seeking if None
+        '''
+        super(TxStream, self).__init__(**kwa)
+        self.source = source
+        self.length = length
+        self.reader = getattr(source, 'read', None)
+        self.chunks = None if self.reader else iter(source)
+        self.remainder = '' # pulled from source but not yet segmented
+        self.sc = 0 # segment count
+        self.ml = 0 # message length of all segment coats
+        self.chunksize = 0 # source bytes per segment
+        self.next = 0 # next segment number to read from source
+
+    def pack(self, data=None, body=None):
+        '''
+        Size segments of stream. Packets are packed lazily by .packets
+        '''
+        if data:
+            self.data.update(data)
+        self.data['bk'] = raeting.bodyKinds.raw
+        if self.data['ck'] == raeting.coatKinds.nacl:
+            self.data['ck'] = raeting.coatKinds.segnacl
+        elif self.data['ck'] != raeting.coatKinds.segnacl:
+            self.data['ck'] = raeting.coatKinds.nada
+
+        if self.length is None:
+            try: # seekable so size is remainder from current position
+                here = self.source.tell()
+                self.source.seek(0, 2)
+                self.length = self.source.tell() - here
+                self.source.seek(here)
+            except (AttributeError, IOError, OSError, ValueError) as ex:
+                emsg = "Stream length required for unseekable source"
+                raise raeting.PacketError(emsg)
+        if not 0 <= self.length <= raeting.MAX_MESSAGE_SIZE:
+            emsg = "Stream length of {0}, exceeds max of {1}".format(
+                     self.length, raeting.MAX_MESSAGE_SIZE)
+            raise raeting.PacketError(emsg)
+
+        overhead = 0
+        if self.data['ck'] == raeting.coatKinds.segnacl:
+            overhead = SEAL_SIZE
+
+        # largest head of any segment bounds the segment size
+        probe = TxPacket(stack=self.stack, data=self.data)
+        probe.data.update(sn=raeting.MAX_SEGMENT_COUNT - 1,
+                          sc=raeting.MAX_SEGMENT_COUNT,
+                          ml=raeting.MAX_MESSAGE_SIZE,
+                          sf=True)
+        probe.coat.packed = 'x'
+        probe.foot.pack()
+        probe.head.pack()
+        self.chunksize = (raeting.UDP_MAX_PACKET_SIZE - probe.head.size -
+                          probe.foot.size - overhead)
+
+        self.sc = max(1, (self.length // self.chunksize) +
+                         (1 if self.length % self.chunksize else 0))
+        if self.sc > raeting.MAX_SEGMENT_COUNT:
+            emsg = "Stream segment count of {0}, exceeds max of {1}".format(
+                     self.sc, raeting.MAX_SEGMENT_COUNT)
+            raise raeting.PacketError(emsg)
+        self.ml = self.length + self.sc * overhead
+        self.current = 0
+        self.next = 0
+        self.packets = Segments(self)
+
+    def read(self, size):
+        '''
+        Returns next size bytes of source, fewer only if source ended
+        '''
+        chunks = [self.remainder]
+        have = len(self.remainder)
+        while have < size:
+            chunk = self.reader(size - have) if self.reader else next(self.chunks, '')
+            if not chunk:
+                break
+            chunks.append(chunk)
+            have += len(chunk)
+        chunk = "".join(chunks)
+        self.remainder = chunk[size:]
+        return chunk[:size]
+
+    def segment(self, sn):
+        '''
+        Returns signed packet of segment sn read from source
+        Raises PacketError if not next in order or source ended early
+        '''
+        if sn != self.next:
+            emsg = "Stream segment '{0}' released or out of order".format(sn)
+            raise raeting.PacketError(emsg)
+        size = (self.chunksize if sn < self.sc - 1
+                else self.length - sn * self.chunksize)
+        chunk = self.read(size)
+        if len(chunk) != size:
+            emsg = "Stream source ended at {0} of {1} bytes".format(
+                    sn * self.chunksize + len(chunk), self.length)
+            raise raeting.PacketError(emsg)
+        self.next += 1
 
+        if self.sc == 1:
+            packet = TxPacket(stack=self.stack,
+                              kind=raeting.pcktKinds.message,
+                              embody=chunk,
+                              data=self.data,
+                              template=self.template)
+            packet.pack()
+            return packet
+
+        packet = TxPacket(stack=self.stack,
+                          data=self.data,
+                          template=self.template)
+        packet.data.update(sn=sn, sc=self.sc, ml=self.ml, sf=True)
+        packet.body.packed = chunk
+        if packet.data['ck'] == raeting.coatKinds.segnacl:
+            packet.coat.seal()
+        else:
+            packet.coat.packed = chunk
+        packet.foot.pack()
+        packet.head.pack()
+        packet.packed = ''.join([packet.head.packed,
+                                 packet.coat.packed,
+                                 packet.foot.packed])
+        packet.sign()
+        return packet
 
 class RxTray(Tray):
     '''
     Manages segmentated messages and the associated packets
+
+    Segments are copied straight into .buffer at offset sn times the segment
+    size so reassembly is one slice copy per segment and completion is a count
+    check. The .buffer grows as segments arrive instead of being preallocated
+    from the ml head field so memory is bounded by what was received.
+
+    When .lazy the completed message .body is the decrypted but not yet
+    deserialized RxBody instead of its .data
+
+    Segnacl coats are one box per segment so each is decrypted as it arrives
+    and its plaintext copied into .buffer, spreading the crypto work over the
+    arrivals instead of one burst on completion.
+
+    When .sink returns a target for a raw message with per segment coats,
+    segments are decrypted as they arrive and the in order prefix is written
+    to the target instead of reassembled so only out of order segments are
+    held. The completed message .body is then the target. A target of a
+    message that fails before completing is closed by .abort.
+
+    When the pb head field is set, segments numbered from sc are XOR parity
+    of each block of pb segments. Arriving segments are XOR folded per block
+    so once a block's parity is in and only one of its segments is missing
+    that segment is rebuilt from the fold as if it had arrived.
     '''
-    def __init__(self, segments=None, **kwa):
+    def __init__(self, lazy=False, sink=None, **kwa):
         '''
         Setup instance
+        sink is callable(data) of first packet head data that returns file like
+        with .write or callable of chunk to stream message to or None
         '''
         super(RxTray, self).__init__(**kwa)
-        self.segments = segments if segments is not None else []
+        self.lazy = lazy
+        self.sink = sink
+        self.target = None # file like or callable message is streamed to
+        self.pending = dict() # decrypted out of order segments keyed by sn
+        self.delivered = 0 # segment number of next chunk to write to target
+        self.buffer = None # bytearray to reassemble segments into up to ml bytes
+        self.sc = 0 # segment count of message
+        self.segsize = 0 # size of every segment but the last
         self.complete = False
         self.last = 0 # last packet number received
         self.prev = 0 # previous packet number received
+        self.first = 0 # lowest segment number not yet received
+        self.bitmap = 0 # bit i is set when segment first + i received
+        self.count = 0 # number of distinct segments received
+        self.pb = 0 # segments per parity block, 0 if no parity
+        self.parities = set() # parity blocks whose parity segment received
+        self.folds = dict() # XOR of received segments keyed by parity block
+        self.rebuilt = 0 # number of segments rebuilt from parity
 
     def parse(self, packet):
         '''
@@ -812,61 +1560,287 @@ class RxTray(Tray):
 
         if sc == 1:
             self.data.update(packet.data)
-            packet.parseInner()
-            self.body = packet.body.data
+            packet.parseInner(lazy=True)
+            self.body = self.decode(packet)
             self.complete = True
+            if self.open():
+                self.write(packet.body.data)
+                self.body = self.target
             return self.body
 
-        if not self.segments: #get data from first packet received
+        if not self.sc: #get data from first packet received
+            ml = packet.data['ml']
+            if not (sc <= ml <= raeting.MAX_MESSAGE_SIZE):
+                emsg = "Invalid message length '{0}' for '{1}' segments".format(ml, sc)
+                raise raeting.PacketError(emsg)
             self.data.update(packet.data)
-            self.segments = [None] * sc
+            self.sc = sc
+            self.pb = packet.data['pb']
+            if not self.open():
+                self.buffer = bytearray()
+
+        if (sc != self.sc or packet.data['pb'] != self.pb or
+                not (0 <= sn < sc + parities(sc, self.pb))):
+            emsg = "Invalid segment number '{0}' of count '{1}' expected count '{2}'".format(
+                    sn, sc, self.sc)
+            raise raeting.PacketError(emsg)
 
         hl = packet.data['hl']
-        fl = packet.data['fl']
-        segment = packet.packed[hl:packet.size - fl]
+        size = packet.size - packet.data['fl'] - hl
+        ml = self.data['ml']
+        coat = memoryview(packet.packed)[hl:hl + size]
+
+        if sn >= sc: # parity of block
+            block = sn - sc
+            if block in self.parities: # duplicate
+                return None
+            if not self.segsize: # parity is full segment size
+                self.segsize = size
+            if size != self.segsize:
+                emsg = "Invalid segment size '{0}' of segment '{1}'".format(size, sn)
+                raise raeting.PacketError(emsg)
+            self.parities.add(block)
+            self.fold(block, coat)
+
+        else:
+            if sn < self.first or self.bitmap & (1 << (sn - self.first)): # duplicate
+                return None
+            if not self.segsize: # all but last segment are same size
+                self.segsize = size if sn < sc - 1 else (ml - size) // (sc - 1)
+            offset = sn * self.segsize
+            if ((size != self.segsize) if sn < sc - 1 else (offset + size != ml)):
+                emsg = "Invalid segment size '{0}' of segment '{1}'".format(size, sn)
+                raise raeting.PacketError(emsg)
+            self.accept(packet, sn, coat)
+            if not self.pb:
+                block = None
+            else:
+                block = sn // self.pb
+                self.fold(block, coat)
 
-        self.segments[sn] = segment
-        if None in self.segments: #don't have all segments yet
+        if block is not None:
+            self.rebuild(packet, block)
+        if self.count < sc: #don't have all segments yet
             return None
+        if self.target is not None:
+            self.complete = True
+            self.body = self.target
+            return self.body
         self.body = self.desegmentize()
         return self.body
 
+    def accept(self, packet, sn, coat):
+        '''
+        Place memoryview coat of segment sn in .buffer or stream to target
+        '''
+        if self.target is not None:
+            self.stream(packet, sn, coat.tobytes())
+        elif self.data['ck'] == raeting.coatKinds.segnacl: # open box on arrival
+            chunk = self.unbox(packet, coat.tobytes())
+            self.place(sn * (self.segsize - SEAL_SIZE), chunk)
+        else:
+            self.place(sn * self.segsize, coat)
+        self.count += 1
+        self.bitmap |= 1 << (sn - self.first)
+        if sn == self.first: # shift in order prefix out of bitmap
+            run = (~self.bitmap & (self.bitmap + 1)).bit_length() - 1
+            self.bitmap >>= run
+            self.first += run
+
+    def place(self, offset, chunk):
+        '''
+        Copy chunk into .buffer at offset growing .buffer only as far as needed
+        '''
+        stop = offset + len(chunk)
+        if stop > len(self.buffer):
+            self.buffer.extend(bytearray(stop - len(self.buffer)))
+        self.buffer[offset:stop] = chunk
+
+    def fold(self, block, coat):
+        '''
+        XOR coat into fold of parity block
+        '''
+        self.folds[block] = self.folds.get(block, 0L) ^ xorValue(coat, self.segsize)
+
+    def rebuild(self, packet, block):
+        '''
+        Rebuild the one missing segment of parity block if its parity is in
+        Drops fold of block once no segment is missing
+        '''
+        first = block * self.pb
+        stop = min(first + self.pb, self.sc)
+        gaps = self.gaps(begin=first, end=stop)
+        if not gaps:
+            self.folds.pop(block, None)
+            return
+        if block not in self.parities or gaps != [(gaps[0][0], gaps[0][0] + 1)]:
+            return
+        sn = gaps[0][0]
+        size = self.segsize if sn < self.sc - 1 else self.data['ml'] - sn * self.segsize
+        segment = xorChunk(self.folds.pop(block), self.segsize)
+        if segment[size:].strip('\x00'): # padding of short last segment
+            emsg = "Invalid parity of segment '{0}'".format(sn)
+            raise raeting.PacketError(emsg)
+        self.accept(packet, sn, memoryview(segment)[:size])
+        self.rebuilt += 1
+
+    def unrepaired(self, block):
+        '''
+        Returns missing segment numbers parity cannot rebuild once parity of
+        block is in. Parity is sent in block order so blocks after the prior
+        received parity lost theirs and block itself rebuilds only one
+        '''
+        prior = max([b for b in self.parities if b < block] or [-1])
+        misseds = []
+        for b in xrange(prior + 1, block + 1):
+            first = b * self.pb
+            blocked = self.missing(begin=first, end=first + self.pb)
+            misseds.extend(blocked[:-1] if b in self.parities else blocked)
+        return misseds
+
+    def open(self):
+        '''
+        Returns True if message is streamed to target from .sink
+        Only raw messages whose segments decrypt independently qualify
+        '''
+        if (self.sink is None or
+                self.data['bk'] != raeting.bodyKinds.raw or
+                self.data['ck'] not in (raeting.coatKinds.segnacl,
+                                        raeting.coatKinds.nada)):
+            return False
+        self.target = self.sink(self.data)
+        return (self.target is not None)
+
+    def write(self, chunk):
+        '''
+        Write chunk to target
+        Raises PacketError if target fails
+        '''
+        try:
+            if hasattr(self.target, 'write'):
+                self.target.write(chunk)
+            else:
+                self.target(chunk)
+        except (IOError, OSError) as ex:
+            emsg = "Failed writing stream. {0}".format(ex)
+            raise raeting.PacketError(emsg)
+
+    def abort(self):
+        '''
+        Close target of incomplete streamed message if it has .close so it is
+        not left half written. Returns True if target was aborted
+        '''
+        if self.target is None or self.complete:
+            return False
+        target, self.target = self.target, None
+        self.pending.clear()
+        if hasattr(target, 'close'):
+            try:
+                target.close()
+            except (IOError, OSError) as ex:
+                console.terse("Failed closing stream. {0}\n".format(ex))
+        return True
+
+    def unbox(self, packet, coat):
+        '''
+        Returns plaintext of segnacl coat box of segment packet
+        Raises PacketError if decryption fails
+        '''
+        tl = raeting.tailSizes.segnacl
+        if len(coat) <= SEAL_SIZE:
+            emsg = "Invalid coat segment size '{0}'".format(len(coat))
+            raise raeting.PacketError(emsg)
+        try:
+            return (packet.decrypt(coat[:-tl], coat[-tl:]))
+        except nacling.CRYPT_ERRORS as ex:
+            emsg = "Failed segment decryption. {0}".format(ex)
+            raise raeting.PacketError(emsg)
+
+    def stream(self, packet, sn, coat):
+        '''
+        Decrypt coat of segment sn and write any in order prefix to target
+        Raises PacketError if decryption fails
+        '''
+        if self.data['ck'] == raeting.coatKinds.segnacl:
+            chunk = self.unbox(packet, coat)
+        else:
+            chunk = coat
+        self.pending[sn] = chunk
+        while self.delivered in self.pending:
+            self.write(self.pending.pop(self.delivered))
+            self.delivered += 1
+
     def missing(self, begin=None, end=None):
         '''
         return list of missing packet numbers between begin and end
         '''
-        if begin is None:
-            begin = 0
-        if end is None:
-            end = len(self.segments)
-        if begin >= end:
-            return []
         misseds = []
-        for i, segment in enumerate(self.segments[begin:end]):
-            if segment is None:
-                misseds.append(i)
+        for first, stop in self.gaps(begin=begin, end=end):
+            misseds.extend(range(first, stop))
         return misseds
 
+    @property
+    def contiguous(self):
+        '''
+        Property is number of segments received in order from segment 0
+        '''
+        return self.first
+
+    def gaps(self, begin=None, end=None):
+        '''
+        return list of (first, stop) ranges of missing packet numbers between
+        begin and end where stop is one past the last missing in range
+        Uses .bitmap from .first so cost is per gap and out of order window
+        not per segment
+        '''
+        if begin is None or begin < self.first:
+            begin = self.first
+        if end is None or end > self.sc: # parity segments are not resent
+            end = self.sc
+        if begin >= end:
+            return []
+        holes = ~(self.bitmap >> (begin - self.first)) & ((1 << (end - begin)) - 1)
+        ranges = []
+        first = begin
+        while holes:
+            skip = (holes & -holes).bit_length() - 1 # received before gap
+            holes >>= skip
+            first += skip
+            run = (~holes & (holes + 1)).bit_length() - 1 # missing in gap
+            ranges.append((first, first + run))
+            holes >>= run
+            first += run
+        return ranges
+
     def desegmentize(self):
         '''
         Process message packet assumes already parsed outer so verified signature
         and processed header data
         '''
-        sc = self.data['sc']
-        self.packed = "".join(self.segments)
-        ml = self.data['ml']
-        if sc > 1 and self.size != ml:
-            emsg = ("Full message payload length '{0}' does not equal head field"
-                                          " '{1}'".format(self.size, ml))
-            raise raeting.PacketError(emsg)
-
         packet = RxPacket(stack = self.stack, data=self.data)
-        packet.coat.packed = self.packed
-
-        packet.coat.parse()
-        packet.body.parse()
+        packet.body.lazy = True
         self.complete = True
+        if self.data['ck'] == raeting.coatKinds.segnacl: # opened on arrival
+            ml = self.data['ml'] - self.sc * SEAL_SIZE
+            self.packed = packet.body.packed = bytes(self.buffer[:ml])
+            self.buffer = None
+            return self.decode(packet, opened=True)
+
+        self.packed = bytes(self.buffer)
+        self.buffer = None
+        packet.coat.packed = self.packed
+        return self.decode(packet)
 
+    def decode(self, packet, opened=False):
+        '''
+        Decrypt coat of packet while session keys are current unless opened
+        Returns body data of packet or lazy body if .lazy
+        Coalesced bodies are never lazy since they are split on receipt
+        '''
+        if not opened:
+            packet.coat.parse()
+        if self.lazy and not packet.data['mc']:
+            return packet.body
         return packet.body.data
 
 
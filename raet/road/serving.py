@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+'''
+serving.py raet protocol batched udp server classes
+
+Uses the Linux recvmmsg and sendmmsg system calls via ctypes so that a burst
+of datagrams is moved in one system call instead of one call per datagram.
+Falls back to per datagram recvfrom and sendto when these are not available.
+'''
+# pylint: skip-file
+# pylint: disable=W0611
+
+# Import python libs
+import socket
+import os
+import errno
+import struct
+import ctypes
+import ctypes.util
+from collections import OrderedDict
+
+# Import ioflo libs
+from ioflo.base import aiding
+
+from .. import raeting
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+MSG_DONTWAIT = 0x40
+MSG_TRUNC = 0x20
+
+class Iovec(ctypes.Structure):
+    '''
+    struct iovec
+    '''
+    _fields_ = [('iov_base', ctypes.c_void_p),
+                ('iov_len', ctypes.c_size_t)]
+
+class Msghdr(ctypes.Structure):
+    '''
+    struct msghdr
+    '''
+    _fields_ = [('msg_name', ctypes.c_void_p),
+                ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(Iovec)),
+                ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p),
+                ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+class Mmsghdr(ctypes.Structure):
+    '''
+    struct mmsghdr
+    '''
+    _fields_ = [('msg_hdr', Msghdr),
+                ('msg_len', ctypes.c_uint)]
+
+def _loadMmsg():
+    '''
+    Returns duple (recvmmsg, sendmmsg) of libc functions or (None, None)
+    when not available on this platform
+    '''
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        recvmmsg = libc.recvmmsg
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError, TypeError):
+        return (None, None)
+
+    recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(Mmsghdr), ctypes.c_uint,
+                         ctypes.c_int, ctypes.c_void_p]
+    recvmmsg.restype = ctypes.c_int
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(Mmsghdr), ctypes.c_uint,
+                         ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return (recvmmsg, sendmmsg)
+
+recvmmsg, sendmmsg = _loadMmsg()
+MMSG = recvmmsg is not None and sendmmsg is not None # batched syscalls available
+
+MMSGHDR_SIZE = ctypes.sizeof(Mmsghdr)
+MSG_LEN_OFFSET = Mmsghdr.msg_len.offset
+MSG_FLAGS_OFFSET = Mmsghdr.msg_hdr.offset + Msghdr.msg_flags.offset
+IOVEC_SIZE = ctypes.sizeof(Iovec)
+IOV_LEN_OFFSET = Iovec.iov_len.offset
+MSG_NAME_PACKER = struct.Struct('P') # msghdr.msg_name void *
+MSG_LEN_PACKER = struct.Struct('I') # mmsghdr.msg_len unsigned int
+MSG_FLAGS_PACKER = struct.Struct('i') # msghdr.msg_flags int
+IOV_LEN_PACKER = struct.Struct('L') # iovec.iov_len size_t
+
+def packSockaddr(ha):
+    '''
+    Returns packed struct sockaddr_in for ipv4 host address duple ha
+    '''
+    host, port = ha
+    if host == '':
+        host = '0.0.0.0'
+    elif host == '<broadcast>':
+        host = '255.255.255.255'
+    try:
+        addr = socket.inet_aton(host)
+    except socket.error:
+        addr = socket.inet_aton(socket.gethostbyname(host))
+    return (struct.pack('=H', socket.AF_INET) + struct.pack('!H', port) +
+            addr + '\x00' * 8)
+
+def unpackSockaddr(raw):
+    '''
+    Returns host address duple (host, port) from packed struct sockaddr_in raw
+    '''
+    port, = struct.unpack_from('!H', raw, 2)
+    return (socket.inet_ntoa(raw[4:8]), port)
+
+class SocketUdpBatchNb(aiding.SocketUdpNb):
+    '''
+    Non blocking UDP socket server that receives and sends vectors of datagrams
+    with recvmmsg and sendmmsg. Provides .receiveMany and .sendMany in addition
+    to the per datagram .receive and .send of SocketUdpNb
+
+    The mmsghdr vectors and datagram buffers are preallocated when opened so
+    each batch only writes datagram lengths and addresses into them
+
+    Packed and unpacked addresses are cached for at most .Cache recently
+    used peers so spoofed or short lived peers do not grow memory. Datagrams
+    truncated to the buffer slot size are discarded and counted in .truncateds
+    '''
+    Count = 64 # default max datagrams per batched system call
+    Cache = 1024 # max addresses kept in each of .names and .sas
+
+    def __init__(self, count=None, **kwa):
+        '''
+        Setup instance
+
+        count is max number of datagrams moved by one batched system call
+        '''
+        super(SocketUdpBatchNb, self).__init__(**kwa)
+        self.count = count if count is not None else self.Count
+        self.mmsg = MMSG
+        self.names = OrderedDict() # (sockaddr buffer, address) keyed by destination ha
+        self.sas = OrderedDict() # source ha keyed by raw sockaddr port and address bytes
+        self.truncateds = 0 # truncated datagrams discarded since last reset
+        self.rxVec = None
+        self.txVec = None
+        self.rxBufs = None
+        self.txBufs = None
+
+    def _vector(self):
+        '''
+        Returns triple (vec, iovs, bufs) of preallocated mmsghdr vector,
+        iovec vector and datagram buffer with one .bs sized slot per entry
+        '''
+        bufs = ctypes.create_string_buffer(self.bs * self.count)
+        iovs = (Iovec * self.count)()
+        vec = (Mmsghdr * self.count)()
+        base = ctypes.addressof(bufs)
+        for i in range(self.count):
+            iovs[i].iov_base = base + i * self.bs
+            iovs[i].iov_len = self.bs
+            hdr = vec[i].msg_hdr
+            hdr.msg_namelen = 16 # sizeof(struct sockaddr_in)
+            hdr.msg_iov = ctypes.pointer(iovs[i])
+            hdr.msg_iovlen = 1
+        return (vec, iovs, bufs)
+
+    def open(self):
+        '''
+        Opens socket and preallocates receive and transmit vectors
+        '''
+        if not super(SocketUdpBatchNb, self).open():
+            return False
+        if self.mmsg:
+            self.rxVec, self.rxIovs, self.rxBufs = self._vector()
+            self.rxNames = ctypes.create_string_buffer(16 * self.count)
+            base = ctypes.addressof(self.rxNames)
+            for i in range(self.count):
+                self.rxVec[i].msg_hdr.msg_name = base + i * 16
+            self.txVec, self.txIovs, self.txBufs = self._vector()
+        return True
+
+    def close(self):
+        '''
+        Closes socket and releases receive and transmit vectors
+        '''
+        super(SocketUdpBatchNb, self).close()
+        self.rxVec = self.rxIovs = self.rxBufs = self.rxNames = None
+        self.txVec = self.txIovs = self.txBufs = None
+
+    def receiveMany(self):
+        '''
+        Perform non blocking batched read on socket.
+
+        returns list of up to .count duples of form (data, sa)
+        if no data then returns empty list
+        '''
+        if not self.mmsg:
+            rxes = []
+            while len(rxes) < self.count:
+                rx, sa = self.receive()
+                if not rx:
+                    break
+                rxes.append((rx, sa))
+            return rxes
+
+        result = recvmmsg(self.ss.fileno(), self.rxVec, self.count, MSG_DONTWAIT, None)
+        if result < 0:
+            err = ctypes.get_errno()
+            if err == errno.EAGAIN or err == errno.EWOULDBLOCK:
+                return []
+            emsg = "socket.error = {0}: receiving at {1}\n".format(
+                    os.strerror(err), self.ha)
+            console.terse(emsg)
+            raise socket.error(err, os.strerror(err))
+
+        rxes = []
+        bufs = ctypes.addressof(self.rxBufs)
+        names = self.rxNames.raw
+        for i in range(result):
+            flags, = MSG_FLAGS_PACKER.unpack_from(self.rxVec, i * MMSGHDR_SIZE + MSG_FLAGS_OFFSET)
+            if flags & MSG_TRUNC: # larger than buffer slot so incomplete
+                self.truncateds += 1
+                continue
+            size, = MSG_LEN_PACKER.unpack_from(self.rxVec, i * MMSGHDR_SIZE + MSG_LEN_OFFSET)
+            data = ctypes.string_at(bufs + i * self.bs, size)
+            raw = names[i * 16 + 2: i * 16 + 8] # port and address
+            sa = self.sas.pop(raw, None)
+            if sa is None:
+                sa = unpackSockaddr(names[i * 16: i * 16 + 16])
+                if len(self.sas) >= self.Cache:
+                    self.sas.popitem(last=False) # least recently used
+            self.sas[raw] = sa
+            rxes.append((data, sa))
+
+        console.profuse("Server at {0} received {1} datagrams\n".format(
+                str(self.ha), result))
+        return rxes
+
+    def sendMany(self, duples):
+        '''
+        Perform non blocking batched send on socket.
+
+        duples is sequence of up to .count (data, da) where da is destination
+        address duple. Returns the number of duples sent starting from the first.
+        Unsent duples were blocked or follow one that failed and should be tried
+        again later. Raises socket.error only when the first duple failed so
+        none were sent.
+        '''
+        if not self.mmsg:
+            sent = 0
+            for data, da in duples:
+                try:
+                    self.send(data, da)
+                except socket.error as ex:
+                    if ex.errno == errno.EAGAIN or ex.errno == errno.EWOULDBLOCK:
+                        break
+                    if not sent:
+                        raise
+                    break # failed one is first of next call
+                sent += 1
+            return sent
+
+        count = len(duples)
+        if count > self.count:
+            raise ValueError("Too many datagrams {0} for batch of {1}".format(
+                    count, self.count))
+        bufs = ctypes.addressof(self.txBufs)
+        names = [] # keep sockaddr buffers of batch alive past cache eviction
+        for i, (data, da) in enumerate(duples):
+            size = len(data)
+            if size > self.bs:
+                if not i:
+                    raise socket.error(errno.EMSGSIZE, os.strerror(errno.EMSGSIZE))
+                count = i # send those before so failed one is first of next call
+                break
+            name = self.names.pop(da, None)
+            if name is None:
+                buf = ctypes.create_string_buffer(packSockaddr(da), 16)
+                name = (buf, ctypes.addressof(buf))
+                if len(self.names) >= self.Cache:
+                    self.names.popitem(last=False) # least recently used
+            self.names[da] = name
+            names.append(name)
+            ctypes.memmove(bufs + i * self.bs, data, size)
+            MSG_NAME_PACKER.pack_into(self.txVec, i * MMSGHDR_SIZE, name[1])
+            IOV_LEN_PACKER.pack_into(self.txIovs, i * IOVEC_SIZE + IOV_LEN_OFFSET, size)
+
+        result = sendmmsg(self.ss.fileno(), self.txVec, count, MSG_DONTWAIT)
+        if result < 0:
+            err = ctypes.get_errno()
+            if err == errno.EAGAIN or err == errno.EWOULDBLOCK:
+                return 0
+            emsg = "socket.error = {0}: sending from {1}\n".format(
+                    os.strerror(err), self.ha)
+            console.terse(emsg)
+            raise socket.error(err, os.strerror(err))
+
+        console.profuse("Server at {0} sent {1} datagrams\n".format(
+                str(self.ha), result))
+        return result
@@ -29,10 +29,12 @@ from ioflo.base import storing
 from .. import raeting
 from .. import nacling
 from .. import stacking
+from .. import timing
 from . import keeping
 from . import packeting
 from . import estating
 from . import transacting
+from . import serving
 
 from ioflo.base.consoling import getConsole
 console = getConsole()
@@ -74,6 +76,44 @@ class RoadStack(stacking.KeepStack):
         The default offset to the start of period
     interim
         The default timeout to reap a dead remote
+    batched
+        Flag indicating if server should receive and send datagrams in batches
+        with recvmmsg and sendmmsg. Defaults to False
+    windowed
+        Flag indicating if segmented messages are sent with an adaptive
+        congestion window instead of all at once. Defaults to False
+    lazy
+        Flag indicating if received messages are put on .rxMsgs as lazy
+        packeting.RxBody instances whose .data is deserialized on first access
+        instead of as decoded mappings. Defaults to False
+    authed
+        Flag indicating if message and alive packets with remotes that also
+        advertise it at join use a session authenticator foot once allowed
+        instead of an Ed25519 signature. Defaults to False
+    zipped
+        Flag indicating if compressed body kinds to remotes that also advertise
+        it at join use a per session dictionary trained from sent bodies once
+        allowed. Defaults to False
+    sink
+        Callable sink(remote, data) called with the head data of the first
+        segment of each received raw message whose segments decrypt
+        independently, such as streams. Returns a file like with .write or a
+        callable of chunk that the message is written to in order as it
+        arrives, or None to receive it whole. The target is put on .rxMsgs
+        when the message completes or closed if it has .close when the
+        message fails. Defaults to None
+    fec
+        Number of segments per XOR parity segment sent with segmented
+        messages so the receiver rebuilds one lost segment per block without
+        a resend. 0 means no parity. Defaults to 0
+    coalesced
+        Flag indicating if small messages queued on .txMsgs to the same remote
+        are coalesced into one message of up to .CoalesceSize body bytes that
+        the receiver splits back into individual .rxMsgs. Defaults to False
+    delayed
+        Flag indicating if segments of received waiting messages are acked by
+        delayed cumulative acks and pending acks are piggybacked on other
+        acks and resend requests to the same remote. Defaults to False
     role
         The local estate role identifier for key management
     '''
@@ -85,8 +125,18 @@ class RoadStack(stacking.KeepStack):
     Bf = False # stack default for bcstflag
     Wf = False # stack default for waitflag
     Period = 1.0 # stack default for keep alive
+    IntervalGain = 0.125 # gain of smoothed interval between service passes
     Offset = 0.5 # stack default for keep alive
     Interim = 3600 # stack default for reap timeout
+    Batched = False # stack default for batched server receive and send
+    Windowed = False # stack default for congestion windowed messages
+    Lazy = False # stack default for lazy received message bodies
+    Authed = False # stack default for session authenticated allowed traffic
+    Zipped = False # stack default for session dictionary compression
+    Fec = 0 # stack default for segments per parity segment
+    Coalesced = False # stack default for coalesced small messages
+    Delayed = False # stack default for delayed cumulative message acks
+    CoalesceSize = raeting.UDP_MAX_PACKET_SIZE - raeting.MAX_HEAD_SIZE - 128 # one segment
     JoinerTimeout = 5.0 # stack default for joiner transaction timeout
     JoinentTimeout = 5.0 # stack default for joinent transaction timeout
 
@@ -111,6 +161,15 @@ class RoadStack(stacking.KeepStack):
                  period=None,
                  offset=None,
                  interim=None,
+                 batched=None,
+                 windowed=None,
+                 lazy=None,
+                 authed=None,
+                 zipped=None,
+                 sink=None,
+                 fec=None,
+                 coalesced=None,
+                 delayed=None,
                  **kwa
                  ):
         '''
@@ -143,6 +202,21 @@ class RoadStack(stacking.KeepStack):
         self.period = period if period is not None else self.Period
         self.offset = offset if offset is not None else self.Offset
         self.interim = interim if interim is not None else self.Interim
+        self.batched = batched if batched is not None else self.Batched
+        self.windowed = windowed if windowed is not None else self.Windowed
+        self.lazy = lazy if lazy is not None else self.Lazy
+        self.authed = authed if authed is not None else self.Authed
+        self.zipped = zipped if zipped is not None else self.Zipped
+        self.sink = sink
+        self.fec = fec if fec is not None else self.Fec
+        self.coalesced = coalesced if coalesced is not None else self.Coalesced
+        self.delayed = delayed if delayed is not None else self.Delayed
+        self.interval = 0.0 # smoothed seconds between service passes
+        self.serviced = None # stamp of last service pass
+        self.timers = timing.Scheduler() # transactions keyed by timer stop
+        self.remoteTimers = timing.Scheduler() # remotes keyed by presence timer stop
+        self.presences = odict() # remotes whose presence changed since manage
+        self.listings = dict() # name each remote is listed under in presence odicts
 
         super(RoadStack, self).__init__(puid=puid,
                                         keep=keep,
@@ -184,7 +258,11 @@ class RoadStack(stacking.KeepStack):
         '''
         Create local listening server for stack
         '''
-        server = aiding.SocketUdpNb(ha=self.ha,
+        if self.batched:
+            server = serving.SocketUdpBatchNb(ha=self.ha,
+                        bufsize=raeting.UDP_MAX_PACKET_SIZE * self.bufcnt)
+        else:
+            server = aiding.SocketUdpNb(ha=self.ha,
                         bufsize=raeting.UDP_MAX_PACKET_SIZE * self.bufcnt)
         return server
 
@@ -196,8 +274,16 @@ class RoadStack(stacking.KeepStack):
         if remote.timer.store is not self.store:
             raise raeting.StackError("Store reference mismatch between remote"
                     " '{0}' and stack '{1}'".format(remote.name, stack.name))
+        self.changePresence(remote)
         return remote
 
+    def renameRemote(self, remote, new, clear=True, dump=False):
+        '''
+        Rename remote with old remote.name to new name but keep same index
+        '''
+        super(RoadStack, self).renameRemote(remote=remote, new=new, clear=clear, dump=dump)
+        self.changePresence(remote)
+
     def removeRemote(self, remote, clear=True):
         '''
         Remove remote at key uid.
@@ -206,6 +292,16 @@ class RoadStack(stacking.KeepStack):
         super(RoadStack, self).removeRemote(remote=remote, clear=clear)
         for transaction in remote.transactions.values():
             transaction.nack()
+        remote.timer.cancel()
+        remote.reapTimer.cancel()
+        self.changePresence(remote)
+
+    def changePresence(self, remote):
+        '''
+        Mark remote whose allowed, alived or reaped status, name or membership
+        changed so next .manage updates its presence listings
+        '''
+        self.presences[remote] = remote
 
     def fetchRemoteByKeys(self, sighex, prihex):
         '''
@@ -393,28 +489,87 @@ class RoadStack(stacking.KeepStack):
         immediate indicates to run first attempt immediately and not wait for timer
 
         availables = dict of remotes that are both alive and allowed
+
+        Presence listings are updated only for remotes whose presence changed
+        since the last call so cost is per change not per remote
         '''
-        alloweds = odict()
-        aliveds = odict()
-        reapeds = odict()
-        for remote in self.remotes.values(): # should not start anything
+        if immediate:
+            dues = self.remotes.values()
+        else: # only remotes whose presence timers have come due
+            dues = [remote for remote in self.remoteTimers.pop(self.store.stamp)
+                        if self.remotes.get(remote.uid) is remote]
+        for remote in dues: # should not start anything
             remote.manage(cascade=cascade, immediate=immediate)
+            if remote.timer.expired and not remote.reaped: # alive not started
+                self.remoteTimers.push(self.store.stamp + self.period, remote)
+
+        plus = set()
+        minus = set()
+        presences, self.presences = self.presences, odict()
+        for remote in presences.values():
+            name = self.listings.pop(remote, None)
+            if name is not None: # unlist under old name
+                if self.aliveds.pop(name, None) is not None:
+                    minus.add(name)
+                self.alloweds.pop(name, None)
+                self.reapeds.pop(name, None)
+            if self.remotes.get(remote.uid) is not remote: # removed
+                continue
+            name = remote.name
+            self.listings[remote] = name
             if remote.allowed:
-                alloweds[remote.name] = remote
+                self.alloweds[name] = remote
             if remote.alived:
-                aliveds[remote.name] = remote
+                self.aliveds[name] = remote
+                if name in minus: # still alived
+                    minus.discard(name)
+                else:
+                    plus.add(name)
             if remote.reaped:
-                reapeds[remote.name] = remote
+                self.reapeds[name] = remote
 
-        old = set(self.aliveds.keys())
-        current = set(aliveds.keys())
-        plus = current.difference(old)
-        minus = old.difference(current)
-        self.availables = current
+        self.availables.difference_update(minus)
+        self.availables.update(plus)
         self.changeds = odict(plus=plus, minus=minus)
-        self.alloweds = alloweds
-        self.aliveds = aliveds
-        self.reapeds = reapeds
+
+    def serviceReceives(self):
+        '''
+        Retrieve from server all recieved and put on the rxes deque
+        When .batched receive up to server.count datagrams per system call
+        '''
+        if not self.batched:
+            return super(RoadStack, self).serviceReceives()
+        if self.server:
+            while True:
+                rxes = self.server.receiveMany()
+                self.rxes.extend(rxes)
+                if self.server.truncateds:
+                    self.incStat('truncated_datagram', self.server.truncateds)
+                    self.server.truncateds = 0
+                if len(rxes) < self.server.count: # drained socket
+                    break
+
+    def serviceTxes(self):
+        '''
+        Service the .txes deque to send messages through server
+        When .batched send up to server.count datagrams per system call
+        Blocked datagrams are kept in order at the front of .txes for later
+        A datagram that fails is dropped and the rest of its batch kept
+        '''
+        if not self.batched:
+            return super(RoadStack, self).serviceTxes()
+        if self.server:
+            while self.txes:
+                duples = [self.txes.popleft() for i in
+                                range(min(self.server.count, len(self.txes)))]
+                try:
+                    sent = self.server.sendMany(duples)
+                except socket.error:
+                    self.txes.extendleft(reversed(duples[1:])) # only first failed
+                    raise
+                if sent < len(duples): # blocked so try again later
+                    self.txes.extendleft(reversed(duples[sent:]))
+                    break
 
     def _handleOneRx(self):
         '''
@@ -594,6 +749,9 @@ class RoadStack(stacking.KeepStack):
 
         if (packet.data['tk'] == raeting.trnsKinds.message and
                 packet.data['pk'] == raeting.pcktKinds.message):
+            if packet.data['sn'] >= packet.data['sc']: # parity of done message
+                self.incStat('stale_parity')
+                return
             self.replyMessage(packet, remote)
             return
 
@@ -601,22 +759,60 @@ class RoadStack(stacking.KeepStack):
 
     def process(self):
         '''
-        Call .process or all remotes to allow timer based processing
-        of their transactions
-        '''
-        #for transaction in self.transactions.values():
-            #transaction.process()
-        for remote in self.remotes.values():
+        Call .process of remotes with transactions whose timers have come due
+        to allow timer based processing of their transactions
+        Also tracks smoothed .interval between service passes that advance
+        '''
+        stamp = self.store.stamp
+        if self.serviced is not None and stamp > self.serviced:
+            interval = stamp - self.serviced
+            if self.interval:
+                self.interval += self.IntervalGain * (interval - self.interval)
+            else: # first sample
+                self.interval = interval
+        self.serviced = stamp
+        remotes = odict()
+        for transaction in self.timers.pop(self.store.stamp):
+            remote = transaction.remote
+            if remote and self.remotes.get(remote.uid) is remote:
+                remotes[id(remote)] = remote
+        for remote in remotes.values():
             remote.process()
 
-    def parseInner(self, packet):
+    def remaining(self):
+        '''
+        Returns seconds until timer based processing of some transaction
+        is next due or None if there are no transaction timers scheduled
+        '''
+        stop = self.timers.peek()
+        if stop is None:
+            return None
+        return max(0.0, stop - self.store.stamp)
+
+    def remainingManage(self):
+        '''
+        Returns seconds until the presence timer of some remote is next due
+        so .manage has work or None if no presence timers are scheduled
+        Zero when presence listings have changes to update
+        '''
+        if self.presences:
+            return 0.0
+        stop = self.remoteTimers.peek()
+        if stop is None:
+            return None
+        return max(0.0, stop - self.store.stamp)
+
+    def parseInner(self, packet, lazy=False):
         '''
         Parse inner of packet and return
         Assume all drop checks done
+        When lazy the body is not decrypted nor deserialized until read
         '''
         try:
-            packet.parseInner()
-            console.verbose("{0} received packet body\n{1}\n".format(self.name, packet.body.data))
+            packet.parseInner(lazy=lazy)
+            if not lazy:
+                console.verbose("{0} received packet body\n{1}\n".format(
+                        self.name, packet.body.data))
         except raeting.PacketError as ex:
             console.terse(str(ex) + '\n')
             self.incStat('parsing_inner_error')
@@ -743,6 +939,27 @@ class RoadStack(stacking.KeepStack):
                                         rxPacket=packet)
         allowent.hello()
 
+    def footKind(self, remote):
+        '''
+        Returns foot kind for session traffic with remote
+        Remote foot kind if any else session authenticator if both ends are
+        authed and remote is allowed with encrypted coats else stack default
+        '''
+        if remote.fk is not None:
+            return remote.fk
+        if (self.authed and remote.authed and remote.allowed and
+                self.coatKind(remote) in (raeting.coatKinds.nacl,
+                                          raeting.coatKinds.segnacl)):
+            return raeting.footKinds.auth
+        return self.Fk
+
+    def coatKind(self, remote):
+        '''
+        Returns coat kind for session traffic with remote
+        Remote coat kind if any else stack default
+        '''
+        return remote.ck if remote.ck is not None else self.Ck
+
     def alive(self, uid=None, timeout=None, cascade=False):
         '''
         Initiate alive transaction
@@ -754,7 +971,10 @@ class RoadStack(stacking.KeepStack):
             console.terse(emsg)
             self.incStat('invalid_remote_eid')
             return
-        data = odict(hk=self.Hk, bk=self.Bk, fk=self.Fk, ck=self.Ck)
+        data = odict(hk=self.Hk,
+                     bk=self.Bk,
+                     fk=self.footKind(remote),
+                     ck=self.coatKind(remote))
         aliver = transacting.Aliver(stack=self,
                                     remote=remote,
                                     timeout=timeout,
@@ -766,7 +986,10 @@ class RoadStack(stacking.KeepStack):
         '''
         Correspond to new Alive transaction
         '''
-        data = odict(hk=self.Hk, bk=self.Bk, fk=self.Fk, ck=self.Ck)
+        data = odict(hk=self.Hk,
+                     bk=self.Bk,
+                     fk=self.footKind(remote),
+                     ck=self.coatKind(remote))
         alivent = transacting.Alivent(stack=self,
                                       remote=remote,
                                       bcst=packet.data['bf'],
@@ -776,34 +999,195 @@ class RoadStack(stacking.KeepStack):
                                       rxPacket=packet)
         alivent.alive()
 
-    def message(self, body=None, uid=None, timeout=None):
+    def transmit(self, msg, duid=None, callback=None):
+        '''
+        Augment transmit to also accept lazy received message body msg as
+        packeting.RxBody so it is forwarded without deserializing
+        When callback is provided triple (msg, duid, callback) is queued and
+        callback is called with True when msg is delivered else False
+        '''
+        if callback is None and not isinstance(msg, packeting.RxBody):
+            return super(RoadStack, self).transmit(msg, duid=duid)
+        if not isinstance(msg, (Mapping, packeting.RxBody)):
+            emsg = "Invalid msg, not a mapping {0}\n".format(msg)
+            console.terse(emsg)
+            self.incStat("invalid_transmit_body")
+            return
+        if duid is None:
+            if not self.remotes:
+                emsg = "No remote to send to\n"
+                console.terse(emsg)
+                self.incStat("invalid_destination")
+                return
+            duid = self.remotes.values()[0].uid
+        if callback is None:
+            self.txMsgs.append((msg, duid))
+        else:
+            self.txMsgs.append((msg, duid, callback))
+
+    def  _handleOneTxMsg(self):
+        '''
+        Take one message from .txMsgs deque and handle it
+        Entry is duple (body, duid) or triple (body, duid, callback)
+        '''
+        entry = self.txMsgs.popleft()
+        body, duid = entry[:2]
+        callback = entry[2] if len(entry) > 2 else None
+        self.message(body, duid, callback=callback)
+        console.verbose("{0} sending\n{1}\n".format(self.name, body))
+
+    @property
+    def coalescing(self):
+        '''
+        Property is True if queued messages are coalesced given .coalesced
+        and the stack head and body kinds. Binary heads have no mc field
+        '''
+        return (self.coalesced and
+                self.Hk != raeting.headKinds.binary and
+                packeting.ZIPPED.get(self.Bk, self.Bk) in (raeting.bodyKinds.json,
+                                                           raeting.bodyKinds.msgpack))
+
+    def serviceTxMsgs(self):
+        '''
+        Service .txMsgs queue of outgoing messages
+        When .coalescing the bodies to each remote are coalesced in queue order
+        into messages of up to .CoalesceSize bytes. Bodies that are empty,
+        larger or lazy received are sent alone after those before them
+        '''
+        if not self.coalescing:
+            return super(RoadStack, self).serviceTxMsgs()
+        sk = packeting.ZIPPED.get(self.Bk, self.Bk)
+        batches = odict() # batch body being coalesced keyed by destination uid
+        while self.txMsgs:
+            entry = self.txMsgs.popleft()
+            body, duid = entry[:2]
+            callback = entry[2] if len(entry) > 2 else None
+            part = None
+            if not isinstance(body, packeting.RxBody):
+                try:
+                    part = packeting.dumps(body, sk)
+                except (TypeError, ValueError, raeting.PacketError):
+                    pass # message reports the error
+            if not part or len(part) + 2 > self.CoalesceSize: # send alone
+                if duid in batches:
+                    self.coalesce(batches.pop(duid), duid)
+                self.message(body, duid, callback=callback)
+                continue
+            batch = batches.get(duid)
+            if batch and not batch.fits(part, self.CoalesceSize):
+                self.coalesce(batches.pop(duid), duid)
+                batch = None
+            if batch is None:
+                batch = batches[duid] = packeting.BatchBody(bk=sk)
+            batch.add(body, part, callback=callback)
+        for duid, batch in batches.items():
+            self.coalesce(batch, duid)
+
+    def coalesce(self, batch, duid):
+        '''
+        Send coalesced batch body to remote at duid as one message
+        whose completion is notified to the callback of each body
+        '''
+        if batch.count == 1:
+            self.message(batch.data[0], duid, callback=batch.callbacks[0])
+            return
+        self.incStat('coalesced_message', batch.count)
+        console.verbose("{0} sending {1} coalesced\n{2}\n".format(
+                self.name, batch.count, batch.data))
+        callback = batch.finish if any(batch.callbacks) else None
+        self.message(batch, duid, callback=callback)
+
+    def message(self, body=None, uid=None, timeout=None, callback=None):
         '''
         Initiate message transaction to remote at duid
         If duid is None then create remote at ha
+        callback is called with True when message completes else False
         '''
         remote = self.retrieveRemote(uid=uid)
         if not remote:
             emsg = "Invalid remote destination estate id '{0}'\n".format(uid)
             console.terse(emsg)
             self.incStat('invalid_remote_eid')
+            if callback:
+                callback(False)
             return
-        data = odict(hk=self.Hk, bk=self.Bk, fk=self.Fk, ck=self.Ck)
+        data = odict(hk=self.Hk,
+                     bk=self.Bk,
+                     fk=self.footKind(remote),
+                     ck=self.coatKind(remote))
         messenger = transacting.Messenger(stack=self,
                                           remote=remote,
                                           timeout=timeout,
                                           txData=data,
                                           bcst=self.Bf,
-                                          wait=self.Wf)
+                                          wait=self.Wf,
+                                          window=self.windowed,
+                                          callback=callback)
         messenger.message(body)
 
+    def broadcast(self, body=None, uids=None, timeout=None, callback=None, pace=None):
+        '''
+        Initiate broadcast of body to the remotes at uids, all allowed if None
+        Body is serialized once then each remote's message is encrypted and
+        signed with at most pace messages in flight
+        callback is called with the transacting.Broadcast once all complete
+        Returns the transacting.Broadcast whose .results has success per uid
+        '''
+        if uids is None:
+            uids = [remote.uid for remote in self.remotes.values() if remote.allowed]
+        broadcast = transacting.Broadcast(stack=self,
+                                          body=body,
+                                          uids=uids,
+                                          timeout=timeout,
+                                          callback=callback,
+                                          pace=pace)
+        broadcast.start()
+        return broadcast
+
+    def stream(self, source, length=None, uid=None, timeout=None, callback=None):
+        '''
+        Initiate streamed message transaction of raw bytes to remote at uid
+        source is file like with .read or iterable of string chunks
+        length is number of bytes, required if source is not seekable
+        Segments are read, encrypted and signed as the congestion window
+        advances and released once acked so memory is bounded by the window
+        Received as a raw string body on .rxMsgs
+        callback is called with True when stream completes else False
+        '''
+        remote = self.retrieveRemote(uid=uid)
+        if not remote:
+            emsg = "Invalid remote destination estate id '{0}'\n".format(uid)
+            console.terse(emsg)
+            self.incStat('invalid_remote_eid')
+            if callback:
+                callback(False)
+            return
+        data = odict(hk=self.Hk,
+                     bk=raeting.bodyKinds.raw,
+                     fk=self.footKind(remote),
+                     ck=self.coatKind(remote))
+        streamer = transacting.Streamer(stack=self,
+                                        remote=remote,
+                                        timeout=timeout,
+                                        txData=data,
+                                        bcst=self.Bf,
+                                        source=source,
+                                        length=length,
+                                        callback=callback)
+        streamer.message()
+
     def replyMessage(self, packet, remote):
         '''
         Correspond to new Message transaction
         '''
-        data = odict(hk=self.Hk, bk=self.Bk, fk=self.Fk, ck=self.Ck)
+        data = odict(hk=self.Hk,
+                     bk=self.Bk,
+                     fk=self.footKind(remote),
+                     ck=self.coatKind(remote))
         messengent = transacting.Messengent(stack=self,
                                             remote=remote,
                                             bcst=packet.data['bf'],
+                                            wait=packet.data['wf'],
                                             sid=packet.data['si'],
                                             tid=packet.data['ti'],
                                             txData=data,
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+'''
+Microbenchmark of parsing received signed and encrypted packets
+Reports time per parsed packet and compares in place signature verification
+with the former slice and join verification including the payload bytes each
+copies per packet. Python 2 has no tracemalloc so copies are counted from the
+buffers each path creates.
+
+Also reports time to packetize large segmented messages with and without a
+shared head template.
+
+Also reports throughput of the nacl coat and foot kinds against the sha2 and
+crc64 foot kinds and crc16 and crc64 coat kinds.
+
+Also reports the longest single segment arrival and the total receive time of
+large messages with the whole box nacl coat against the segnacl coat.
+
+Run as script
+    python bench_packeting.py
+'''
+from __future__ import print_function
+# pylint: skip-file
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+import os
+import time
+import tempfile
+import shutil
+
+from ioflo.base.odicting import odict
+from ioflo.base import storing
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+from raet import raeting, nacling
+from raet.road import keeping, estating, stacking, packeting
+
+def setUpModule():
+    console.reinit(verbosity=console.Wordage.concise)
+
+def tearDownModule():
+    pass
+
+class BenchTestCase(unittest.TestCase):
+    """
+    Benchmark receive packet parsing
+    """
+    Count = 5000 # packets parsed per run
+
+    def setUp(self):
+        self.store = storing.Store(stamp=0.0)
+        self.baseDirpath = tempfile.mkdtemp(prefix="raet",  suffix="base", dir='/tmp')
+        stacking.RoadStack.Bk = raeting.bodyKinds.json
+
+        mainDirpath = os.path.join(self.baseDirpath, 'road', 'keep', 'main')
+        otherDirpath = os.path.join(self.baseDirpath, 'road', 'keep', 'other')
+        keeping.clearAllKeep(mainDirpath)
+        keeping.clearAllKeep(otherDirpath)
+
+        self.main = stacking.RoadStack(name='main',
+                                       uid=1,
+                                       main=True,
+                                       auto=raeting.autoModes.once,
+                                       dirpath=mainDirpath,
+                                       store=self.store)
+        self.other = stacking.RoadStack(name='other',
+                                        uid=2,
+                                        auto=raeting.autoModes.once,
+                                        ha=("", raeting.RAET_TEST_PORT),
+                                        dirpath=otherDirpath,
+                                        store=self.store)
+
+        remote1 = estating.RemoteEstate(stack=self.main,
+                                        uid=2,
+                                        name='other',
+                                        ha=("127.0.0.1", raeting.RAET_TEST_PORT),
+                                        verkey=self.other.local.signer.verhex,
+                                        pubkey=self.other.local.priver.pubhex,)
+        self.main.addRemote(remote1)
+        remote0 = estating.RemoteEstate(stack=self.other,
+                                        uid=3,
+                                        name='main',
+                                        ha=('127.0.0.1', raeting.RAET_PORT),
+                                        verkey=self.main.local.signer.verhex,
+                                        pubkey=self.main.local.priver.pubhex,)
+        self.other.addRemote(remote0)
+        remote0.publee = nacling.Publican(key=remote1.privee.pubhex)
+        remote1.publee = nacling.Publican(key=remote0.privee.pubhex)
+        remote0.rebox()
+        remote1.rebox()
+
+    def tearDown(self):
+        self.main.server.close()
+        self.other.server.close()
+
+        self.main.clearAllDir()
+        self.other.clearAllDir()
+
+        if os.path.exists(self.baseDirpath):
+            shutil.rmtree(self.baseDirpath)
+
+    def packed(self, size):
+        '''
+        Returns packed signed and encrypted packet with body of about size bytes
+        '''
+        data = odict(hk=raeting.headKinds.raet,
+                     bk=raeting.bodyKinds.json,
+                     ck=raeting.coatKinds.nacl,
+                     fk=raeting.footKinds.nacl,
+                     se=2,
+                     de=3)
+        packet = packeting.TxPacket(stack=self.main,
+                                    embody=odict(stuff="".ljust(size, 'x')),
+                                    data=data)
+        packet.pack()
+        return packet.packed
+
+    def parse(self, packed):
+        '''
+        Returns seconds per parse of packed
+        '''
+        start = time.time()
+        for i in range(self.Count):
+            packet = packeting.RxPacket(stack=self.other, packed=packed)
+            packet.parseOuter()
+            packet.parseInner()
+        return (time.time() - start) / self.Count
+
+    def verifyJoined(self, packed, verfer):
+        '''
+        Former verification that sliced off the foot and joined a blank foot
+        Returns duple (seconds per verify, bytes copied per verify)
+        '''
+        fl = raeting.footSizes.nacl
+        start = time.time()
+        for i in range(self.Count):
+            signature = packed[len(packed) - fl:]
+            blank = "".rjust(fl, '\x00')
+            front = packed[:len(packed) - fl]
+            msg = "".join([front, blank])
+            verfer.key.verify(signature + msg) # former Verifier.verify
+        elapsed = (time.time() - start) / self.Count
+        copied = len(front) + len(msg) + len(signature + msg)
+        return (elapsed, copied)
+
+    def verifyInPlace(self, packed, verfer):
+        '''
+        Current verification of one bytearray copy blanked in place
+        Returns duple (seconds per verify, bytes copied per verify)
+        '''
+        fl = raeting.footSizes.nacl
+        start = time.time()
+        for i in range(self.Count):
+            signature = packed[len(packed) - fl:]
+            msg = bytearray(packed)
+            msg[len(packed) - fl:] = "".rjust(fl, '\x00')
+            verfer.verify(signature, msg)
+        elapsed = (time.time() - start) / self.Count
+        return (elapsed, len(msg))
+
+    def testBenchmark(self):
+        '''
+        Report time per parsed packet and per verification
+        '''
+        console.terse("{0}\n".format(self.testBenchmark.__doc__))
+        console.reinit(verbosity=console.Wordage.terse)
+        verfer = self.other.remotes.values()[0].verfer
+
+        for size in [64, 512, 800]:
+            packed = self.packed(size)
+            self.assertTrue(verfer.verify(packed[-64:], bytearray(packed[:-64] + '\x00' * 64)))
+            parse = self.parse(packed)
+            joined, joinedCopied = self.verifyJoined(packed, verfer)
+            inPlace, inPlaceCopied = self.verifyInPlace(packed, verfer)
+            console.terse("Packet {0} bytes: parse {1:.1f}us verify joined "
+                          "{2:.1f}us {3} bytes copied in place {4:.1f}us {5} bytes copied\n".format(
+                          len(packed), parse * 1e6, joined * 1e6, joinedCopied,
+                          inPlace * 1e6, inPlaceCopied))
+
+    def segment(self, size, hk, template):
+        '''
+        Returns duple (seconds per segment, segment count) to pack message of
+        about size bytes into unsigned segments of head kind hk
+        '''
+        data = odict(hk=hk,
+                     bk=raeting.bodyKinds.json,
+                     ck=raeting.coatKinds.nada,
+                     fk=raeting.footKinds.nada,
+                     se=2,
+                     de=3,
+                     si=5,
+                     ti=7,
+                     tk=raeting.trnsKinds.message)
+        body = odict(stuff="".ljust(size, 'x'))
+        count = 0
+        start = time.time()
+        for i in range(10):
+            tray = packeting.TxTray(stack=self.main, data=data, body=body,
+                    template=packeting.HeadTemplate() if template else None)
+            tray.pack()
+            count += len(tray.packets)
+        return ((time.time() - start) / count, len(tray.packets))
+
+    def testBenchmarkTemplate(self):
+        '''
+        Report time per segment packed with and without head template
+        '''
+        console.terse("{0}\n".format(self.testBenchmarkTemplate.__doc__))
+        console.reinit(verbosity=console.Wordage.terse)
+
+        for hk in [raeting.headKinds.raet, raeting.headKinds.json]:
+            for size in [100000, 1000000]:
+                plain, count = self.segment(size, hk, template=False)
+                cached, count = self.segment(size, hk, template=True)
+                console.terse("{0} head {1} segments: without template {2:.1f}us "
+                              "with template {3:.1f}us per segment\n".format(
+                              raeting.HEAD_KIND_NAMES[hk], count,
+                              plain * 1e6, cached * 1e6))
+
+    def kinds(self, size, ck, fk):
+        '''
+        Returns duple (seconds per pack and parse, packet length) of packet with
+        body of about size bytes using coat kind ck and foot kind fk
+        '''
+        data = odict(hk=raeting.headKinds.raet,
+                     bk=raeting.bodyKinds.json,
+                     ck=ck,
+                     fk=fk,
+                     se=2,
+                     de=3)
+        body = odict(stuff="".ljust(size, 'x'))
+        count = self.Count // 5
+        start = time.time()
+        for i in range(count):
+            packet = packeting.TxPacket(stack=self.main, embody=body, data=data)
+            packet.pack()
+            rxPacket = packeting.RxPacket(stack=self.other, packed=packet.packed)
+            rxPacket.parseOuter()
+            rxPacket.parseInner()
+        return ((time.time() - start) / count, len(packet.packed))
+
+    def testBenchmarkKinds(self):
+        '''
+        Report time per pack and parse for each coat and foot kind pairing
+        '''
+        console.terse("{0}\n".format(self.testBenchmarkKinds.__doc__))
+        console.reinit(verbosity=console.Wordage.terse)
+
+        pairs = [(raeting.coatKinds.nada, raeting.footKinds.nada),
+                 (raeting.coatKinds.nacl, raeting.footKinds.nacl),
+                 (raeting.coatKinds.nada, raeting.footKinds.sha2),
+                 (raeting.coatKinds.nada, raeting.footKinds.crc64),
+                 (raeting.coatKinds.crc16, raeting.footKinds.nada),
+                 (raeting.coatKinds.crc64, raeting.footKinds.nada),
+                 (raeting.coatKinds.crc16, raeting.footKinds.sha2)]
+        for size in [64, 800]:
+            for ck, fk in pairs:
+                elapsed, length = self.kinds(size, ck, fk)
+                console.terse("Packet {0} bytes coat {1} foot {2}: {3:.1f}us "
+                              "{4:.2f}MB/s\n".format(
+                              length, raeting.COAT_KIND_NAMES[ck],
+                              raeting.FOOT_KIND_NAMES[fk], elapsed * 1e6,
+                              length / elapsed / 1e6))
+
+    def arrivals(self, size, ck):
+        '''
+        Returns duple (longest arrival seconds, total seconds) of receiving
+        message with body of about size bytes using coat kind ck
+        '''
+        data = odict(hk=raeting.headKinds.raet,
+                     bk=raeting.bodyKinds.json,
+                     ck=ck,
+                     fk=raeting.footKinds.auth,
+                     se=2,
+                     de=3)
+        tray0 = packeting.TxTray(stack=self.main, data=data,
+                                 body=odict(stuff="".ljust(size, 'x')))
+        tray0.pack()
+        tray1 = packeting.RxTray(stack=self.other)
+        longest = total = 0.0
+        for packet in tray0.packets:
+            start = time.time()
+            rxPacket = packeting.RxPacket(stack=self.other, packed=packet.packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+            elapsed = time.time() - start
+            longest = max(longest, elapsed)
+            total += elapsed
+        return (longest, total)
+
+    def testBenchmarkArrivals(self):
+        '''
+        Report longest segment arrival and total receive time per coat kind
+        '''
+        console.terse("{0}\n".format(self.testBenchmarkArrivals.__doc__))
+        console.reinit(verbosity=console.Wordage.terse)
+
+        self.main.authed = self.other.authed = True
+        for remote in self.main.remotes.values() + self.other.remotes.values():
+            remote.allowed = remote.authed = True
+        for size in [100000, 1000000]:
+            for ck in [raeting.coatKinds.nacl, raeting.coatKinds.segnacl]:
+                longest, total = self.arrivals(size, ck)
+                console.terse("Message {0} bytes coat {1}: longest arrival "
+                              "{2:.1f}us total {3:.1f}ms\n".format(
+                              size, raeting.COAT_KIND_NAMES[ck],
+                              longest * 1e6, total * 1e3))
+
+def runAll():
+    """ Unittest runner """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(BenchTestCase))
+
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+if __name__ == '__main__' and __package__ is None:
+
+    runAll()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmark of per datagram versus batched udp server receive and send
+Reports datagrams per second for each path
+
+Run as script
+    python bench_serving.py
+'''
+from __future__ import print_function
+# pylint: skip-file
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+import time
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+from raet import raeting
+from raet.road import serving
+
+def setUpModule():
+    console.reinit(verbosity=console.Wordage.concise)
+
+def tearDownModule():
+    pass
+
+class BenchTestCase(unittest.TestCase):
+    """
+    Benchmark batched server
+    """
+    Total = 100000 # datagrams per run
+    Burst = 256 # datagrams sent before draining receiver
+    Size = 512 # datagram size
+
+    def setUp(self):
+        self.alpha = serving.SocketUdpBatchNb(ha=('127.0.0.1', raeting.RAET_PORT),
+                                    bufsize=raeting.UDP_MAX_PACKET_SIZE * 512)
+        self.alpha.reopen()
+        self.beta = serving.SocketUdpBatchNb(ha=('127.0.0.1', raeting.RAET_TEST_PORT),
+                                    bufsize=raeting.UDP_MAX_PACKET_SIZE * 512)
+        self.beta.reopen()
+        self.data = "".ljust(self.Size, 'x')
+
+    def tearDown(self):
+        self.alpha.close()
+        self.beta.close()
+
+    def single(self):
+        '''
+        Send and receive one datagram per system call
+        Returns duple (datagrams received, elapsed seconds)
+        '''
+        received = 0
+        start = time.time()
+        for burst in range(self.Total // self.Burst):
+            for i in range(self.Burst):
+                self.alpha.send(self.data, self.beta.ha)
+            while True:
+                rx, sa = self.beta.receive()
+                if not rx:
+                    break
+                received += 1
+        return (received, time.time() - start)
+
+    def batched(self):
+        '''
+        Send and receive vectors of datagrams per system call
+        Returns duple (datagrams received, elapsed seconds)
+        '''
+        received = 0
+        duples = [(self.data, self.beta.ha)] * self.alpha.count
+        start = time.time()
+        for burst in range(self.Total // self.Burst):
+            sent = 0
+            while sent < self.Burst:
+                sent += self.alpha.sendMany(duples[:min(self.alpha.count,
+                                                         self.Burst - sent)])
+            while True:
+                rxes = self.beta.receiveMany()
+                received += len(rxes)
+                if len(rxes) < self.beta.count:
+                    break
+        return (received, time.time() - start)
+
+    def testBenchmark(self):
+        '''
+        Compare datagrams per second of per datagram and batched paths
+        '''
+        console.terse("{0}\n".format(self.testBenchmark.__doc__))
+        if not serving.MMSG:
+            self.skipTest("recvmmsg and sendmmsg not available")
+
+        received, elapsed = self.single()
+        console.terse("Single:  {0} datagrams in {1:.3f}s = {2:.0f} per second\n".format(
+                received, elapsed, received / elapsed))
+
+        received, elapsed = self.batched()
+        console.terse("Batched: {0} datagrams in {1:.3f}s = {2:.0f} per second\n".format(
+                received, elapsed, received / elapsed))
+
+def runAll():
+    """ Unittest runner """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(BenchTestCase))
+
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+if __name__ == '__main__' and __package__ is None:
+
+    runAll()
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmark of burst versus congestion windowed segmented messages over a
+simulated lossy link with a bounded bottleneck queue
+Reports goodput in message body bytes per simulated second for each mode
+
+Also reports completion time percentiles of burst messages over a randomly
+lossy link without and with XOR parity segments
+
+Also reports datagrams and wall clock seconds to deliver many small messages
+queued in one pass without and with coalescing
+
+Also reports datagrams per delivered megabyte of windowed messages without
+and with delayed cumulative acks
+
+Run as script
+    python bench_transacting.py
+'''
+from __future__ import print_function
+# pylint: skip-file
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+import os
+import random
+import time
+from collections import deque
+import tempfile
+import shutil
+
+from ioflo.base.odicting import odict
+from ioflo.base import storing
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+from raet import raeting
+from raet.road import keeping, estating, stacking
+
+def setUpModule():
+    console.reinit(verbosity=console.Wordage.terse)
+
+def tearDownModule():
+    pass
+
+class LossyLink(object):
+    '''
+    Wraps server receive of a stack to model a bottleneck link that delivers
+    at most .rate datagrams per tick from a queue of at most .size datagrams
+    (tail drop) and loses each delivered datagram with probability .loss
+    '''
+    def __init__(self, stack, rate, size, loss, rand):
+        self.server = stack.server
+        self.receive = stack.server.receive
+        self.rate = rate
+        self.size = size
+        self.loss = loss
+        self.rand = rand
+        self.queue = deque()
+        self.count = 0
+        self.drops = 0
+        self.delivered = 0
+        stack.server.receive = self.lossy
+
+    def close(self):
+        '''
+        Restore unwrapped server receive
+        '''
+        self.server.receive = self.receive
+
+    def tick(self):
+        '''
+        Start new tick
+        '''
+        self.count = 0
+
+    def lossy(self):
+        while True:
+            rx, ra = self.receive()
+            if not rx:
+                break
+            if len(self.queue) >= self.size:
+                self.drops += 1
+            else:
+                self.queue.append((rx, ra))
+
+        while self.queue and self.count < self.rate:
+            self.count += 1
+            rx, ra = self.queue.popleft()
+            if self.rand.random() >= self.loss:
+                self.delivered += 1
+                return (rx, ra)
+            self.drops += 1
+        return ('', None)
+
+class BenchTestCase(unittest.TestCase):
+    """
+    Benchmark congestion windowed messages
+    """
+    Tick = 0.01 # simulated seconds per service pass or one way link delay
+    Rate = 32 # datagrams delivered per tick by bottleneck
+    Queue = 64 # datagrams queued by bottleneck
+    Loss = 0.02 # random loss probability
+    Count = 10 # messages per run
+    Size = 200000 # message body size
+    Duration = 60.0 # max simulated seconds per run
+
+    def setUp(self):
+        self.store = storing.Store(stamp=0.0)
+        self.baseDirpath = tempfile.mkdtemp(prefix="raet",  suffix="base", dir='/tmp')
+        stacking.RoadStack.Bk = raeting.bodyKinds.json
+
+        mainDirpath = os.path.join(self.baseDirpath, 'road', 'keep', 'main')
+        otherDirpath = os.path.join(self.baseDirpath, 'road', 'keep', 'other')
+        keeping.clearAllKeep(mainDirpath)
+        keeping.clearAllKeep(otherDirpath)
+
+        self.main = stacking.RoadStack(store=self.store,
+                                       name='main',
+                                       main=True,
+                                       auto=raeting.autoModes.once,
+                                       bufcnt=1024,
+                                       dirpath=mainDirpath,
+                                       )
+
+        self.other = stacking.RoadStack(store=self.store,
+                                        name='other',
+                                        auto=raeting.autoModes.once,
+                                        ha=("", raeting.RAET_TEST_PORT),
+                                        bufcnt=1024,
+                                        dirpath=otherDirpath,
+                                        )
+
+        self.other.addRemote(estating.RemoteEstate(stack=self.other,
+                                                   fuid=0,
+                                                   sid=0,
+                                                   ha=self.main.local.ha))
+        self.other.join()
+        self.service(duration=2.0)
+        self.other.allow()
+        self.service(duration=2.0)
+        self.assertTrue(self.other.remotes.values()[0].allowed)
+
+        self.body = odict(bloat="".ljust(self.Size, 'x'))
+
+    def tearDown(self):
+        self.main.server.close()
+        self.other.server.close()
+
+        self.main.clearAllDir()
+        self.other.clearAllDir()
+
+        if os.path.exists(self.baseDirpath):
+            shutil.rmtree(self.baseDirpath)
+
+    def service(self, duration=1.0, links=None):
+        '''
+        Service both stacks one tick at a time until no transactions remain
+        or duration expires
+        Returns simulated seconds elapsed
+        '''
+        links = links or []
+        start = self.store.stamp
+        while self.store.stamp - start < duration:
+            for link in links:
+                link.tick()
+            self.other.serviceAll()
+            self.main.serviceAll()
+            if not (self.main.transactions or self.other.transactions):
+                break
+            self.store.advanceStamp(self.Tick)
+        return self.store.stamp - start
+
+    def transfer(self, windowed, links=None):
+        '''
+        Send .Count messages over lossy link
+        Returns triple (messages delivered, simulated seconds, datagrams dropped)
+        '''
+        rand = random.Random(7)
+        links = links if links is not None else []
+        links.extend([LossyLink(self.main, self.Rate, self.Queue, self.Loss, rand),
+                      LossyLink(self.other, self.Rate, self.Queue, self.Loss, rand)])
+        self.other.windowed = windowed
+        self.main.rxMsgs.clear()
+        elapsed = 0.0
+        for i in range(self.Count):
+            self.other.transmit(self.body)
+            elapsed += self.service(duration=self.Duration, links=links)
+        for link in links:
+            link.close()
+        return (len(self.main.rxMsgs), elapsed, sum(link.drops for link in links))
+
+    def testBenchmark(self):
+        '''
+        Compare goodput of burst and congestion windowed messages on lossy link
+        '''
+        console.terse("{0}\n".format(self.testBenchmark.__doc__))
+
+        for name, windowed in [("Burst", False), ("Windowed", True)]:
+            delivered, elapsed, drops = self.transfer(windowed)
+            console.terse("{0}: {1} of {2} messages in {3:.2f}s {4} drops "
+                          "= {5:.0f} bytes per second\n".format(
+                          name, delivered, self.Count, elapsed, drops,
+                          delivered * self.Size / elapsed))
+
+    def completions(self, fec, loss, count, size):
+        '''
+        Send count burst messages of about size bytes one at a time over link
+        with random loss and parity block fec
+        Returns sorted list of simulated seconds to complete each message
+        '''
+        rand = random.Random(11)
+        links = [LossyLink(self.main, 1024, 1024, loss, rand),
+                 LossyLink(self.other, 1024, 1024, loss, rand)]
+        self.other.windowed = False
+        self.other.fec = fec
+        body = odict(bloat="".ljust(size, 'x'))
+        elapseds = []
+        for i in range(count):
+            self.other.transmit(body)
+            elapseds.append(self.service(duration=self.Duration, links=links))
+        for link in links:
+            link.close()
+        self.other.fec = 0
+        self.service(duration=self.Duration) # drain stale parity
+        return sorted(elapseds)
+
+    def testBenchmarkParity(self):
+        '''
+        Compare completion time percentiles without and with parity segments
+        '''
+        console.terse("{0}\n".format(self.testBenchmarkParity.__doc__))
+
+        count = 200
+        for loss in [0.01, 0.03]:
+            for fec in [0, 8, 4]:
+                elapseds = self.completions(fec, loss, count, size=20000)
+                console.terse("Loss {0:.0%} parity block {1}: p50 {2:.2f}s "
+                              "p90 {3:.2f}s p99 {4:.2f}s max {5:.2f}s\n".format(
+                              loss, fec,
+                              elapseds[count * 50 // 100],
+                              elapseds[count * 90 // 100],
+                              elapseds[count * 99 // 100],
+                              elapseds[-1]))
+
+    def testBenchmarkCoalesced(self):
+        '''
+        Compare datagrams to deliver small queued messages without and with coalescing
+        '''
+        console.terse("{0}\n".format(self.testBenchmarkCoalesced.__doc__))
+
+        count = 500
+        bodies = [odict([('fun', 'test.ping'),
+                         ('jid', '20141017{0:06d}'.format(i)),
+                         ('return', True)]) for i in range(count)]
+        for coalesced in [False, True]:
+            rand = random.Random(5)
+            links = [LossyLink(self.main, 4096, 4096, 0.0, rand),
+                     LossyLink(self.other, 4096, 4096, 0.0, rand)]
+            self.other.coalesced = coalesced
+            self.main.rxMsgs.clear()
+            start = time.time()
+            for body in bodies:
+                self.other.transmit(body)
+            self.service(duration=self.Duration, links=links)
+            elapsed = time.time() - start
+            for link in links:
+                link.close()
+            self.assertEqual([msg for msg, name in self.main.rxMsgs], bodies)
+            console.terse("Coalesced {0}: {1} messages in {2} message datagrams "
+                          "{3} ack datagrams {4:.3f}s\n".format(
+                          coalesced, count, links[0].delivered,
+                          links[1].delivered, elapsed))
+
+    def testBenchmarkDelayed(self):
+        '''
+        Compare datagrams per delivered megabyte without and with delayed acks
+        '''
+        console.terse("{0}\n".format(self.testBenchmarkDelayed.__doc__))
+
+        for delayed in [False, True]:
+            self.main.delayed = delayed
+            links = []
+            delivered, elapsed, drops = self.transfer(windowed=True, links=links)
+            megas = delivered * self.Size / 1e6
+            segments = links[0].delivered + links[0].drops
+            acks = links[1].delivered + links[1].drops
+            console.terse("Delayed {0}: {1} of {2} messages in {3:.2f}s "
+                          "{4:.0f} segment {5:.0f} ack datagrams per MB "
+                          "= {6:.0f} bytes per second\n".format(
+                          delayed, delivered, self.Count, elapsed,
+                          segments / megas, acks / megas,
+                          delivered * self.Size / elapsed))
+        self.main.delayed = False
+
+def runAll():
+    """ Unittest runner """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(BenchTestCase))
+
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+if __name__ == '__main__' and __package__ is None:
+
+    runAll()
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for asyncio road stack
+
+'''
+# pylint: skip-file
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+import os
+import time
+import tempfile
+import shutil
+
+from ioflo.base.odicting import odict
+from ioflo.base import storing
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+from raet import raeting, nacling
+from raet.road import keeping, estating, stacking, asyncing
+from raet.road.asyncing import asyncio
+
+def setUpModule():
+    console.reinit(verbosity=console.Wordage.concise)
+
+def tearDownModule():
+    pass
+
+@unittest.skipIf(asyncio is None, "asyncio or trollius not available")
+class BasicTestCase(unittest.TestCase):
+    """
+    Test asyncio road stacks
+    """
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.store = storing.Store(stamp=0.0)
+        self.baseDirpath=tempfile.mkdtemp(prefix="raet",  suffix="base", dir='/tmp')
+        stacking.RoadStack.Bk = raeting.bodyKinds.json
+
+        mainDirpath = os.path.join(self.baseDirpath, 'road', 'keep', 'main')
+        otherDirpath = os.path.join(self.baseDirpath, 'road', 'keep', 'other')
+        keeping.clearAllKeep(mainDirpath)
+        keeping.clearAllKeep(otherDirpath)
+
+        self.main = asyncing.AsyncRoadStack(loop=self.loop,
+                                            store=self.store,
+                                            name='main',
+                                            main=True,
+                                            auto=raeting.autoModes.once,
+                                            ha=('127.0.0.1', raeting.RAET_PORT),
+                                            dirpath=mainDirpath,
+                                            )
+
+        self.other = asyncing.AsyncRoadStack(loop=self.loop,
+                                             store=self.store,
+                                             name='other',
+                                             auto=raeting.autoModes.once,
+                                             ha=('127.0.0.1', raeting.RAET_TEST_PORT),
+                                             dirpath=otherDirpath,
+                                             )
+        self.loop.run_until_complete(asyncio.gather(self.main.open(),
+                                                    self.other.open(),
+                                                    loop=self.loop))
+
+    def tearDown(self):
+        self.main.close()
+        self.other.close()
+        self.loop.run_until_complete(asyncio.sleep(0.0, loop=self.loop))
+        self.loop.close()
+
+        self.main.clearAllDir()
+        self.other.clearAllDir()
+
+        if os.path.exists(self.baseDirpath):
+            shutil.rmtree(self.baseDirpath)
+
+    def service(self, duration=2.0):
+        '''
+        Run loop until no transactions remain or duration expires
+        '''
+        end = time.time() + duration
+        while time.time() < end:
+            self.loop.run_until_complete(asyncio.sleep(0.01, loop=self.loop))
+            if not (self.main.transactions or self.other.transactions):
+                break
+
+    def bootstrap(self):
+        '''
+        Join and allow other with main
+        '''
+        self.other.addRemote(estating.RemoteEstate(stack=self.other,
+                                                   fuid=0,
+                                                   sid=0,
+                                                   ha=self.main.local.ha))
+        self.other.join()
+        self.service()
+        self.assertTrue(self.other.remotes.values()[0].joined)
+        self.assertTrue(self.main.remotes.values()[0].joined)
+
+        self.other.allow()
+        self.service()
+        self.assertTrue(self.other.remotes.values()[0].allowed)
+        self.assertTrue(self.main.remotes.values()[0].allowed)
+
+    def testMessage(self):
+        '''
+        Test awaitable message completes
+        '''
+        console.terse("{0}\n".format(self.testMessage.__doc__))
+        self.bootstrap()
+
+        bloat = "".join(str(i).rjust(100, " ") for i in range(300))
+        body = odict(house="Other", queue="big stuff", bloat=bloat)
+        future = self.other.message(body, uid=self.other.remotes.values()[0].uid)
+        result = self.loop.run_until_complete(asyncio.wait_for(future, 5.0, loop=self.loop))
+        self.assertTrue(result)
+        self.assertEqual(len(self.main.rxMsgs), 1)
+        self.assertDictEqual(self.main.rxMsgs[0][0], body)
+
+        # many concurrent messages
+        futures = [self.main.message(odict(count=i), uid=self.main.remotes.values()[0].uid)
+                   for i in range(20)]
+        results = self.loop.run_until_complete(asyncio.wait_for(
+                asyncio.gather(*futures, loop=self.loop), 5.0, loop=self.loop))
+        self.assertEqual(results, [True] * 20)
+        self.assertEqual(sorted(msg['count'] for msg, name in self.other.rxMsgs),
+                         range(20))
+
+        # transmit path still works without futures
+        self.main.transmit(odict(house="Main"), self.main.remotes.values()[0].uid)
+        self.service(duration=0.5)
+        self.assertEqual(len(self.other.rxMsgs), 21)
+
+    def testManage(self):
+        '''
+        Test loop manages presence so keep alives run when due
+        '''
+        console.terse("{0}\n".format(self.testManage.__doc__))
+        self.bootstrap()
+        self.assertIsNot(self.other.remainingManage(), None)
+        self.assertIs(self.other.stats.get('alive_complete'), None)
+
+        end = time.time() + self.other.period * 1.5
+        while time.time() < end:
+            self.loop.run_until_complete(asyncio.sleep(0.05, loop=self.loop))
+        self.assertTrue(self.other.stats.get('alive_complete') >= 1)
+        self.assertTrue(self.main.stats.get('alive_complete') >= 1)
+        self.assertIn('main', self.other.availables)
+        self.assertIn('other', self.main.availables)
+
+    def testMessageFail(self):
+        '''
+        Test awaitable message fails for invalid and unresponsive remote
+        '''
+        console.terse("{0}\n".format(self.testMessageFail.__doc__))
+        future = self.other.message(odict(house="Other"), uid=99)
+        self.assertTrue(future.done())
+        self.assertRaises(raeting.TransactionError, future.result)
+
+        self.bootstrap()
+        self.main.close()
+        future = self.other.message(odict(house="Other"),
+                                    uid=self.other.remotes.values()[0].uid,
+                                    timeout=0.5)
+        self.assertRaises(raeting.TransactionError, self.loop.run_until_complete,
+                          asyncio.wait_for(future, 5.0, loop=self.loop))
+        self.assertEqual(len(self.other.transactions), 0)
+
+def runSome():
+    """ Unittest runner """
+    tests = []
+    names = ['testMessage',
+             'testManage',
+             'testMessageFail', ]
+    tests.extend(map(BasicTestCase, names))
+
+    suite = unittest.TestSuite(tests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+def runAll():
+    """ Unittest runner """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(BasicTestCase))
+
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+if __name__ == '__main__' and __package__ is None:
+
+    #console.reinit(verbosity=console.Wordage.concise)
+
+    runAll() #run all unittests
+
+    #runSome()#only run some
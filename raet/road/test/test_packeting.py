@@ -15,6 +15,7 @@ import os
 import time
 import tempfile
 import shutil
+from StringIO import StringIO
 
 from ioflo.base.odicting import odict
 from ioflo.base.aiding import Timer, StoreTimer
@@ -90,6 +91,7 @@ class BasicTestCase(unittest.TestCase):
                                             'sn': 0,
                                             'sc': 1,
                                             'ml': 0,
+                                            'pb': 0, 'mc': 0,
                                             'sf': False,
                                             'af': False,
                                             'bk': 1,
@@ -144,6 +146,7 @@ class BasicTestCase(unittest.TestCase):
                                             'sn': 0,
                                             'sc': 1,
                                             'ml': 0,
+                                            'pb': 0, 'mc': 0,
                                             'sf': False,
                                             'af': False,
                                             'bk': 3,
@@ -198,6 +201,7 @@ class BasicTestCase(unittest.TestCase):
                                             'sn': 0,
                                             'sc': 1,
                                             'ml': 0,
+                                            'pb': 0, 'mc': 0,
                                             'sf': False,
                                             'af': False,
                                             'bk': 1,
@@ -252,6 +256,7 @@ class BasicTestCase(unittest.TestCase):
                                             'sn': 0,
                                             'sc': 1,
                                             'ml': 0,
+                                            'pb': 0, 'mc': 0,
                                             'sf': False,
                                             'af': False,
                                             'bk': 3,
@@ -306,6 +311,7 @@ class BasicTestCase(unittest.TestCase):
                                             'sn': 0,
                                             'sc': 1,
                                             'ml': 0,
+                                            'pb': 0, 'mc': 0,
                                             'sf': False,
                                             'af': False,
                                             'bk': 2,
@@ -315,6 +321,113 @@ class BasicTestCase(unittest.TestCase):
                                             'fg': '00'})
         self.assertEqual(packet1.body.data, body)
 
+    def testBasicBinaryJson(self):
+        '''
+        Basic pack parse with header binary and body json
+        '''
+        console.terse("{0}\n".format(self.testBasicBinaryJson.__doc__))
+
+        hk = raeting.headKinds.binary
+        bk = raeting.bodyKinds.json
+
+        data = odict(hk=hk, bk=bk)
+        body = odict(msg='Hello Raet World', extra='Goodby Big Moon')
+        packet0 = packeting.TxPacket(embody=body, data=data, )
+        self.assertDictEqual(packet0.body.data, body)
+        packet0.pack()
+        self.assertEqual(packet0.head.size, raeting.BINARY_HEAD_PACKER.size)
+        self.assertEqual(packet0.head.size, 54)
+        self.assertEqual(packet0.packed[:4], 'RAET')
+        self.assertEqual(packet0.packed[54:],
+                '{"msg":"Hello Raet World","extra":"Goodby Big Moon"}')
+
+        packet1 = packeting.RxPacket(packed=packet0.packed)
+        packet1.parse()
+        self.assertDictEqual(packet1.data, {'sh': '',
+                                            'sp': 7530,
+                                            'dh': '127.0.0.1',
+                                            'dp': 7530,
+                                            'ri':'RAET',
+                                            'vn': 0,
+                                            'pk': 0,
+                                            'pl': 106,
+                                            'hk': 2,
+                                            'hl': 54,
+                                            'se': 0,
+                                            'de': 0,
+                                            'cf': False,
+                                            'bf': False,
+                                            'nf': False,
+                                            'df': False,
+                                            'vf': False,
+                                            'si': 0,
+                                            'ti': 0,
+                                            'tk': 0,
+                                            'dt': 0,
+                                            'oi': 0,
+                                            'wf': False,
+                                            'sn': 0,
+                                            'sc': 1,
+                                            'ml': 0,
+                                            'pb': 0, 'mc': 0,
+                                            'sf': False,
+                                            'af': False,
+                                            'bk': 1,
+                                            'ck': 0,
+                                            'fk': 0,
+                                            'fl': 0,
+                                            'fg': '00'})
+        self.assertDictEqual(packet1.body.data, body)
+
+    def testBinaryRoundTrip(self):
+        '''
+        Binary head parses to same data as raet and json head kinds
+        '''
+        console.terse("{0}\n".format(self.testBinaryRoundTrip.__doc__))
+
+        body = odict(msg='Hello Raet World', extra='Goodby Big Moon')
+        data = odict(pk=raeting.pcktKinds.request,
+                     se=0x1234, de=0xffffffff, si=0x80000001, ti=7,
+                     tk=raeting.trnsKinds.alive,
+                     cf=True, bf=False, wf=True,
+                     sn=3, sc=5, ml=4000, sf=True,
+                     bk=raeting.bodyKinds.msgpack)
+
+        parseds = odict()
+        for hk in [raeting.headKinds.raet,
+                   raeting.headKinds.json,
+                   raeting.headKinds.binary]:
+            data['hk'] = hk
+            packet0 = packeting.TxPacket(embody=body, data=data)
+            packet0.pack()
+            packet1 = packeting.RxPacket(packed=packet0.packed)
+            packet1.parse()
+            self.assertEqual(packet1.data['hk'], hk)
+            self.assertEqual(packet1.data['hl'], packet0.head.size)
+            self.assertEqual(packet1.data['pl'], packet0.size)
+            self.assertDictEqual(packet1.body.data, body)
+            parseds[hk] = packet1.data
+
+        binary = odict(parseds[raeting.headKinds.binary])
+        for hk in [raeting.headKinds.raet, raeting.headKinds.json]:
+            other = odict(parseds[hk])
+            for key in ['hk', 'hl', 'pl']:
+                del other[key]
+                if key in binary:
+                    del binary[key]
+            self.assertDictEqual(binary, other)
+
+        packet0 = packeting.TxPacket(embody=body,
+                                     data=odict(hk=raeting.headKinds.binary,
+                                                sn=0x10000, sf=True))
+        self.assertRaises(raeting.PacketError, packet0.pack)
+
+        packet0 = packeting.TxPacket(embody=body,
+                                     data=odict(hk=raeting.headKinds.binary))
+        packet0.pack()
+        packet1 = packeting.RxPacket(packed=packet0.packed[:-1])
+        self.assertRaises(raeting.PacketError, packet1.parse)
+
     def testSegmentation(self):
         '''
         Test pack unpack segmented
@@ -370,6 +483,7 @@ class BasicTestCase(unittest.TestCase):
                                            'sn': 0,
                                            'sc': 2,
                                            'ml': 1200,
+                                           'pb': 0, 'mc': 0,
                                            'sf': True,
                                            'af': False,
                                            'bk': 2,
@@ -379,6 +493,568 @@ class BasicTestCase(unittest.TestCase):
                                            'fg': '08'})
         self.assertEquals( tray1.body, stuff)
 
+    def testSegmentationBinary(self):
+        '''
+        Test pack unpack segmented with binary head
+        '''
+        console.terse("{0}\n".format(self.testSegmentationBinary.__doc__))
+        hk = raeting.headKinds.binary
+        bk = raeting.bodyKinds.raw
+
+        data = odict(hk=hk, bk=bk)
+
+        stuff = []
+        for i in range(900):
+            stuff.append(str(i).rjust(4, " "))
+        stuff = "".join(stuff)
+        self.assertEqual(len(stuff), 3600)
+
+        tray0 = packeting.TxTray(data=data, body=stuff)
+        tray0.pack()
+        self.assertEquals(len(tray0.packets), 4)
+        for packet in tray0.packets:
+            self.assertTrue(packet.size <= raeting.UDP_MAX_PACKET_SIZE)
+            self.assertEqual(packet.head.size, raeting.BINARY_HEAD_PACKER.size)
+        self.assertEqual(tray0.packets[0].size, raeting.UDP_MAX_PACKET_SIZE)
+
+        tray1 = packeting.RxTray()
+        for packet in tray0.packets:
+            rxPacket = packeting.RxPacket(packed=packet.packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+
+        self.assertTrue(tray1.complete)
+        self.assertEqual(tray1.data['hk'], hk)
+        self.assertEqual(tray1.data['sc'], 4)
+        self.assertEqual(tray1.data['ml'], 3600)
+        self.assertEqual(tray1.data['fg'], '08')
+        self.assertEquals(tray1.body, stuff)
+
+    def testSegmentationGaps(self):
+        '''
+        Test received bitmap count and gaps of partially received segments
+        '''
+        console.terse("{0}\n".format(self.testSegmentationGaps.__doc__))
+        hk = raeting.headKinds.binary
+        bk = raeting.bodyKinds.raw
+
+        data = odict(hk=hk, bk=bk)
+        stuff = "".join(str(i).rjust(10, " ") for i in range(2000))
+
+        tray0 = packeting.TxTray(data=data, body=stuff)
+        tray0.pack()
+        sc = len(tray0.packets)
+        self.assertTrue(sc > 20)
+
+        drops = set([0, 3, 4, 5, 9, sc - 1])
+        tray1 = packeting.RxTray()
+        for sn, packet in enumerate(tray0.packets):
+            if sn in drops:
+                continue
+            rxPacket = packeting.RxPacket(packed=packet.packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+
+        self.assertFalse(tray1.complete)
+        self.assertEqual(tray1.count, sc - len(drops))
+        self.assertEqual(tray1.gaps(), [(0, 1), (3, 6), (9, 10), (sc - 1, sc)])
+        self.assertEqual(tray1.missing(), sorted(drops))
+        self.assertEqual(tray1.gaps(begin=4, end=12), [(4, 6), (9, 10)])
+        self.assertEqual(tray1.missing(begin=4, end=12), [4, 5, 9])
+        self.assertEqual(tray1.gaps(begin=10, end=sc - 1), [])
+        self.assertEqual(tray1.gaps(begin=5, end=5), [])
+        self.assertEqual(tray1.first, 0)
+        self.assertEqual(tray1.contiguous, 0)
+
+        # in order prefix is shifted out of bitmap
+        for sn in (0, 3, 4):
+            rxPacket = packeting.RxPacket(packed=tray0.packets[sn].packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+        drops -= set([0, 3, 4])
+        self.assertEqual(tray1.first, 5)
+        self.assertEqual(tray1.contiguous, 5)
+        self.assertEqual(tray1.bitmap & 1, 0)
+        self.assertTrue(tray1.bitmap.bit_length() <= sc - 5)
+        self.assertEqual(tray1.gaps(), [(5, 6), (9, 10), (sc - 1, sc)])
+        self.assertEqual(tray1.gaps(begin=2, end=12), [(5, 6), (9, 10)])
+        self.assertEqual(tray1.missing(begin=0, end=5), [])
+
+        # duplicates do not count twice
+        for sn in (1, 6):
+            rxPacket = packeting.RxPacket(packed=tray0.packets[sn].packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+        self.assertEqual(tray1.count, sc - len(drops))
+
+        for sn in sorted(drops):
+            rxPacket = packeting.RxPacket(packed=tray0.packets[sn].packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+        self.assertTrue(tray1.complete)
+        self.assertEqual(tray1.gaps(), [])
+        self.assertEquals(tray1.body, stuff)
+
+    def testSegmentationReassembly(self):
+        '''
+        Test reassembly out of order into buffer grown as segments arrive
+        '''
+        console.terse("{0}\n".format(self.testSegmentationReassembly.__doc__))
+        hk = raeting.headKinds.raet
+        bk = raeting.bodyKinds.raw
+
+        data = odict(hk=hk, bk=bk)
+        stuff = "".join(str(i).rjust(10, " ") for i in range(500))
+
+        tray0 = packeting.TxTray(data=data, body=stuff)
+        tray0.pack()
+        sc = len(tray0.packets)
+        self.assertTrue(sc > 2)
+
+        def rxify(packet):
+            rxPacket = packeting.RxPacket(packed=packet.packed)
+            rxPacket.parseOuter()
+            return rxPacket
+
+        tray1 = packeting.RxTray()
+        for packet in reversed(tray0.packets): # last first gives segment size
+            self.assertIs(tray1.body, None)
+            tray1.parse(rxify(packet))
+            if not tray1.complete:
+                self.assertEqual(len(tray1.buffer), len(tray0.packed))
+        self.assertTrue(tray1.complete)
+        self.assertEquals(tray1.body, stuff)
+
+        # in order grows buffer one segment at a time
+        tray1 = packeting.RxTray()
+        for sn, packet in enumerate(tray0.packets):
+            tray1.parse(rxify(packet))
+            if not tray1.complete:
+                self.assertEqual(len(tray1.buffer), (sn + 1) * tray1.segsize)
+        self.assertTrue(tray1.complete)
+        self.assertIs(tray1.buffer, None)
+        self.assertEqual(tray1.count, sc)
+        self.assertEqual(tray1.size, len(tray0.packed))
+        self.assertEquals(tray1.body, stuff)
+
+        # claimed message length is not allocated before segments arrive
+        tray1 = packeting.RxTray()
+        packet = rxify(tray0.packets[0])
+        packet.data['ml'] = raeting.MAX_MESSAGE_SIZE
+        tray1.parse(packet)
+        self.assertEqual(len(tray1.buffer), tray1.segsize)
+
+        # segment from message of different count or number out of range
+        tray1 = packeting.RxTray()
+        tray1.parse(rxify(tray0.packets[0]))
+        packet = rxify(tray0.packets[1])
+        packet.data['sn'] = sc
+        self.assertRaises(raeting.PacketError, tray1.parse, packet)
+        packet = rxify(tray0.packets[1])
+        packet.data['sc'] = sc + 1
+        self.assertRaises(raeting.PacketError, tray1.parse, packet)
+
+        # segment whose size does not fit message
+        packet = rxify(tray0.packets[-1])
+        packet.data['sn'] = 1
+        self.assertRaises(raeting.PacketError, tray1.parse, packet)
+        self.assertEqual(tray1.count, 1)
+
+    def testHeadTemplate(self):
+        '''
+        Test packing heads with shared precompiled head template
+        '''
+        console.terse("{0}\n".format(self.testHeadTemplate.__doc__))
+
+        template = packeting.HeadTemplate()
+        body = odict(msg='Hello Raet World', extra='Goodby Big Moon')
+        for hk in [raeting.headKinds.raet, raeting.headKinds.json]:
+            data = odict(hk=hk, bk=raeting.bodyKinds.json, se=2, de=3, si=5, ti=7)
+            for pk, sn, af in [(0, 0, False), (1, 3, True), (0, 0, False)]:
+                data.update(pk=pk, sn=sn, af=af)
+                packet0 = packeting.TxPacket(embody=body, data=data)
+                packet0.pack()
+                packet1 = packeting.TxPacket(embody=body, data=data, template=template)
+                packet1.pack()
+                self.assertEqual(packet1.packed, packet0.packed)
+                self.assertEqual(packet1.data['hl'], packet0.data['hl'])
+                self.assertEqual(packet1.data['pl'], packet0.data['pl'])
+                self.assertEqual(template.hk, hk)
+
+                packet2 = packeting.RxPacket(packed=packet1.packed)
+                packet2.parse()
+                self.assertEqual(packet2.data['sn'], sn)
+                self.assertEqual(packet2.data['af'], af)
+                self.assertDictEqual(packet2.body.data, body)
+
+        # constant field change recompiles
+        key = template.key
+        packet1 = packeting.TxPacket(embody=body, data=data, template=template)
+        packet1.data.update(ti=8)
+        packet1.pack()
+        self.assertNotEqual(template.key, key)
+        packet2 = packeting.RxPacket(packed=packet1.packed)
+        packet2.parse()
+        self.assertEqual(packet2.data['ti'], 8)
+
+        # segments share template
+        stuff = "".join(str(i).rjust(10, " ") for i in range(300))
+        tray0 = packeting.TxTray(data=data, body=odict(stuff=stuff), template=template)
+        tray0.pack()
+        self.assertTrue(len(tray0.packets) > 1)
+        tray1 = packeting.RxTray()
+        for packet in tray0.packets:
+            self.assertIs(packet.template, template)
+            rxPacket = packeting.RxPacket(packed=packet.packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+        self.assertTrue(tray1.complete)
+        self.assertEqual(tray1.body, odict(stuff=stuff))
+
+    def testIntegrityKinds(self):
+        '''
+        Test integrity check foot and coat kinds
+        '''
+        console.terse("{0}\n".format(self.testIntegrityKinds.__doc__))
+
+        body = odict(msg='Hello Raet World', extra='Goodby Big Moon')
+        for fk, ck in [(raeting.footKinds.sha2, raeting.coatKinds.nada),
+                       (raeting.footKinds.crc64, raeting.coatKinds.nada),
+                       (raeting.footKinds.nada, raeting.coatKinds.crc16),
+                       (raeting.footKinds.nada, raeting.coatKinds.crc64),
+                       (raeting.footKinds.crc64, raeting.coatKinds.crc16)]:
+            data = odict(hk=raeting.headKinds.raet, bk=raeting.bodyKinds.json,
+                         fk=fk, ck=ck)
+            packet0 = packeting.TxPacket(embody=body, data=data)
+            packet0.pack()
+            self.assertEqual(packet0.data['fl'],
+                    raeting.FOOT_SIZES[raeting.FOOT_KIND_NAMES[fk]])
+            packet1 = packeting.RxPacket(packed=packet0.packed)
+            packet1.parse()
+            self.assertDictEqual(packet1.body.data, body)
+
+            # corrupt body byte
+            hl = packet0.data['hl']
+            packed = packet0.packed[:hl] + 'X' + packet0.packed[hl + 1:]
+            packet1 = packeting.RxPacket(packed=packed)
+            self.assertRaises(raeting.PacketError, packet1.parse)
+
+        # segmented message checked once whole
+        stuff = "".join(str(i).rjust(10, " ") for i in range(300))
+        data = odict(hk=raeting.headKinds.raet, bk=raeting.bodyKinds.json,
+                     fk=raeting.footKinds.sha2, ck=raeting.coatKinds.crc64)
+        tray0 = packeting.TxTray(data=data, body=odict(stuff=stuff))
+        tray0.pack()
+        self.assertTrue(len(tray0.packets) > 1)
+        tray1 = packeting.RxTray()
+        for packet in tray0.packets:
+            rxPacket = packeting.RxPacket(packed=packet.packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+        self.assertTrue(tray1.complete)
+        self.assertEqual(tray1.body, odict(stuff=stuff))
+
+    def testPackedBody(self):
+        '''
+        Test body serialized once for many packets
+        '''
+        console.terse("{0}\n".format(self.testPackedBody.__doc__))
+        body = odict(msg='Hello Raet World', extra='Goodby Big Moon')
+        packed = packeting.PackedBody(data=body)
+        self.assertEqual(packed.packed, '{"msg":"Hello Raet World","extra":"Goodby Big Moon"}')
+
+        data = odict(hk=raeting.headKinds.raet, bk=raeting.bodyKinds.json)
+        for i in range(2):
+            packet0 = packeting.TxPacket(embody=packed, data=data)
+            packet0.pack()
+            self.assertIs(packet0.body.packed, packed.packed)
+            packet1 = packeting.RxPacket(packed=packet0.packed)
+            packet1.parse()
+            self.assertDictEqual(packet1.body.data, body)
+
+        # compressed kind of same serialization compresses shared serialization
+        data.update(bk=raeting.bodyKinds.zjson)
+        packet0 = packeting.TxPacket(embody=packed, data=data)
+        packet0.pack()
+        self.assertEqual(packet0.body.packed, chr(raeting.zipKinds.nada) + packed.packed)
+
+        # other serialization kind serializes data
+        data.update(bk=raeting.bodyKinds.msgpack)
+        packet0 = packeting.TxPacket(embody=packed, data=data)
+        packet0.pack()
+        packet1 = packeting.RxPacket(packed=packet0.packed)
+        packet1.parse()
+        self.assertDictEqual(packet1.body.data, body)
+
+    def testBatchBody(self):
+        '''
+        Test coalesced bodies split on receipt
+        '''
+        console.terse("{0}\n".format(self.testBatchBody.__doc__))
+        bodies = [odict(msg='Hello Raet World', index=i) for i in range(3)]
+        for bk in [raeting.bodyKinds.json, raeting.bodyKinds.msgpack]:
+            batch = packeting.BatchBody(bk=bk)
+            for body in bodies:
+                part = packeting.dumps(body, bk)
+                self.assertTrue(batch.fits(part, 256))
+                batch.add(body, part)
+            self.assertEqual(batch.count, 3)
+            self.assertEqual(batch.packed, packeting.dumps(bodies, bk))
+            self.assertTrue(len(batch.packed) <= batch.size)
+            self.assertFalse(batch.fits(part, batch.size + len(part)))
+
+            data = odict(hk=raeting.headKinds.raet, bk=bk)
+            tray0 = packeting.TxTray(data=data, body=batch)
+            tray0.pack()
+            self.assertEqual(len(tray0.packets), 1)
+            self.assertEqual(tray0.data['mc'], 3)
+            tray1 = packeting.RxTray(lazy=True)
+            rxPacket = packeting.RxPacket(packed=tray0.packets[0].packed)
+            rxPacket.parseOuter()
+            self.assertEqual(rxPacket.data['mc'], 3)
+            tray1.parse(rxPacket)
+            self.assertTrue(tray1.complete)
+            self.assertEqual(tray1.body, bodies) # not lazy so split
+
+        # count must match
+        data = odict(hk=raeting.headKinds.raet, bk=raeting.bodyKinds.json, mc=2)
+        packet0 = packeting.TxPacket(embody=batch, data=data)
+        packet0.pack()
+        packet1 = packeting.RxPacket(packed=packet0.packed)
+        self.assertRaises(raeting.PacketError, packet1.parse)
+
+        # single body is not a list
+        data = odict(hk=raeting.headKinds.raet, bk=raeting.bodyKinds.json, mc=1)
+        packet0 = packeting.TxPacket(embody=bodies[0], data=data)
+        packet0.pack()
+        packet1 = packeting.RxPacket(packed=packet0.packed)
+        self.assertRaises(raeting.PacketError, packet1.parse)
+
+    def testCompressedBody(self):
+        '''
+        Test compressed body kinds
+        '''
+        console.terse("{0}\n".format(self.testCompressedBody.__doc__))
+
+        body = odict(msg='Hello Raet World') # below threshold
+        data = odict(hk=raeting.headKinds.raet, bk=raeting.bodyKinds.zjson)
+        packet0 = packeting.TxPacket(embody=body, data=data)
+        packet0.pack()
+        self.assertEqual(packet0.body.packed,
+                chr(raeting.zipKinds.nada) + '{"msg":"Hello Raet World"}')
+        packet1 = packeting.RxPacket(packed=packet0.packed)
+        packet1.parse()
+        self.assertDictEqual(packet1.body.data, body)
+
+        stuff = "".join(str(i).rjust(10, " ") for i in range(10000))
+        body = odict(stuff=stuff)
+        data = odict(hk=raeting.headKinds.raet, bk=raeting.bodyKinds.json)
+        tray = packeting.TxTray(data=data, body=body)
+        tray.pack()
+        plain = len(tray.packets)
+
+        data['bk'] = raeting.bodyKinds.zjson
+        tray0 = packeting.TxTray(data=data, body=body)
+        tray0.pack()
+        self.assertEqual(tray0.packed[0], chr(raeting.zipKinds.zlib))
+        self.assertTrue(len(tray0.packets) < plain // 2)
+        tray1 = packeting.RxTray()
+        for packet in tray0.packets:
+            rxPacket = packeting.RxPacket(packed=packet.packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+        self.assertTrue(tray1.complete)
+        self.assertEqual(tray1.body, body)
+
+        # corrupt compressed body checksum
+        packed = tray0.packed[:-1] + chr(ord(tray0.packed[-1]) ^ 0xff)
+        packet0 = packeting.TxPacket(data=data)
+        packet0.body.packed = packed
+        packet0.coat.pack()
+        packet0.foot.pack()
+        packet0.head.pack()
+        packet1 = packeting.RxPacket(packed="".join([packet0.head.packed,
+                                                     packet0.coat.packed,
+                                                     packet0.foot.packed]))
+        self.assertRaises(raeting.PacketError, packet1.parse)
+
+    def testParity(self):
+        '''
+        Test XOR parity segments rebuild one lost segment per block
+        '''
+        console.terse("{0}\n".format(self.testParity.__doc__))
+        stuff = "".join(str(i).rjust(10, " ") for i in range(2000))
+        for hk in [raeting.headKinds.raet, raeting.headKinds.json]:
+            data = odict(hk=hk, bk=raeting.bodyKinds.raw)
+            tray0 = packeting.TxTray(data=data, body=stuff, fec=4)
+            tray0.pack()
+            sc = tray0.packets[0].data['sc']
+            self.assertTrue(sc > 20)
+            blocks = (sc + 3) // 4
+            self.assertEqual(len(tray0.packets), sc + blocks)
+            plain = packeting.TxTray(data=data, body=stuff)
+            plain.pack()
+            self.assertEqual(len(plain.packets), sc)
+            largest = max(packet.size for packet in plain.packets)
+            for sn, packet in enumerate(tray0.packets):
+                self.assertTrue(packet.size <= largest) # head room for pb
+                self.assertEqual(packet.data['sn'], sn)
+                self.assertEqual(packet.data['pb'], 4)
+
+            # one lost per block including short last segment rebuilt
+            drops = set(sn for sn in range(0, sc, 4) if sn + 4 < sc) | set([sc - 1])
+            tray1 = packeting.RxTray()
+            for sn, packet in enumerate(tray0.packets):
+                if sn in drops:
+                    continue
+                rxPacket = packeting.RxPacket(packed=packet.packed)
+                rxPacket.parseOuter()
+                tray1.parse(rxPacket)
+            self.assertTrue(tray1.complete)
+            self.assertEqual(tray1.rebuilt, len(drops))
+            self.assertEqual(tray1.body, stuff)
+            self.assertEqual(tray1.folds, {})
+
+        # two lost in one block wait on resend of one then rebuild other
+        tray1 = packeting.RxTray()
+        for sn, packet in enumerate(tray0.packets):
+            if sn in (5, 6):
+                continue
+            rxPacket = packeting.RxPacket(packed=packet.packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+        self.assertFalse(tray1.complete)
+        self.assertEqual(tray1.gaps(end=len(tray0.packets)), [(5, 7)])
+        rxPacket = packeting.RxPacket(packed=tray0.packets[6].packed)
+        rxPacket.parseOuter()
+        tray1.parse(rxPacket)
+        self.assertTrue(tray1.complete)
+        self.assertEqual(tray1.rebuilt, 1)
+        self.assertEqual(tray1.body, stuff)
+
+        # parity first then data
+        tray1 = packeting.RxTray()
+        for packet in reversed(tray0.packets[1:]):
+            rxPacket = packeting.RxPacket(packed=packet.packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+        self.assertTrue(tray1.complete)
+        self.assertEqual(tray1.body, stuff)
+
+        # binary head has no parity field
+        data = odict(hk=raeting.headKinds.binary, bk=raeting.bodyKinds.raw)
+        tray0 = packeting.TxTray(data=data, body=stuff, fec=4)
+        tray0.pack()
+        self.assertEqual(len(tray0.packets), tray0.packets[0].data['sc'])
+
+    def testTxStream(self):
+        '''
+        Test lazily packed stream segments
+        '''
+        console.terse("{0}\n".format(self.testTxStream.__doc__))
+        stuff = "".join(str(i).rjust(10, " ") for i in range(1000))
+        data = odict(hk=raeting.headKinds.raet, bk=raeting.bodyKinds.json,
+                     ck=raeting.coatKinds.crc16, fk=raeting.footKinds.nada)
+
+        source = StringIO(stuff)
+        source.seek(10) # streams from current position
+        tray0 = packeting.TxStream(data=data, source=source)
+        tray0.pack()
+        self.assertEqual(tray0.length, len(stuff) - 10)
+        self.assertEqual(tray0.data['bk'], raeting.bodyKinds.raw)
+        self.assertEqual(tray0.data['ck'], raeting.coatKinds.nada)
+        self.assertEqual(tray0.ml, tray0.length)
+        self.assertEqual(len(tray0.packets), 11)
+        self.assertEqual(source.tell(), 10) # nothing read yet
+        self.assertEqual(tray0.packets.packets, {})
+
+        tray1 = packeting.RxTray()
+        for sn in range(len(tray0.packets)):
+            packet = tray0.packets[sn]
+            self.assertTrue(packet.size <= raeting.UDP_MAX_PACKET_SIZE)
+            tray0.packets.release(sn)
+            self.assertEqual(tray0.packets.packets, {})
+            rxPacket = packeting.RxPacket(packed=packet.packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+        self.assertTrue(tray1.complete)
+        self.assertEqual(tray1.body, stuff[10:])
+        self.assertRaises(raeting.PacketError, tray0.packets.__getitem__, 0)
+
+        # chunk iterator needs length and must supply it
+        chunks = (stuff[i:i + 333] for i in range(0, len(stuff), 333))
+        tray0 = packeting.TxStream(data=data, source=chunks)
+        self.assertRaises(raeting.PacketError, tray0.pack)
+        tray0 = packeting.TxStream(data=data, source=chunks, length=len(stuff) + 1)
+        tray0.pack()
+        packets = [tray0.packets[sn] for sn in range(len(tray0.packets) - 1)]
+        self.assertRaises(raeting.PacketError, tray0.packets.__getitem__,
+                          len(tray0.packets) - 1)
+
+        # short stream is one unsegmented packet
+        tray0 = packeting.TxStream(data=data, source=["Hello ", "Raet"], length=10)
+        tray0.pack()
+        self.assertEqual(len(tray0.packets), 1)
+        rxPacket = packeting.RxPacket(packed=tray0.packets[0].packed)
+        rxPacket.parse()
+        self.assertEqual(rxPacket.body.data, "Hello Raet")
+
+    def testRxSink(self):
+        '''
+        Test received stream segments written in order to sink
+        '''
+        console.terse("{0}\n".format(self.testRxSink.__doc__))
+        stuff = "".join(str(i).rjust(10, " ") for i in range(1000))
+        data = odict(hk=raeting.headKinds.raet, bk=raeting.bodyKinds.raw,
+                     ck=raeting.coatKinds.nada, fk=raeting.footKinds.nada)
+        tray0 = packeting.TxStream(data=data, source=StringIO(stuff))
+        tray0.pack()
+        packets = [tray0.packets[sn] for sn in range(len(tray0.packets))]
+        self.assertEqual(len(packets), 11)
+
+        target = StringIO()
+        heads = []
+        def sink(data):
+            heads.append(data)
+            return target
+
+        tray1 = packeting.RxTray(sink=sink)
+        order = [1, 2, 0, 4, 3] + range(5, len(packets))
+        written = []
+        for sn in order:
+            rxPacket = packeting.RxPacket(packed=packets[sn].packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+            written.append(len(target.getvalue()))
+            self.assertEqual(target.getvalue(), stuff[:len(target.getvalue())])
+        self.assertEqual(len(heads), 1)
+        self.assertEqual(written[:2], [0, 0]) # waits on segment 0
+        self.assertTrue(written[2] > 0) # then delivers in order prefix
+        self.assertTrue(written[-2] < len(stuff)) # before complete
+        self.assertTrue(tray1.complete)
+        self.assertIs(tray1.body, target)
+        self.assertEqual(target.getvalue(), stuff)
+        self.assertEqual(tray1.pending, {})
+
+        # sink returning None receives whole
+        tray1 = packeting.RxTray(sink=lambda data: None)
+        for packet in packets:
+            rxPacket = packeting.RxPacket(packed=packet.packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+        self.assertTrue(tray1.complete)
+        self.assertEqual(tray1.body, stuff)
+
+        # callable target
+        chunks = []
+        tray1 = packeting.RxTray(sink=lambda data: chunks.append)
+        for packet in packets:
+            rxPacket = packeting.RxPacket(packed=packet.packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+        self.assertTrue(tray1.complete)
+        self.assertEqual("".join(chunks), stuff)
+
 class StackTestCase(unittest.TestCase):
     '''
     Pack and Parse with stacks
@@ -518,6 +1194,7 @@ class StackTestCase(unittest.TestCase):
                                           'sn': 0,
                                           'sc': 2,
                                           'ml': 1200,
+                                          'pb': 0, 'mc': 0,
                                           'sf': True,
                                           'af': False,
                                           'bk': 2,
@@ -571,6 +1248,7 @@ class StackTestCase(unittest.TestCase):
                                           'sn': 0,
                                           'sc': 2,
                                           'ml': 1212,
+                                          'pb': 0, 'mc': 0,
                                           'sf': True,
                                           'af': False,
                                           'bk': 1,
@@ -636,6 +1314,7 @@ class StackTestCase(unittest.TestCase):
                                           'sn': 0,
                                           'sc': 2,
                                           'ml': 1252,
+                                          'pb': 0, 'mc': 0,
                                           'sf': True,
                                           'af': False,
                                           'bk': 1,
@@ -646,7 +1325,137 @@ class StackTestCase(unittest.TestCase):
 
         self.assertEqual( tray1.body, body)
 
+    def testSegmentedEncrypt(self):
+        '''
+        Segnacl coat boxes each segment so decrypted as it arrives
+        '''
+        console.terse("{0}\n".format(self.testSegmentedEncrypt.__doc__))
+        body = odict(stuff="".join(str(i).rjust(10, " ") for i in range(500)))
+        self.data.update(se=2, de=3,
+                    bk=raeting.bodyKinds.json,
+                    ck=raeting.coatKinds.segnacl,
+                    fk=raeting.footKinds.nacl)
+        tray0 = packeting.TxTray(stack=self.main, data=self.data, body=body)
+        tray0.pack()
+        sc = len(tray0.packets)
+        self.assertTrue(sc > 4)
+        ml = tray0.packets[0].data['ml']
+        self.assertEqual(ml, len(tray0.packed))
+        segsize = len(tray0.packets[0].coat.packed)
+        chunksize = segsize - packeting.SEAL_SIZE
+
+        # each segment is its own box with its own nonce
+        remote = self.other.remotes[3]
+        tl = raeting.tailSizes.segnacl
+        msgs = []
+        nonces = set()
+        for packet in tray0.packets:
+            self.assertTrue(packet.size <= raeting.UDP_MAX_PACKET_SIZE)
+            box = packet.coat.packed
+            nonces.add(box[-tl:])
+            msgs.append(remote.privee.decrypt(box[:-tl], box[-tl:], remote.publee.key))
+        self.assertEqual(len(nonces), sc)
+        self.assertEqual(len("".join(msgs)), ml - sc * packeting.SEAL_SIZE)
+
+        # out of order arrival opens each box before complete
+        tray1 = packeting.RxTray(stack=self.other)
+        for sn in reversed(range(1, sc)):
+            rxPacket = packeting.RxPacket(stack=self.other,
+                                          packed=tray0.packets[sn].packed)
+            rxPacket.parseOuter()
+            tray1.parse(rxPacket)
+            self.assertFalse(tray1.complete)
+            self.assertEqual(bytes(tray1.buffer[sn * chunksize:
+                                                sn * chunksize + len(msgs[sn])]),
+                             msgs[sn])
+        rxPacket = packeting.RxPacket(stack=self.other,
+                                      packed=tray0.packets[0].packed)
+        rxPacket.parseOuter()
+        tray1.parse(rxPacket)
+        self.assertTrue(tray1.complete)
+        self.assertEqual(tray1.packed, "".join(msgs))
+        self.assertEqual(tray1.body, body)
+
+        # tampered box fails on arrival
+        rxPacket = packeting.RxPacket(stack=self.other,
+                                      packed=tray0.packets[1].packed)
+        rxPacket.parseOuter()
+        hl = rxPacket.data['hl']
+        rxPacket.packed = "".join([rxPacket.packed[:hl],
+                                   chr(ord(rxPacket.packed[hl]) ^ 0xff),
+                                   rxPacket.packed[hl + 1:]])
+        tray1 = packeting.RxTray(stack=self.other)
+        self.assertRaises(raeting.PacketError, tray1.parse, rxPacket)
+
+        # unsegmented is one box
+        body = odict(stuff="Hello Raet")
+        tray0 = packeting.TxTray(stack=self.main, data=self.data, body=body)
+        tray0.pack()
+        self.assertEqual(len(tray0.packets), 1)
+        rxPacket = packeting.RxPacket(stack=self.other,
+                                      packed=tray0.packets[0].packed)
+        rxPacket.parseOuter()
+        tray1 = packeting.RxTray(stack=self.other)
+        tray1.parse(rxPacket)
+        self.assertTrue(tray1.complete)
+        self.assertEqual(tray1.body, body)
+
+    def testLazyBody(self):
+        '''
+        Lazy body decrypt and deserialize tests
+        '''
+        console.terse("{0}\n".format(self.testLazyBody.__doc__))
 
+        body = odict(stuff="lazy")
+        self.data.update(se=2, de=3,
+                    bk=raeting.bodyKinds.json,
+                    ck=raeting.coatKinds.nacl,
+                    fk=raeting.footKinds.nacl)
+        packet0 = packeting.TxPacket(stack=self.main, embody=body, data=self.data)
+        packet0.pack()
+
+        packet1 = packeting.RxPacket(stack=self.other, packed=packet0.packed)
+        packet1.parseOuter()
+        packet1.parseInner(lazy=True)
+        self.assertTrue(packet1.coat.lazy)
+        self.assertTrue(packet1.body.lazy)
+        self.assertEqual(packet1.body.packed, '') # not decrypted
+        self.assertEqual(packet1.body.data, body)
+        self.assertFalse(packet1.coat.lazy)
+        self.assertFalse(packet1.body.lazy)
+
+        # errors deferred until body read
+        packet1 = packeting.RxPacket(stack=self.other, packed=packet0.packed)
+        packet1.parseOuter()
+        packet1.data['bk'] = 99
+        packet1.parseInner(lazy=True)
+        with self.assertRaises(raeting.PacketError):
+            packet1.body.data
+        self.assertTrue(packet1.body.lazy)
+
+        # lazy tray yields decrypted body deserialized on read
+        tray1 = packeting.RxTray(stack=self.other, lazy=True)
+        packet1 = packeting.RxPacket(stack=self.other, packed=packet0.packed)
+        packet1.parseOuter()
+        lazy = tray1.parse(packet1)
+        self.assertTrue(tray1.complete)
+        self.assertIsInstance(lazy, packeting.RxBody)
+        self.assertTrue(lazy.lazy)
+        self.assertFalse(packet1.coat.lazy)
+        self.assertEqual(lazy.packed, '{"stuff":"lazy"}')
+
+        # forward lazy body without deserializing
+        packet2 = packeting.TxPacket(stack=self.main, embody=lazy, data=self.data)
+        packet2.pack()
+        self.assertTrue(lazy.lazy)
+        self.assertEqual(packet2.body.packed, lazy.packed)
+        self.assertEqual(lazy.data, body)
+
+        # forward as other body kind deserializes
+        self.data.update(bk=raeting.bodyKinds.msgpack)
+        packet2 = packeting.TxPacket(stack=self.main, embody=lazy, data=self.data)
+        packet2.body.pack()
+        self.assertEqual(packet2.body.data, body)
 
 def runOneBasic(test):
     '''
@@ -672,11 +1481,26 @@ def runSome():
              'testBasicRaetJson',
              'testBasicRaetMsgpack',
              'testBasicRaetRaw',
-             'testSegmentation']
+             'testBasicBinaryJson',
+             'testBinaryRoundTrip',
+             'testSegmentation',
+             'testSegmentationBinary',
+             'testSegmentationGaps',
+             'testSegmentationReassembly',
+             'testHeadTemplate',
+             'testIntegrityKinds',
+             'testPackedBody',
+             'testBatchBody',
+             'testCompressedBody',
+             'testParity',
+             'testTxStream',
+             'testRxSink']
     tests.extend(map(BasicTestCase, names))
 
     names = ['testSign',
-             'testEncrypt', ]
+             'testEncrypt',
+             'testSegmentedEncrypt',
+             'testLazyBody', ]
     tests.extend(map(StackTestCase, names))
 
     suite = unittest.TestSuite(tests)
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+'''
+Tests for batched udp server
+
+'''
+# pylint: skip-file
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+import os
+import time
+import tempfile
+import shutil
+import socket
+import errno
+
+from ioflo.base.odicting import odict
+from ioflo.base.aiding import StoreTimer
+from ioflo.base import storing
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+from raet import raeting, nacling
+from raet.road import keeping, estating, stacking, serving
+
+def setUpModule():
+    console.reinit(verbosity=console.Wordage.concise)
+
+def tearDownModule():
+    pass
+
+class ServerTestCase(unittest.TestCase):
+    """
+    Test batched server receive and send
+    """
+
+    def setUp(self):
+        self.alpha = serving.SocketUdpBatchNb(ha=('127.0.0.1', raeting.RAET_PORT),
+                                              bufsize=raeting.UDP_MAX_PACKET_SIZE * 2,
+                                              count=16)
+        self.assertTrue(self.alpha.reopen())
+        self.beta = serving.SocketUdpBatchNb(ha=('127.0.0.1', raeting.RAET_TEST_PORT),
+                                             bufsize=raeting.UDP_MAX_PACKET_SIZE * 2,
+                                             count=16)
+        self.assertTrue(self.beta.reopen())
+
+    def tearDown(self):
+        self.alpha.close()
+        self.beta.close()
+
+    def receiveAll(self, server, expected):
+        '''
+        Receive until expected number of datagrams or timeout
+        '''
+        rxes = []
+        end = time.time() + 1.0
+        while len(rxes) < expected and time.time() < end:
+            rxes.extend(server.receiveMany())
+            time.sleep(0.01)
+        return rxes
+
+    def batch(self):
+        '''
+        Send batch of datagrams alpha to beta and check them in order
+        '''
+        duples = [("Datagram {0} ".format(i).ljust(100 + i, 'x'), self.beta.ha)
+                  for i in range(40)]
+        sent = 0
+        while sent < len(duples):
+            sent += self.alpha.sendMany(duples[sent:sent + self.alpha.count])
+        self.assertEqual(sent, 40)
+
+        rxes = self.receiveAll(self.beta, 40)
+        self.assertEqual(len(rxes), 40)
+        for i, (data, sa) in enumerate(rxes):
+            self.assertEqual(data, duples[i][0])
+            self.assertEqual(sa, self.alpha.ha)
+        self.assertEqual(self.beta.receiveMany(), [])
+
+    def testBatch(self):
+        '''
+        Test batched send and receive of datagrams
+        '''
+        console.terse("{0}\n".format(self.testBatch.__doc__))
+        if not serving.MMSG:
+            self.skipTest("recvmmsg and sendmmsg not available")
+        self.assertTrue(self.alpha.mmsg)
+        self.batch()
+
+    def testFallback(self):
+        '''
+        Test per datagram fallback of batched send and receive
+        '''
+        console.terse("{0}\n".format(self.testFallback.__doc__))
+        self.alpha.mmsg = False
+        self.beta.mmsg = False
+        self.batch()
+
+    def testMixed(self):
+        '''
+        Test batched server interoperates with per datagram receive and send
+        '''
+        console.terse("{0}\n".format(self.testMixed.__doc__))
+        self.alpha.send("Hello Beta", self.beta.ha)
+        rxes = self.receiveAll(self.beta, 1)
+        self.assertEqual(rxes, [("Hello Beta", self.alpha.ha)])
+
+        self.assertEqual(self.beta.sendMany([("Hello Alpha", self.alpha.ha)]), 1)
+        end = time.time() + 1.0
+        data, sa = self.alpha.receive()
+        while not data and time.time() < end:
+            time.sleep(0.01)
+            data, sa = self.alpha.receive()
+        self.assertEqual((data, sa), ("Hello Alpha", self.beta.ha))
+
+    def testSockaddr(self):
+        '''
+        Test pack and unpack of sockaddr_in
+        '''
+        console.terse("{0}\n".format(self.testSockaddr.__doc__))
+        raw = serving.packSockaddr(('10.0.2.30', 7530))
+        self.assertEqual(len(raw), 16)
+        self.assertEqual(serving.unpackSockaddr(raw), ('10.0.2.30', 7530))
+        raw = serving.packSockaddr(('', 7530))
+        self.assertEqual(serving.unpackSockaddr(raw), ('0.0.0.0', 7530))
+
+    def testCache(self):
+        '''
+        Test address caches keep only recently used peers
+        '''
+        console.terse("{0}\n".format(self.testCache.__doc__))
+        if not serving.MMSG:
+            self.skipTest("recvmmsg and sendmmsg not available")
+        self.alpha.Cache = 4
+        self.beta.Cache = 4
+        peers = []
+        try:
+            for i in range(6):
+                peer = serving.SocketUdpBatchNb(ha=('127.0.0.1', raeting.RAET_TEST_PORT + 1 + i),
+                                                bufsize=raeting.UDP_MAX_PACKET_SIZE)
+                self.assertTrue(peer.reopen())
+                peers.append(peer)
+                self.assertEqual(peer.sendMany([("Hello {0}".format(i), self.beta.ha)]), 1)
+            rxes = self.receiveAll(self.beta, 6)
+            self.assertEqual([sa for data, sa in rxes], [peer.ha for peer in peers])
+            self.assertEqual(self.beta.sas.values(), [peer.ha for peer in peers[-4:]])
+
+            duples = [("Hello", peer.ha) for peer in peers]
+            self.assertEqual(self.alpha.sendMany(duples), 6)
+            self.assertEqual(self.alpha.names.keys(), [peer.ha for peer in peers[-4:]])
+            for peer in peers:
+                self.assertEqual(self.receiveAll(peer, 1), [("Hello", self.alpha.ha)])
+        finally:
+            for peer in peers:
+                peer.close()
+
+    def testTruncated(self):
+        '''
+        Test datagram larger than buffer slot is discarded and counted
+        '''
+        console.terse("{0}\n".format(self.testTruncated.__doc__))
+        if not serving.MMSG:
+            self.skipTest("recvmmsg and sendmmsg not available")
+        self.beta.close()
+        self.beta = serving.SocketUdpBatchNb(ha=('127.0.0.1', raeting.RAET_TEST_PORT),
+                                             bufsize=64,
+                                             count=16)
+        self.assertTrue(self.beta.reopen())
+        self.alpha.send("x" * 100, self.beta.ha)
+        self.alpha.send("y" * 10, self.beta.ha)
+        rxes = self.receiveAll(self.beta, 1)
+        self.assertEqual(rxes, [("y" * 10, self.alpha.ha)])
+        self.assertEqual(self.beta.truncateds, 1)
+
+    def testSendFailure(self):
+        '''
+        Test failed datagram ends batch and is first of next batch
+        '''
+        console.terse("{0}\n".format(self.testSendFailure.__doc__))
+        for mmsg in (True, False):
+            if mmsg and not serving.MMSG:
+                continue
+            self.alpha.mmsg = mmsg
+            huge = "x" * max(self.alpha.bs + 1, 70000) # too big for udp too
+            duples = [("one", self.beta.ha), (huge, self.beta.ha), ("two", self.beta.ha)]
+            self.assertEqual(self.alpha.sendMany(duples), 1)
+            with self.assertRaises(socket.error) as cm:
+                self.alpha.sendMany(duples[1:])
+            self.assertEqual(cm.exception.errno, errno.EMSGSIZE)
+            self.assertEqual(self.alpha.sendMany(duples[2:]), 1)
+            rxes = self.receiveAll(self.beta, 2)
+            self.assertEqual([data for data, sa in rxes], ["one", "two"])
+
+class StackTestCase(unittest.TestCase):
+    """
+    Test road stacks with batched servers
+    """
+
+    def setUp(self):
+        self.store = storing.Store(stamp=0.0)
+        self.timer = StoreTimer(store=self.store, duration=1.0)
+
+        self.baseDirpath=tempfile.mkdtemp(prefix="raet",  suffix="base", dir='/tmp')
+        stacking.RoadStack.Bk = raeting.bodyKinds.json
+
+        mainDirpath = os.path.join(self.baseDirpath, 'road', 'keep', 'main')
+        otherDirpath = os.path.join(self.baseDirpath, 'road', 'keep', 'other')
+        keeping.clearAllKeep(mainDirpath)
+        keeping.clearAllKeep(otherDirpath)
+
+        self.main = stacking.RoadStack(store=self.store,
+                                       name='main',
+                                       main=True,
+                                       auto=raeting.autoModes.once,
+                                       dirpath=mainDirpath,
+                                       batched=True,
+                                       )
+
+        self.other = stacking.RoadStack(store=self.store,
+                                        name='other',
+                                        auto=raeting.autoModes.once,
+                                        ha=("", raeting.RAET_TEST_PORT),
+                                        dirpath=otherDirpath,
+                                        batched=True,
+                                        )
+
+    def tearDown(self):
+        self.main.server.close()
+        self.other.server.close()
+
+        self.main.clearAllDir()
+        self.other.clearAllDir()
+
+        if os.path.exists(self.baseDirpath):
+            shutil.rmtree(self.baseDirpath)
+
+    def service(self, duration=1.0):
+        '''
+        Utility method to service queues. Call from test method.
+        '''
+        self.timer.restart(duration=duration)
+        while not self.timer.expired:
+            self.other.serviceAll()
+            self.main.serviceAll()
+            if not (self.main.transactions or self.other.transactions):
+                break
+            self.store.advanceStamp(0.1)
+            time.sleep(0.1)
+
+    def testSegmentedBatched(self):
+        '''
+        Test join allow and segmented messages with batched servers
+        '''
+        console.terse("{0}\n".format(self.testSegmentedBatched.__doc__))
+        self.assertTrue(isinstance(self.main.server, serving.SocketUdpBatchNb))
+        self.assertTrue(isinstance(self.other.server, serving.SocketUdpBatchNb))
+
+        self.other.addRemote(estating.RemoteEstate(stack=self.other,
+                                                   fuid=0,
+                                                   sid=0,
+                                                   ha=self.main.local.ha))
+        self.other.join()
+        self.service()
+        self.assertTrue(self.other.remotes.values()[0].joined)
+
+        self.other.allow()
+        self.service()
+        self.assertTrue(self.other.remotes.values()[0].allowed)
+        self.assertTrue(self.main.remotes.values()[0].allowed)
+
+        bloat = "".join(str(i).rjust(100, " ") for i in range(300))
+        mains = [odict(house="Main", queue="gig stuff", bloat=bloat)]
+        others = [odict(house="Other", queue="big stuff", bloat=bloat)]
+        for msg in mains:
+            self.main.transmit(msg)
+        for msg in others:
+            self.other.transmit(msg)
+        self.service(duration=3.0)
+
+        self.assertEqual(len(self.main.transactions), 0)
+        self.assertEqual(len(self.other.transactions), 0)
+        self.assertEqual(len(self.main.rxMsgs), 1)
+        self.assertDictEqual(self.main.rxMsgs[0][0], others[0])
+        self.assertEqual(len(self.other.rxMsgs), 1)
+        self.assertDictEqual(self.other.rxMsgs[0][0], mains[0])
+
+        # failed datagram is dropped and rest of its batch kept
+        huge = "x" * max(self.main.server.bs + 1, 70000)
+        self.main.txes.extend([(huge, self.other.local.ha), ("after", self.other.local.ha)])
+        self.assertRaises(socket.error, self.main.serviceTxes)
+        self.assertEqual(list(self.main.txes), [("after", self.other.local.ha)])
+        self.main.serviceTxes()
+        self.assertEqual(len(self.main.txes), 0)
+
+def runSome():
+    """ Unittest runner """
+    tests = []
+    names = ['testBatch',
+             'testFallback',
+             'testMixed',
+             'testSockaddr',
+             'testCache',
+             'testTruncated',
+             'testSendFailure', ]
+    tests.extend(map(ServerTestCase, names))
+
+    names = ['testSegmentedBatched', ]
+    tests.extend(map(StackTestCase, names))
+
+    suite = unittest.TestSuite(tests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+def runAll():
+    """ Unittest runner """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(ServerTestCase))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(StackTestCase))
+
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+if __name__ == '__main__' and __package__ is None:
+
+    #console.reinit(verbosity=console.Wordage.concise)
+
+    runAll() #run all unittests
+
+    #runSome()#only run some
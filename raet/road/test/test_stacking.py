@@ -15,6 +15,7 @@ import os
 import time
 import tempfile
 import shutil
+from StringIO import StringIO
 
 from ioflo.base.odicting import odict
 from ioflo.base.aiding import Timer, StoreTimer
@@ -23,8 +24,8 @@ from ioflo.base import storing
 from ioflo.base.consoling import getConsole
 console = getConsole()
 
-from raet import raeting, nacling
-from raet.road import keeping, estating, stacking, transacting
+from raet import raeting, nacling, zipping
+from raet.road import keeping, estating, stacking, transacting, packeting
 
 def setUpModule():
     console.reinit(verbosity=console.Wordage.concise)
@@ -41,6 +42,7 @@ class BasicTestCase(unittest.TestCase):
 
         self.baseDirpath=tempfile.mkdtemp(prefix="raet",  suffix="base", dir='/tmp')
         stacking.RoadStack.Bk = raeting.bodyKinds.json
+        stacking.RoadStack.Hk = raeting.headKinds.raet
 
         #main stack
         mainName = "main"
@@ -93,6 +95,8 @@ class BasicTestCase(unittest.TestCase):
         if os.path.exists(self.baseDirpath):
             shutil.rmtree(self.baseDirpath)
 
+        stacking.RoadStack.Hk = raeting.headKinds.raet
+
 
     def join(self, timeout=None):
         '''
@@ -230,6 +234,7 @@ class BasicTestCase(unittest.TestCase):
         self.assertEqual(len(self.main.transactions), 0)
         remote = self.main.remotes.values()[0]
         self.assertTrue(remote.allowed)
+        self.assertIsNot(remote.boxer, None)
         self.assertEqual(len(remote.transactions), 0)
         console.terse("Stack '{0}' estate name '{1}' allowd with '{2}' = {3}\n".format(
                 self.main.name, self.main.local.name, remote.name, remote.allowed))
@@ -238,6 +243,7 @@ class BasicTestCase(unittest.TestCase):
         self.assertEqual(len(self.other.transactions), 0)
         remote = self.other.remotes.values()[0]
         self.assertTrue(remote.allowed)
+        self.assertIsNot(remote.boxer, None)
         self.assertEqual(len(remote.transactions), 0)
         console.terse("Stack '{0}' estate name '{1}' allowed with '{2}' = {3}\n".format(
                 self.other.name, self.other.local.name, remote.name, remote.allowed))
@@ -331,6 +337,33 @@ class BasicTestCase(unittest.TestCase):
         console.terse("{0}\n".format(self.testBootstrapMsgpack.__doc__))
         self.bootstrap(bk=raeting.bodyKinds.msgpack)
 
+    def testBootstrapBinary(self):
+        '''
+        Test join allow message transactions with binary head kind
+        '''
+        console.terse("{0}\n".format(self.testBootstrapBinary.__doc__))
+        stacking.RoadStack.Hk = raeting.headKinds.binary
+        self.bootstrap(bk=raeting.bodyKinds.json)
+
+    def testSegmentedBinary(self):
+        '''
+        Test segmented message transactions with binary head kind
+        '''
+        console.terse("{0}\n".format(self.testSegmentedBinary.__doc__))
+        stacking.RoadStack.Hk = raeting.headKinds.binary
+
+        bloat = []
+        for i in range(300):
+            bloat.append(str(i).rjust(100, " "))
+        bloat = "".join(bloat)
+
+        others = []
+        mains = []
+        others.append(odict(house="Other", queue="big stuff", bloat=bloat))
+        mains.append(odict(house="Main", queue="gig stuff", bloat=bloat))
+
+        self.bidirectional(bk=raeting.bodyKinds.msgpack, mains=mains, others=others)
+
     def testMsgBothwaysJson(self):
         '''
         Test message transactions
@@ -573,6 +606,1058 @@ class BasicTestCase(unittest.TestCase):
         console.terse("Stack '{0}' estate name '{1}' joined with '{2}' = {3}\n".format(
                 self.other.name, self.other.local.name, remote.name, remote.joined))
 
+    def testReboxAllow(self):
+        '''
+        Test precomputed shared key box dropped on rekey and refreshed on allow
+        '''
+        console.terse("{0}\n".format(self.testReboxAllow.__doc__))
+
+        self.join()
+        self.allow()
+        mainRemote = self.main.remotes.values()[0]
+        otherRemote = self.other.remotes.values()[0]
+        self.assertTrue(mainRemote.allowed)
+        self.assertTrue(otherRemote.allowed)
+        mainBoxer = mainRemote.boxer
+        otherBoxer = otherRemote.boxer
+        self.assertIsNot(mainBoxer, None)
+        self.assertIsNot(otherBoxer, None)
+
+        otherRemote.rekey()
+        self.assertIs(otherRemote.boxer, None)
+        self.assertIs(otherRemote.allowed, None)
+
+        self.allow()
+        self.assertTrue(mainRemote.allowed)
+        self.assertTrue(otherRemote.allowed)
+        self.assertIsNot(mainRemote.boxer, None)
+        self.assertIsNot(otherRemote.boxer, None)
+        self.assertIsNot(mainRemote.boxer, mainBoxer)
+        self.assertIsNot(otherRemote.boxer, otherBoxer)
+
+        self.main.transmit(odict(house="Main", queue="reboxed"))
+        self.other.transmit(odict(house="Other", queue="reboxed"))
+        self.service()
+        self.assertEqual(len(self.main.rxMsgs), 1)
+        self.assertEqual(len(self.other.rxMsgs), 1)
+
+    def testProcessDue(self):
+        '''
+        Test process only visits remotes with transaction timers due
+        '''
+        console.terse("{0}\n".format(self.testProcessDue.__doc__))
+
+        self.join()
+        self.allow()
+        self.assertEqual(len(self.main.transactions), 0)
+        self.assertEqual(len(self.other.transactions), 0)
+
+        # stale entries of completed transactions drain without processing
+        self.store.advanceStamp(20.0)
+        for stack in [self.main, self.other]:
+            stack.process()
+            self.assertEqual(len(stack.timers), 0)
+            self.assertIs(stack.remaining(), None)
+
+        remote = self.other.remotes.values()[0]
+        processeds = []
+        process = remote.process
+        remote.process = lambda: processeds.append(remote) or process()
+        self.other.process()
+        self.assertEqual(processeds, [])
+
+        self.other.transmit(odict(house="Other", queue="due"))
+        self.other.serviceAllTx() # messenger waits for ack that never comes
+        self.assertEqual(len(self.other.transactions), 1)
+        remaining = self.other.remaining()
+        self.assertAlmostEqual(remaining, self.other.transactions[0].redoTimer.duration)
+        self.other.process()
+        self.assertEqual(processeds, [])
+        self.store.advanceStamp(remaining)
+        self.other.process()
+        self.assertEqual(processeds, [remote])
+        self.assertEqual(self.other.stats.get('redo_segment'), 1)
+
+        # restarted presence timers supersede their entries
+        for i in range(5000):
+            self.store.advanceStamp(1.0)
+            remote.refresh(alived=True)
+            self.assertTrue(len(self.other.remoteTimers) <= 8)
+        self.assertEqual(self.other.remoteTimers.peek(), remote.timer.stop)
+
+        # presence listings follow changes instead of scanning every remote
+        self.other.manage()
+        self.assertEqual(len(self.other.presences), 0)
+        self.assertIs(self.other.alloweds[remote.name], remote)
+        self.assertIs(self.other.aliveds[remote.name], remote)
+        self.assertIn(remote.name, self.other.availables)
+        self.other.manage()
+        self.assertEqual(self.other.changeds, odict(plus=set(), minus=set()))
+        remote.alived = True # unchanged
+        self.assertEqual(len(self.other.presences), 0)
+        remote.alived = False
+        self.assertEqual(self.other.presences.values(), [remote])
+        self.other.manage()
+        self.assertEqual(self.other.changeds, odict(plus=set(), minus=set([remote.name])))
+        self.assertNotIn(remote.name, self.other.aliveds)
+        self.assertNotIn(remote.name, self.other.availables)
+        remote.alived = True
+        self.other.manage()
+        self.assertEqual(self.other.changeds, odict(plus=set([remote.name]), minus=set()))
+        self.assertIn(remote.name, self.other.availables)
+
+        # removed remote is no longer scheduled nor listed
+        self.other.removeRemote(remote)
+        self.assertIs(self.other.remoteTimers.peek(), None)
+        self.other.manage()
+        self.assertEqual(self.other.changeds, odict(plus=set(), minus=set([remote.name])))
+        self.assertEqual(len(self.other.alloweds), 0)
+        self.assertEqual(len(self.other.aliveds), 0)
+        self.assertEqual(len(self.other.listings), 0)
+
+    def testRoundTrip(self):
+        '''
+        Test round trip estimate of remote drives redo timeouts
+        '''
+        console.terse("{0}\n".format(self.testRoundTrip.__doc__))
+
+        remote = estating.RemoteEstate(stack=self.main, fuid=0, sid=0)
+        self.assertIs(remote.rto, None)
+        remote.sampleRtt(0.2)
+        self.assertAlmostEqual(remote.srtt, 0.2)
+        self.assertAlmostEqual(remote.rttvar, 0.1)
+        self.assertAlmostEqual(remote.rto, 0.6)
+        remote.sampleRtt(0.2)
+        self.assertAlmostEqual(remote.srtt, 0.2)
+        self.assertAlmostEqual(remote.rttvar, 0.075)
+        self.assertAlmostEqual(remote.rto, 0.5)
+        remote.sampleRtt(0.0)
+        self.assertAlmostEqual(remote.srtt, 0.175)
+        self.assertAlmostEqual(remote.rttvar, 0.10625)
+        remote.sampleRtt(-1.0) # ignored
+        self.assertAlmostEqual(remote.srtt, 0.175)
+        for i in range(100):
+            remote.sampleRtt(0.0)
+        self.assertEqual(remote.rto, remote.RtoMin)
+        self.assertEqual(self.main.stats['rto_{0}'.format(remote.name)], remote.rto)
+        self.main.interval = 0.5 # not sooner than next service pass
+        remote.sampleRtt(0.0)
+        self.assertEqual(remote.rto, 0.5)
+        self.main.interval = 0.0
+
+        self.join()
+        self.allow()
+        remote = self.other.remotes.values()[0]
+        self.assertIsNot(remote.srtt, None)
+        self.assertIsNot(remote.rto, None)
+        self.assertTrue(self.other.stats.get('rtt_sample') >= 3) # join and allow
+        self.assertEqual(self.other.stats['srtt_{0}'.format(remote.name)], remote.srtt)
+        self.assertEqual(self.other.stats['rto_{0}'.format(remote.name)], remote.rto)
+
+        messenger = transacting.Messenger(stack=self.other, remote=remote)
+        self.assertEqual(messenger.redoTimeoutMin, remote.rto)
+        self.assertEqual(messenger.redoTimeoutMax, messenger.RedoTimeoutMax)
+        self.assertEqual(messenger.redoTimer.duration, remote.rto)
+        messenger = transacting.Messenger(stack=self.other, remote=remote,
+                                          redoTimeoutMin=2.0)
+        self.assertEqual(messenger.redoTimeoutMin, 2.0)
+
+        remote.sampleRtt(10.0) # slow link raises max so no spurious redos
+        messenger = transacting.Messenger(stack=self.other, remote=remote)
+        self.assertEqual(messenger.redoTimeoutMin, remote.rto)
+        self.assertEqual(messenger.redoTimeoutMax, remote.rto)
+        self.assertTrue(self.other.interval > 0.0)
+
+        # refusal is not an answer to alive request so not sampled
+        self.main.remotes.values()[0].joined = False
+        self.other.alive()
+        self.other.serviceAllTx()
+        samples = self.other.stats['rtt_sample']
+        self.store.advanceStamp(0.1)
+        self.main.serviceAll()
+        self.store.advanceStamp(0.1)
+        self.other.serviceAllRx()
+        self.assertEqual(self.other.stats.get('aliver_transaction_failure'), 1)
+        self.assertEqual(self.other.stats['rtt_sample'], samples)
+        self.service()
+        self.assertEqual(self.other.stats['rtt_sample'], samples + 1) # rejoin
+
+        # interval is smoothed so burst of quick passes does not zero it
+        self.main.interval = 0.0
+        self.main.serviced = None
+        for i in range(40):
+            self.store.advanceStamp(0.5)
+            self.main.process()
+        self.assertAlmostEqual(self.main.interval, 0.5)
+        for i in range(3):
+            self.store.advanceStamp(0.001)
+            self.main.process()
+            self.main.process() # same stamp not sampled
+        self.assertTrue(self.main.interval > 0.3)
+        remote = self.main.remotes.values()[0]
+        remote.sampleRtt(0.0)
+        self.assertTrue(remote.rto > 0.3)
+
+    def testSegmentedWindowed(self):
+        '''
+        Test segmented messages sent with congestion window over lossy link
+        '''
+        console.terse("{0}\n".format(self.testSegmentedWindowed.__doc__))
+
+        self.join()
+        self.allow()
+        self.other.windowed = True
+
+        bloat = []
+        for i in range(300):
+            bloat.append(str(i).rjust(100, " "))
+        bloat = "".join(bloat)
+        body = odict(house="Other", queue="big stuff", bloat=bloat)
+
+        self.other.transmit(body)
+        self.other.serviceAllTx()
+        messenger = self.other.transactions[0]
+        self.assertTrue(messenger.window)
+        self.assertTrue(messenger.wait)
+        count = len(messenger.tray.packets)
+        self.assertTrue(count > 4)
+        self.assertEqual(messenger.tray.current, int(messenger.Window)) # initial window
+        self.service(duration=3.0)
+        self.assertEqual(len(self.main.rxMsgs), 1)
+        self.assertDictEqual(body, self.main.rxMsgs[0][0])
+        self.assertEqual(len(self.other.transactions), 0)
+        self.assertEqual(len(self.main.transactions), 0)
+        self.assertEqual(self.main.stats.get('message_segment_ack'), count)
+        self.assertTrue(messenger.cwnd > messenger.Window) # slow start grew window
+        self.assertIs(self.other.stats.get('message_window_decrease'), None)
+
+        # drop two segments in one window so two resends but one decrease
+        receive = self.main.server.receive
+        rxCount = [0]
+        def lossy():
+            rx, ra = receive()
+            if rx:
+                rxCount[0] += 1
+                if rxCount[0] in (4, 5):
+                    return receive()
+            return (rx, ra)
+        self.main.server.receive = lossy
+
+        self.other.transmit(body)
+        self.other.serviceAllTx()
+        messenger = self.other.transactions[0]
+        self.service(duration=3.0)
+        self.assertEqual(len(self.main.rxMsgs), 2)
+        self.assertDictEqual(body, self.main.rxMsgs[1][0])
+        self.assertEqual(len(self.other.transactions), 0)
+        self.assertEqual(len(self.main.transactions), 0)
+        self.assertEqual(self.main.stats.get('message_resend'), 2)
+        self.assertEqual(self.other.stats.get('message_window_decrease'), 1)
+        self.assertTrue(messenger.ssthresh < messenger.WindowMax)
+
+    def testResendMisseds(self):
+        '''
+        Test resend requests carry misseds list to remote without gaps
+        '''
+        console.terse("{0}\n".format(self.testResendMisseds.__doc__))
+
+        self.join()
+        self.allow()
+        remote = self.main.remotes.values()[0]
+        self.assertTrue(remote.gapped)
+        self.assertTrue(self.other.remotes.values()[0].gapped)
+
+        bloat = []
+        for i in range(300):
+            bloat.append(str(i).rjust(100, " "))
+        bloat = "".join(bloat)
+        body = odict(house="Other", queue="big stuff", bloat=bloat)
+
+        receive = self.main.server.receive
+        rxCount = [0]
+        def lossy():
+            rx, ra = receive()
+            if rx:
+                rxCount[0] += 1
+                if rxCount[0] in (2, 3, 5):
+                    return receive()
+            return (rx, ra)
+        self.main.server.receive = lossy
+
+        resends = []
+        parseInner = self.other.parseInner
+        def spy(packet, **kwa):
+            result = parseInner(packet, **kwa)
+            if result and packet.data['pk'] == raeting.pcktKinds.resend:
+                resends.append(packet.body.data)
+            return result
+        self.other.parseInner = spy
+
+        for gapped in (True, False):
+            remote.gapped = gapped # False as baseline remote without gaps
+            rxCount[0] = 0
+            del resends[:]
+            self.other.transmit(body)
+            self.service(duration=3.0)
+            self.assertDictEqual(body, self.main.rxMsgs[-1][0])
+            self.assertEqual(len(self.other.transactions), 0)
+            self.assertEqual(len(self.main.transactions), 0)
+            self.assertTrue(resends)
+            misseds = []
+            for resend in resends:
+                if gapped:
+                    self.assertNotIn('misseds', resend)
+                    for first, stop in resend['gaps']:
+                        misseds.extend(range(first, stop))
+                else:
+                    self.assertNotIn('gaps', resend)
+                    misseds.extend(resend['misseds'])
+            self.assertEqual(sorted(set(misseds)), [1, 3, 6])
+        self.assertEqual(len(self.main.rxMsgs), 2)
+
+    def testParity(self):
+        '''
+        Test parity segments rebuild lost segments without resend
+        '''
+        console.terse("{0}\n".format(self.testParity.__doc__))
+
+        self.join()
+        self.allow()
+        self.other.fec = 4
+
+        bloat = []
+        for i in range(300):
+            bloat.append(str(i).rjust(100, " "))
+        bloat = "".join(bloat)
+        body = odict(house="Other", queue="big stuff", bloat=bloat)
+
+        # no loss so parity after completion is stale
+        self.other.transmit(body)
+        self.service()
+        self.assertEqual(len(self.main.rxMsgs), 1)
+        self.assertDictEqual(body, self.main.rxMsgs.popleft()[0])
+        self.assertEqual(len(self.main.transactions), 0)
+        self.assertTrue(self.main.stats.get('stale_parity') > 0)
+        self.assertIs(self.main.stats.get('message_resend'), None)
+
+        # drop one segment in each of two blocks
+        receive = self.main.server.receive
+        rxCount = [0]
+        def lossy():
+            rx, ra = receive()
+            if rx:
+                rxCount[0] += 1
+                if rxCount[0] in (2, 7):
+                    return receive()
+            return (rx, ra)
+        self.main.server.receive = lossy
+
+        self.other.transmit(body)
+        self.other.serviceAllTx()
+        messenger = self.other.transactions[0]
+        sc = messenger.tray.packets[0].data['sc']
+        self.assertEqual(len(messenger.tray.packets), sc + (sc + 3) // 4)
+        self.service()
+        self.assertEqual(len(self.main.rxMsgs), 1)
+        self.assertDictEqual(body, self.main.rxMsgs.popleft()[0])
+        self.assertEqual(len(self.other.transactions), 0)
+        self.assertEqual(len(self.main.transactions), 0)
+        self.assertIs(self.main.stats.get('message_resend'), None)
+
+        # two lost in one block needs one resend
+        rxCount[0] = 0
+        def lossy():
+            rx, ra = receive()
+            if rx:
+                rxCount[0] += 1
+                if rxCount[0] in (2, 3):
+                    return receive()
+            return (rx, ra)
+        self.main.server.receive = lossy
+        self.other.transmit(body)
+        self.service(duration=3.0)
+        self.assertEqual(len(self.main.rxMsgs), 1)
+        self.assertDictEqual(body, self.main.rxMsgs.popleft()[0])
+        self.assertEqual(self.main.stats.get('message_resend'), 1)
+        self.assertEqual(len(self.other.transactions), 0)
+
+    def testLazyMessage(self):
+        '''
+        Test lazy received message bodies and forwarding without decoding
+        '''
+        console.terse("{0}\n".format(self.testLazyMessage.__doc__))
+        self.join()
+        self.allow()
+        self.main.lazy = True
+
+        bloat = "".join(str(i).rjust(100, " ") for i in range(30))
+        bodies = [odict(house="Small", queue="near stuff"),
+                  odict(house="Big", queue="far stuff", bloat=bloat)]
+        for body in bodies:
+            self.other.transmit(body)
+        self.service()
+
+        self.assertEqual(len(self.main.rxMsgs), 2)
+        for i, (msg, name) in enumerate(self.main.rxMsgs):
+            self.assertEqual(name, self.other.local.name)
+            self.assertIsInstance(msg, packeting.RxBody)
+            self.assertTrue(msg.lazy)
+
+        # forward back without deserializing
+        for msg, name in self.main.rxMsgs:
+            self.main.transmit(msg)
+        self.service()
+        self.assertTrue(all(msg.lazy for msg, name in self.main.rxMsgs))
+        self.assertEqual(len(self.other.rxMsgs), 2)
+        for i, (msg, name) in enumerate(self.other.rxMsgs):
+            self.assertDictEqual(msg, bodies[i])
+            self.assertDictEqual(self.main.rxMsgs[i][0].data, bodies[i])
+        self.other.rxMsgs.clear()
+
+        # forwarded lazy body saved when session goes stale then resent
+        otherRemote = self.main.remotes.values()[0]
+        self.main.transmit(self.main.rxMsgs[0][0])
+        self.main.serviceTxMsgs()
+        self.assertEqual(len(self.main.transactions), 1)
+        otherRemote.sid += 1
+        otherRemote.replaceStaleInitiators()
+        otherRemote.sid -= 1
+        self.assertIs(otherRemote.messages[0][0], self.main.rxMsgs[0][0])
+        otherRemote.sendSavedMessages()
+        self.service()
+        self.assertTrue(self.other.rxMsgs)
+        for msg, name in self.other.rxMsgs:
+            self.assertDictEqual(msg, bodies[0])
+
+    def testAuthed(self):
+        '''
+        Test session authenticator foot replaces signatures once allowed
+        '''
+        console.terse("{0}\n".format(self.testAuthed.__doc__))
+        self.main.authed = True
+        self.other.authed = True
+        self.join()
+        mainRemote = self.other.remotes.values()[0]
+        otherRemote = self.main.remotes.values()[0]
+        self.assertTrue(mainRemote.authed)
+        self.assertTrue(otherRemote.authed)
+        self.assertEqual(self.other.footKind(mainRemote), raeting.footKinds.nacl)
+
+        self.other.allow()
+        self.service()
+        self.assertTrue(mainRemote.allowed)
+        self.assertTrue(otherRemote.allowed)
+        self.assertEqual(self.other.footKind(mainRemote), raeting.footKinds.auth)
+
+        signs = []
+        for stack in [self.main, self.other]:
+            signer = stack.local.signer
+            signer.signature = lambda msg, sign=signer.signature: signs.append(msg) or sign(msg)
+
+        bloat = "".join(str(i).rjust(100, " ") for i in range(30))
+        bodies = [odict(house="Small"), odict(house="Big", bloat=bloat)]
+        for body in bodies:
+            self.other.transmit(body)
+            self.main.transmit(body)
+        self.service()
+        self.alive(self.other, self.main)
+        self.assertEqual(len(self.main.transactions), 0)
+        self.assertEqual(len(self.other.transactions), 0)
+        self.assertEqual([msg for msg, name in self.main.rxMsgs], bodies)
+        self.assertEqual([msg for msg, name in self.other.rxMsgs], bodies)
+        self.assertEqual(self.main.stats.get('alive_complete'), 1)
+        self.assertEqual(signs, [])
+
+        # wrong session key fails authentication
+        mainRemote.boxer.authkey = "".rjust(32, '\x00')
+        self.other.transmit(odict(house="Stale"))
+        self.service(duration=0.5)
+        self.assertEqual(len(self.main.rxMsgs), 2)
+        self.assertTrue(self.main.stats.get('parsing_outer_error') >= 1)
+
+        # remote that did not advertise at join is signed
+        mainRemote.authed = False
+        self.assertEqual(self.other.footKind(mainRemote), raeting.footKinds.nacl)
+
+    def testRemoteKinds(self):
+        '''
+        Test per remote integrity check foot and coat kinds
+        '''
+        console.terse("{0}\n".format(self.testRemoteKinds.__doc__))
+        self.join()
+        self.allow()
+        mainRemote = self.other.remotes.values()[0]
+        otherRemote = self.main.remotes.values()[0]
+
+        for fk, ck in [(raeting.footKinds.sha2, raeting.coatKinds.crc16),
+                       (raeting.footKinds.crc64, raeting.coatKinds.crc64)]:
+            mainRemote.fk = otherRemote.fk = fk
+            mainRemote.ck = otherRemote.ck = ck
+            self.assertEqual(self.other.footKind(mainRemote), fk)
+            self.assertEqual(self.other.coatKind(mainRemote), ck)
+
+            bloat = "".join(str(i).rjust(100, " ") for i in range(30))
+            bodies = [odict(house="Small"), odict(house="Big", bloat=bloat)]
+            for body in bodies:
+                self.other.transmit(body)
+                self.main.transmit(body)
+            self.service()
+            self.assertEqual(len(self.main.transactions), 0)
+            self.assertEqual(len(self.other.transactions), 0)
+            self.assertEqual([msg for msg, name in self.main.rxMsgs], bodies)
+            self.assertEqual([msg for msg, name in self.other.rxMsgs], bodies)
+            self.main.rxMsgs.clear()
+            self.other.rxMsgs.clear()
+
+        mainRemote.fk = mainRemote.ck = None
+        self.assertEqual(self.other.footKind(mainRemote), self.other.Fk)
+        self.assertEqual(self.other.coatKind(mainRemote), self.other.Ck)
+
+    def testBroadcast(self):
+        '''
+        Test broadcast fan out serialized once with paced messengers
+        '''
+        console.terse("{0}\n".format(self.testBroadcast.__doc__))
+        self.join()
+        self.allow()
+
+        thirdDirpath = os.path.join(self.baseDirpath, 'road', 'keep', 'third')
+        keeping.clearAllKeep(thirdDirpath)
+        third = stacking.RoadStack(store=self.store,
+                                   name='third',
+                                   auto=raeting.autoModes.once,
+                                   ha=("", raeting.RAET_TEST_PORT + 1),
+                                   dirpath=thirdDirpath)
+        stacks = [self.main, self.other, third]
+
+        def service(duration=2.0):
+            self.timer.restart(duration=duration)
+            while not self.timer.expired:
+                for stack in stacks:
+                    stack.serviceAll()
+                if not any(stack.transactions for stack in stacks):
+                    break
+                self.store.advanceStamp(0.05)
+                time.sleep(0.05)
+
+        try:
+            third.addRemote(estating.RemoteEstate(stack=third,
+                                                  fuid=0,
+                                                  sid=0,
+                                                  ha=self.main.local.ha))
+            third.join()
+            service()
+            third.allow()
+            service()
+            self.assertEqual(len(self.main.remotes), 2)
+            for remote in self.main.remotes.values():
+                self.assertTrue(remote.allowed)
+
+            bloat = "".join(str(i).rjust(100, " ") for i in range(30))
+            body = odict(what="job", bloat=bloat)
+            results = []
+            dumps = packeting.dumps
+            calls = []
+            def counted(data, sk):
+                calls.append(sk)
+                return dumps(data, sk)
+            packeting.dumps = counted
+            try:
+                broadcast = self.main.broadcast(body, callback=results.append, pace=1)
+            finally:
+                packeting.dumps = dumps
+            self.assertEqual(len(calls), 1) # serialized once
+            self.assertEqual(len(self.main.transactions), 1) # paced
+            self.assertFalse(self.main.transactions[0].bcst) # fan out is local
+            self.assertEqual(broadcast.results.keys(),
+                             [remote.uid for remote in self.main.remotes.values()])
+            self.assertFalse(broadcast.done)
+
+            service()
+            self.assertTrue(broadcast.done)
+            self.assertEqual(results, [broadcast])
+            self.assertEqual(broadcast.succeeded, broadcast.results.keys())
+            self.assertEqual(broadcast.failed, [])
+            for stack in [self.other, third]:
+                self.assertEqual(len(stack.rxMsgs), 1)
+                rxBody, name = stack.rxMsgs.popleft()
+                self.assertDictEqual(rxBody, body)
+                self.assertEqual(name, 'main')
+            self.assertEqual(self.main.stats.get('broadcast_complete'), 2)
+
+            # unknown uid fails without stalling the rest
+            results = []
+            uids = [99] + broadcast.results.keys()
+            broadcast = self.main.broadcast(body, uids=uids, callback=results.append)
+            self.assertEqual(broadcast.failed, [99])
+            service()
+            self.assertEqual(results, [broadcast])
+            self.assertEqual(broadcast.failed, [99])
+            self.assertEqual(len(broadcast.succeeded), 2)
+        finally:
+            third.server.close()
+            third.clearAllDir()
+
+    def testBroadcastStale(self):
+        '''
+        Test broadcast message saved when session goes stale still completes
+        '''
+        console.terse("{0}\n".format(self.testBroadcastStale.__doc__))
+        self.join()
+        self.allow()
+        otherRemote = self.main.remotes.values()[0]
+
+        body = odict(what="job", bloat="".join(str(i).rjust(100, " ") for i in range(30)))
+        results = []
+        broadcast = self.main.broadcast(body, callback=results.append)
+        self.assertEqual(len(self.main.transactions), 1)
+
+        otherRemote.sid += 1 # new session so broadcast message is stale
+        otherRemote.replaceStaleInitiators()
+        otherRemote.sid -= 1
+        self.assertEqual(len(self.main.transactions), 0)
+        self.assertEqual(len(otherRemote.messages), 1)
+        saved, callback = otherRemote.messages[0]
+        self.assertDictEqual(saved, body)
+        self.assertFalse(broadcast.done)
+
+        otherRemote.sendSavedMessages()
+        self.service()
+        self.assertTrue(broadcast.done)
+        self.assertEqual(results, [broadcast])
+        self.assertEqual(broadcast.succeeded, [otherRemote.uid])
+        self.assertTrue(self.other.rxMsgs) # stale burst may also have arrived
+        for rxBody, name in self.other.rxMsgs:
+            self.assertDictEqual(rxBody, body)
+
+    def testCoalesced(self):
+        '''
+        Test small queued messages to same remote coalesced into one message
+        '''
+        console.terse("{0}\n".format(self.testCoalesced.__doc__))
+        self.join()
+        self.allow()
+        self.other.coalesced = True
+        self.assertTrue(self.other.coalescing)
+
+        smalls = [odict(fun='test.ping', jid=i) for i in range(40)]
+        big = odict(stuff="".join(str(i).rjust(10, " ") for i in range(100)))
+        for body in smalls[:20]:
+            self.other.transmit(body)
+        self.other.transmit(big) # sent alone after those before it
+        for body in smalls[20:]:
+            self.other.transmit(body)
+        self.other.transmit(odict()) # empty sent alone
+
+        self.other.serviceTxMsgs()
+        messengers = self.other.transactions
+        counts = [messenger.tray.data['mc'] for messenger in messengers]
+        self.assertEqual(counts, [20, 0, 20, 0])
+        self.assertEqual(self.other.stats['coalesced_message'], 40)
+        for messenger in messengers:
+            if messenger.tray.data['mc']:
+                self.assertEqual(len(messenger.tray.packets), 1)
+
+        self.service()
+        self.assertEqual(len(self.other.transactions), 0)
+        received = [msg for msg, name in self.main.rxMsgs]
+        self.assertEqual(len(received), 42)
+        self.assertEqual([msg for msg in received if 'jid' in msg], smalls)
+        self.assertIn(big, received)
+        self.assertIn(odict(), received)
+        self.main.rxMsgs.clear()
+
+        # full batch starts next so each message fits one segment
+        smalls = [odict(fun='test.ping', jid=i, pad="x" * 40) for i in range(40)]
+        for body in smalls:
+            self.other.transmit(body)
+        self.other.serviceTxMsgs()
+        counts = [messenger.tray.data['mc'] for messenger in self.other.transactions]
+        self.assertTrue(len(counts) > 1)
+        self.assertEqual(sum(counts), 40)
+        for messenger in self.other.transactions:
+            self.assertEqual(len(messenger.tray.packets), 1)
+        self.service()
+        self.assertEqual([msg for msg, name in self.main.rxMsgs], smalls)
+        self.main.rxMsgs.clear()
+
+        # each coalesced body notifies its own callback
+        results = []
+        for i, body in enumerate(smalls[:5]):
+            self.other.transmit(body, callback=lambda success, i=i: results.append((i, success)))
+        self.other.serviceTxMsgs()
+        self.assertEqual(len(self.other.transactions), 1)
+        self.service()
+        self.assertEqual(results, [(i, True) for i in range(5)])
+        self.assertEqual([msg for msg, name in self.main.rxMsgs], smalls[:5])
+        self.main.rxMsgs.clear()
+
+        # stale coalesced message saved as its bodies with their callbacks
+        mainRemote = self.other.remotes.values()[0]
+        results = []
+        for i, body in enumerate(smalls[:5]):
+            self.other.transmit(body, callback=lambda success, i=i: results.append((i, success)))
+        self.other.serviceTxMsgs()
+        self.assertEqual(len(self.other.transactions), 1)
+        self.other.txes.clear() # lost
+        mainRemote.sid += 1
+        mainRemote.replaceStaleInitiators()
+        mainRemote.sid -= 1
+        self.other.txes.clear() # nack lost
+        self.assertEqual(len(self.other.transactions), 0)
+        self.assertEqual([body for body, callback in mainRemote.messages], smalls[:5])
+        self.assertTrue(all(callback for body, callback in mainRemote.messages))
+        self.assertEqual(results, []) # stale nack does not fail saved bodies
+        mainRemote.sendSavedMessages()
+        self.assertEqual(len(self.other.transactions), 5)
+        self.service()
+        self.assertEqual([msg for msg, name in self.main.rxMsgs], smalls[:5])
+        self.assertEqual(sorted(results), [(i, True) for i in range(5)])
+        self.main.rxMsgs.clear()
+
+        # lazy receiver splits
+        self.main.lazy = True
+        for body in smalls[:3]:
+            self.other.transmit(body)
+        self.service()
+        self.assertEqual([msg for msg, name in self.main.rxMsgs], smalls[:3])
+        self.main.rxMsgs.clear()
+
+        # binary head has no message count
+        self.other.Hk = raeting.headKinds.binary
+        self.assertFalse(self.other.coalescing)
+        for body in smalls[:3]:
+            self.other.transmit(body)
+        self.other.serviceTxMsgs()
+        self.assertEqual(len(self.other.transactions), 3)
+        self.service()
+        self.assertEqual(len(self.main.rxMsgs), 3)
+
+    def testDelayed(self):
+        '''
+        Test delayed cumulative acks piggybacked for concurrent messages
+        '''
+        console.terse("{0}\n".format(self.testDelayed.__doc__))
+        self.join()
+        self.allow()
+        self.main.delayed = True
+        self.other.windowed = True
+
+        bodies = [odict(stuff="".join(str(i).rjust(10, str(k)) for i in range(3000)))
+                  for k in range(3)]
+        results = []
+        for body in bodies:
+            self.other.message(body=body, callback=results.append)
+        sc = sum(len(messenger.tray.packets) for messenger in self.other.transactions)
+        self.assertTrue(sc > 60)
+        self.service(duration=5.0)
+        self.assertEqual(results, [True, True, True])
+        self.assertEqual(sorted((msg for msg, name in self.main.rxMsgs),
+                                key=lambda msg: msg['stuff']), bodies)
+        self.main.rxMsgs.clear()
+        acks = self.main.stats['message_segment_ack']
+        self.assertTrue(acks <= sc // 2 + 3) # at most one per two segments
+        self.assertEqual(self.main.stats.get('redo_segment'), None)
+        self.assertEqual(self.other.stats.get('redo_segment'), None)
+
+        # acks pending at end of service pass ride on one packet
+        self.main.clearStats()
+        self.other.clearStats()
+        AckCount = transacting.Messengent.AckCount
+        transacting.Messengent.AckCount = 8
+        try:
+            for body in bodies:
+                self.other.message(body=body, callback=results.append)
+            self.service(duration=5.0)
+        finally:
+            transacting.Messengent.AckCount = AckCount
+        self.assertEqual(results, [True] * 6)
+        self.assertEqual(sorted((msg for msg, name in self.main.rxMsgs),
+                                key=lambda msg: msg['stuff']), bodies)
+        self.main.rxMsgs.clear()
+        piggybacks = self.main.stats['message_ack_piggyback_tx']
+        self.assertTrue(piggybacks > 0)
+        self.assertEqual(self.other.stats['message_ack_piggyback_rx'], piggybacks)
+        self.assertTrue(self.main.stats['message_segment_ack'] + piggybacks <= sc // 2 + 3)
+
+        # remote that did not advertise piggybacked acks gets its own acks
+        remote = self.main.remotes.values()[0]
+        self.assertTrue(remote.acking)
+        remote.acking = False
+        self.main.clearStats()
+        self.other.clearStats()
+        transacting.Messengent.AckCount = 8
+        try:
+            for body in bodies:
+                self.other.message(body=body, callback=results.append)
+            self.service(duration=5.0)
+        finally:
+            transacting.Messengent.AckCount = AckCount
+            remote.acking = True
+        self.assertEqual(results, [True] * 9)
+        self.assertEqual(sorted((msg for msg, name in self.main.rxMsgs),
+                                key=lambda msg: msg['stuff']), bodies)
+        self.main.rxMsgs.clear()
+        self.assertFalse(self.main.stats.get('message_ack_piggyback_tx'))
+        self.assertEqual(self.other.stats.get('redo_segment'), None)
+
+        # malformed piggybacked ack is skipped not the ones after it
+        messenger = transacting.Messenger(stack=self.other,
+                                          remote=self.other.remotes.values()[0],
+                                          bcst=self.other.Bf)
+        self.other.clearStats()
+        messenger.piggybacked(odict(acks=[['bad'], None, [0, 0, 0, 0]]))
+        self.assertEqual(self.other.stats.get('invalid_piggyback'), 2)
+
+        # stop and wait segments acked once per service pass
+        self.other.windowed = False
+        self.other.Wf = True
+        self.main.clearStats()
+        self.other.clearStats()
+        self.other.message(body=bodies[0], callback=results.append)
+        sc = len(self.other.transactions[0].tray.packets)
+        passes = 0
+        self.timer.restart(duration=5.0)
+        while self.other.transactions and not self.timer.expired:
+            self.other.serviceAll()
+            self.main.serviceAll()
+            passes += 1
+        self.assertEqual(results[-1], True)
+        self.assertTrue(passes <= sc + 2) # no pass waits on ack delay
+        self.assertEqual(self.main.stats['message_segment_ack'], sc)
+        self.assertEqual([msg for msg, name in self.main.rxMsgs], bodies[:1])
+
+    def testZipped(self):
+        '''
+        Test session dictionary compression of small repetitive messages
+        '''
+        console.terse("{0}\n".format(self.testZipped.__doc__))
+        self.main.zipped = True
+        self.other.zipped = True
+        self.main.Bk = self.other.Bk = raeting.bodyKinds.zjson
+        self.join()
+        self.allow()
+        mainRemote = self.other.remotes.values()[0]
+        otherRemote = self.main.remotes.values()[0]
+        self.assertTrue(mainRemote.zipped)
+        self.assertTrue(otherRemote.zipped)
+        zipper = mainRemote.zipper
+        self.assertIsNot(zipper, None)
+        self.assertIsNot(otherRemote.zipper, None)
+
+        bodies = []
+        for i in range(48):
+            bodies.append(odict([('fun', 'test.ping'),
+                                 ('jid', '20141017{0:06d}'.format(i)),
+                                 ('return', True),
+                                 ('id', 'minion{0:03d}'.format(i))]))
+        for body in bodies[:zipper.Train]: # until trained
+            self.other.transmit(body)
+        self.service()
+        self.assertEqual(zipper.version, 0)
+        self.assertTrue(zipper.confirmed)
+
+        for body in bodies[zipper.Train:]:
+            self.other.transmit(body)
+            self.service() # one at a time so each rides confirmed dictionary
+        self.assertEqual(len(self.other.transactions), 0)
+        self.assertEqual([msg for msg, name in self.main.rxMsgs], bodies)
+        self.assertEqual(zipper.stats['defined'], 1)
+        self.assertTrue(zipper.ratio < 1.0)
+        self.assertEqual(otherRemote.zipper.primers.keys(), [0])
+        self.main.rxMsgs.clear()
+
+        # burst in one pass after retraining defines once rest are stateless
+        zipper.learn()
+        for body in bodies[:8]:
+            self.other.transmit(body)
+        self.other.serviceTxMsgs()
+        messengers = self.other.transactions
+        self.assertEqual([m.tray.zv for m in messengers], [1] + [None] * 7)
+        for messenger, body in zip(messengers, bodies[:8])[1:]:
+            packed = messenger.tray.packets[0].body.packed
+            stateless = zipping.compress(packeting.dumps(body, raeting.bodyKinds.json))
+            self.assertEqual(packed, stateless)
+        self.service()
+        self.assertEqual([msg for msg, name in self.main.rxMsgs], bodies[:8])
+        self.assertTrue(zipper.confirmed)
+        self.assertEqual(zipper.stats['defined'], 2)
+        self.main.rxMsgs.clear()
+
+        # acks of waiting messages are stateless so never define dictionary
+        self.other.Wf = True
+        ackZipper = otherRemote.zipper
+        raw, zipped = zipper.stats['raw'], zipper.stats['zipped']
+        for body in bodies:
+            self.other.transmit(body)
+            self.service()
+        self.assertEqual([msg for msg, name in self.main.rxMsgs], bodies)
+        self.assertTrue(self.main.stats['message_segment_ack'] >= len(bodies))
+        self.assertEqual(ackZipper.count, 0)
+        self.assertIs(ackZipper.version, None)
+        self.assertEqual(ackZipper.stats['defined'], 0)
+        self.assertTrue(zipper.confirmed)
+        stateless = sum(len(zipping.compress(packeting.dumps(body, raeting.bodyKinds.json)))
+                        for body in bodies)
+        self.assertTrue(zipper.stats['zipped'] - zipped < stateless)
+        self.assertTrue(zipper.stats['zipped'] - zipped < zipper.stats['raw'] - raw)
+        self.other.Wf = False
+
+        # new session starts over
+        mainRemote.rekey()
+        self.assertIs(mainRemote.zipper, None)
+        mainRemote.publee = nacling.Publican(key=otherRemote.privee.pubhex)
+        mainRemote.rebox()
+        self.assertIsNot(mainRemote.zipper, zipper)
+        self.assertIs(mainRemote.zipper.version, None)
+
+        # remote that did not advertise at join gets stateless compression
+        mainRemote.zipped = False
+        mainRemote.rebox()
+        self.assertIs(mainRemote.zipper, None)
+
+    def testStreamStale(self):
+        '''
+        Test stream in flight when session goes stale fails its callback
+        '''
+        console.terse("{0}\n".format(self.testStreamStale.__doc__))
+        self.join()
+        self.allow()
+        mainRemote = self.other.remotes.values()[0]
+
+        stuff = "".join(str(i).rjust(10, " ") for i in range(30000))
+        results = []
+        self.other.stream(StringIO(stuff), callback=results.append)
+        self.other.serviceAll()
+        self.main.serviceAll()
+        self.assertEqual(len(self.other.transactions), 1)
+
+        mainRemote.sid += 1 # new session so stream is stale
+        mainRemote.replaceStaleInitiators()
+        self.assertEqual(results, [False])
+        self.assertEqual(len(self.other.transactions), 0)
+        self.assertEqual(len(mainRemote.messages), 0)
+        self.assertEqual(self.other.stats['stale_stream'], 1)
+        self.assertEqual(self.other.stats['stale_initiator'], 1)
+
+        self.service()
+        self.assertEqual(len(self.main.transactions), 0)
+        self.assertEqual(len(self.main.rxMsgs), 0)
+
+    def testStream(self):
+        '''
+        Test streamed message holds only window of segments
+        '''
+        console.terse("{0}\n".format(self.testStream.__doc__))
+        self.join()
+        self.allow()
+        mainRemote = self.other.remotes.values()[0]
+
+        stuff = "".join(str(i).rjust(10, " ") for i in range(30000))
+        results = []
+        self.other.stream(StringIO(stuff), callback=results.append)
+        self.assertEqual(len(self.other.transactions), 1)
+        streamer = self.other.transactions[0]
+        self.assertIsInstance(streamer, transacting.Streamer)
+        self.assertEqual(streamer.tray.data['ck'], raeting.coatKinds.segnacl)
+        sc = len(streamer.tray.packets)
+        self.assertTrue(sc > 300)
+
+        held = 0
+        self.timer.restart(duration=10.0)
+        while self.other.transactions and not self.timer.expired:
+            self.other.serviceAll()
+            held = max(held, len(streamer.tray.packets.packets))
+            self.main.serviceAll()
+            self.store.advanceStamp(0.01)
+        self.assertEqual(results, [True])
+        self.assertEqual(len(self.main.transactions), 0)
+        self.assertEqual(len(self.main.rxMsgs), 1)
+        body, name = self.main.rxMsgs.popleft()
+        self.assertEqual(body, stuff)
+        self.assertEqual(name, 'other')
+        self.assertTrue(held <= streamer.WindowMax)
+        self.assertTrue(held < sc // 2)
+        self.assertEqual(streamer.tray.packets.packets, {})
+
+        # chunk iterator of known length
+        chunks = (stuff[i:i + 4096] for i in range(0, 100000, 4096))
+        self.other.stream(chunks, length=100000, callback=results.append)
+        self.service(duration=5.0)
+        self.assertEqual(results, [True, True])
+        body, name = self.main.rxMsgs.popleft()
+        self.assertEqual(body, stuff[:100000])
+
+        # unseekable without length fails
+        self.other.stream(iter(["Hello"]), callback=results.append)
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(self.other.stats.get('packing_error'), 1)
+
+    def testStreamSink(self):
+        '''
+        Test streamed message written to sink target as segments arrive
+        '''
+        console.terse("{0}\n".format(self.testStreamSink.__doc__))
+        self.join()
+        self.allow()
+
+        targets = []
+        def sink(remote, data):
+            target = StringIO()
+            targets.append((remote.name, target))
+            return target
+        self.main.sink = sink
+
+        stuff = "".join(str(i).rjust(10, " ") for i in range(30000))
+        results = []
+        self.other.stream(StringIO(stuff), callback=results.append)
+
+        early = 0
+        self.timer.restart(duration=10.0)
+        while self.other.transactions and not self.timer.expired:
+            self.other.serviceAll()
+            self.main.serviceAll()
+            if targets and not self.main.rxMsgs:
+                early = max(early, len(targets[0][1].getvalue()))
+            self.store.advanceStamp(0.01)
+        self.assertEqual(results, [True])
+        self.assertEqual(len(targets), 1)
+        name, target = targets[0]
+        self.assertEqual(name, 'other')
+        self.assertTrue(0 < early < len(stuff)) # delivered before complete
+        self.assertEqual(len(self.main.rxMsgs), 1)
+        body, name = self.main.rxMsgs.popleft()
+        self.assertIs(body, target)
+        self.assertEqual(target.getvalue(), stuff)
+        self.assertEqual(name, 'other')
+
+        # ordinary message not eligible so received whole
+        body = odict(what="This is a message to the main estate.")
+        self.other.transmit(body)
+        self.service()
+        self.assertEqual(len(targets), 1)
+        rxBody, name = self.main.rxMsgs.popleft()
+        self.assertEqual(rxBody, body)
+
+        # failed stream closes half written target
+        results = []
+        self.other.stream(StringIO(stuff), callback=results.append)
+        self.timer.restart(duration=10.0)
+        while not (targets[1:] and targets[1][1].getvalue()) and not self.timer.expired:
+            self.other.serviceAll()
+            self.main.serviceAll()
+            self.store.advanceStamp(0.01)
+        self.assertEqual(len(targets), 2)
+        name, target = targets[1]
+        self.assertFalse(target.closed)
+        self.other.transactions[0].nack()
+        self.service()
+        self.assertEqual(results, [False])
+        self.assertTrue(target.closed)
+        self.assertEqual(len(self.main.transactions), 0)
+        self.assertEqual(len(self.main.rxMsgs), 0)
+        self.assertEqual(self.main.stats.get('stream_aborted'), 1)
+
     def testStaleNack(self):
         '''
         Test stale nack
@@ -694,11 +1779,30 @@ def runSome():
     names = [
               'testBootstrapJson',
              'testBootstrapMsgpack',
+             'testBootstrapBinary',
              'testMsgBothwaysJson',
              'testMsgBothwaysMsgpack',
              'testSegmentedJson',
              'testSegmentedMsgpack',
+             'testSegmentedBinary',
              'testBasicAlive',
+             'testReboxAllow',
+             'testProcessDue',
+             'testRoundTrip',
+             'testSegmentedWindowed',
+             'testResendMisseds',
+             'testParity',
+             'testLazyMessage',
+             'testAuthed',
+             'testRemoteKinds',
+             'testBroadcast',
+             'testBroadcastStale',
+             'testCoalesced',
+             'testDelayed',
+             'testZipped',
+             'testStream',
+             'testStreamStale',
+             'testStreamSink',
              'testStaleNack',
              'testJoinForever',
             ]
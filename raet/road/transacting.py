@@ -9,6 +9,8 @@ stacking.py raet protocol stacking classes
 import socket
 import binascii
 import struct
+import functools
+from collections import deque
 
 try:
     import simplejson as json
@@ -22,6 +24,7 @@ from ioflo.base.aiding import packByte, unpackByte
 
 from .. import raeting
 from .. import nacling
+from .. import timing
 from . import packeting
 from . import estating
 
@@ -48,7 +51,10 @@ class Transaction(object):
         if timeout is None:
             timeout = self.Timeout
         self.timeout = timeout
-        self.timer = aiding.StoreTimer(self.stack.store, duration=self.timeout)
+        self.timer = timing.StoreTimer(self.stack.store,
+                                       duration=self.timeout,
+                                       scheduler=self.stack.timers,
+                                       owner=self)
 
         self.rmt = rmt # remote initiator
         self.bcst = bcst # bf flag
@@ -58,6 +64,7 @@ class Transaction(object):
         self.tid = tid
 
         self.txData = txData or odict() # data used to prepare last txPacket
+        self.template = packeting.HeadTemplate() # head of .txData packets
         self.txPacket = txPacket  # last tx packet needed for retries
         self.rxPacket = rxPacket  # last rx packet needed for index
 
@@ -118,6 +125,20 @@ class Transaction(object):
         if remote:
             remote.removeTransaction(index, transaction=self)
 
+    def redoTimeouts(self, redoTimeoutMin=None, redoTimeoutMax=None):
+        '''
+        Returns duple (min, max) of redo timeouts
+        Given values take precedence then round trip estimate of .remote
+        then class defaults
+        '''
+        rto = self.remote.rto if self.remote else None
+        if rto is None:
+            return (redoTimeoutMin or self.RedoTimeoutMin,
+                    redoTimeoutMax or self.RedoTimeoutMax)
+        redoTimeoutMax = redoTimeoutMax or max(self.RedoTimeoutMax, rto)
+        redoTimeoutMin = redoTimeoutMin or min(rto, redoTimeoutMax)
+        return (redoTimeoutMin, redoTimeoutMax)
+
     def statKey(self):
         '''
         Return the stat name key from class name
@@ -135,12 +156,38 @@ class Initiator(Transaction):
     '''
     RAET protocol initiator transaction class
     '''
+    Answers = dict() # packet kinds that answer each kind of .txPacket
+
     def __init__(self, **kwa):
         '''
         Setup Transaction instance
         '''
         kwa['rmt'] = False  # force rmt to False since local initator
         super(Initiator, self).__init__(**kwa)
+        self.rttStamp = None # stamp of first send of .txPacket for round trip
+
+    def transmit(self, packet):
+        '''
+        Augment transmit to stamp first send of packet for round trip sample
+        Resends of same packet are ambiguous so not sampled (Karn)
+        '''
+        resend = packet is self.txPacket
+        super(Initiator, self).transmit(packet)
+        self.rttStamp = None if resend else self.stack.store.stamp
+
+    def receive(self, packet):
+        '''
+        Augment receive to sample round trip time of answer to .txPacket
+        Only packet kinds in .Answers for kind of .txPacket are sampled so
+        nacks and pends are not
+        '''
+        stamp, txPacket = self.rttStamp, self.txPacket
+        super(Initiator, self).receive(packet)
+        if (stamp is not None and txPacket is not None and
+                packet.data['pk'] in self.Answers.get(txPacket.data['pk'], ())):
+            self.remote.sampleRtt(self.stack.store.stamp - stamp)
+            if self.txPacket is txPacket: # answer did not send another packet
+                self.rttStamp = None
 
     def process(self):
         '''
@@ -229,7 +276,8 @@ class Staler(Initiator):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.nack,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -301,7 +349,8 @@ class Stalent(Correspondent):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=kind,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -340,6 +389,7 @@ class Joiner(Initiator):
     '''
     RedoTimeoutMin = 1.0 # initial timeout
     RedoTimeoutMax = 4.0 # max timeout
+    Answers = {raeting.pcktKinds.request: (raeting.pcktKinds.response, )}
 
     def __init__(self, redoTimeoutMin=None, redoTimeoutMax=None,
                  cascade=False, renewal=False, **kwa):
@@ -351,10 +401,12 @@ class Joiner(Initiator):
 
         self.cascade = cascade
 
-        self.redoTimeoutMax = redoTimeoutMax or self.RedoTimeoutMax
-        self.redoTimeoutMin = redoTimeoutMin or self.RedoTimeoutMin
-        self.redoTimer = aiding.StoreTimer(self.stack.store,
-                                           duration=self.redoTimeoutMin)
+        self.redoTimeoutMin, self.redoTimeoutMax = self.redoTimeouts(redoTimeoutMin,
+                                                                     redoTimeoutMax)
+        self.redoTimer = timing.StoreTimer(self.stack.store,
+                                           duration=self.redoTimeoutMin,
+                                           scheduler=self.stack.timers,
+                                           owner=self)
 
         self.sid = 0 #always 0 for join
         self.tid = self.remote.nextTid()
@@ -495,7 +547,10 @@ class Joiner(Initiator):
                 console.concise(emsg)
                 return
 
-        flags = [0, 0, 0, 0, 0, 0, 0, self.stack.main] # stack operation mode flags
+        # stack operation mode flags, piggybacked acks and gapped resend
+        # requests always understood
+        flags = [0, 0, 0, 1, 1, self.stack.zipped, self.stack.authed,
+                 self.stack.main]
         operation = packByte(fmt='11111111', fields=flags)
         body = odict([('name', self.stack.local.name),
                       ('mode', operation),
@@ -506,7 +561,8 @@ class Joiner(Initiator):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.request,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -544,7 +600,7 @@ class Joiner(Initiator):
         '''
         Process ack pend to join packet
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
         pass
 
@@ -574,6 +630,10 @@ class Joiner(Initiator):
             self.remove(index=self.rxPacket.index)
             return
         flags = unpackByte(fmt='11111111', byte=mode, boolean=True)
+        acking = flags[3]
+        gapped = flags[4]
+        zipped = flags[5]
+        authed = flags[6]
         main = flags[7]
 
         kind = body.get('kind')
@@ -681,6 +741,10 @@ class Joiner(Initiator):
 
         # accepted or pending
         self.remote.acceptance = status # change acceptance of remote
+        self.remote.authed = authed
+        self.remote.zipped = zipped
+        self.remote.gapped = gapped
+        self.remote.acking = acking
 
         if not sameAll: # (and mutable)
             if (name in self.stack.nameRemotes and
@@ -743,7 +807,7 @@ class Joiner(Initiator):
         Process nack to join packet refused as join already in progress or some
         other problem that does not change the joined attribute
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
         console.terse("Joiner {0}. Refused by {1} at {2}\n".format(
                  self.stack.name, self.remote.name, self.stack.store.stamp))
@@ -754,7 +818,7 @@ class Joiner(Initiator):
         '''
         Process nack to join packet, join rejected
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
         console.terse("Joiner {0}. Rejected by {1} at {2}\n".format(
                  self.stack.name, self.remote.name, self.stack.store.stamp))
@@ -770,7 +834,8 @@ class Joiner(Initiator):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.ack,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -797,7 +862,8 @@ class Joiner(Initiator):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.pend,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -820,7 +886,8 @@ class Joiner(Initiator):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=kind,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -864,9 +931,12 @@ class Joinent(Correspondent):
         kwa['kind'] = raeting.trnsKinds.join
         super(Joinent, self).__init__(**kwa)
 
-        self.redoTimeoutMax = redoTimeoutMax or self.RedoTimeoutMax
-        self.redoTimeoutMin = redoTimeoutMin or self.RedoTimeoutMin
-        self.redoTimer = aiding.StoreTimer(self.stack.store, duration=0.0)
+        self.redoTimeoutMin, self.redoTimeoutMax = self.redoTimeouts(redoTimeoutMin,
+                                                                     redoTimeoutMax)
+        self.redoTimer = timing.StoreTimer(self.stack.store,
+                                           duration=0.0,
+                                           scheduler=self.stack.timers,
+                                           owner=self)
         self.vacuous = None # gets set in join method
         self.prep()
 
@@ -1014,6 +1084,10 @@ class Joinent(Correspondent):
             self.remove(index=self.rxPacket.index)
             return
         flags = unpackByte(fmt='11111111', byte=mode, boolean=True)
+        acking = flags[3]
+        gapped = flags[4]
+        zipped = flags[5]
+        authed = flags[6]
         main = flags[7]
 
         kind = body.get('kind')
@@ -1183,6 +1257,10 @@ class Joinent(Correspondent):
 
         #accepted or pended
         self.remote.acceptance = status
+        self.remote.authed = authed
+        self.remote.zipped = zipped
+        self.remote.gapped = gapped
+        self.remote.acking = acking
 
         if sameAll: #ephemeral will always be sameAll because assigned above
             if self.remote.uid not in self.stack.remotes: # ephemeral
@@ -1261,7 +1339,8 @@ class Joinent(Correspondent):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.pend,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -1290,7 +1369,10 @@ class Joinent(Correspondent):
                 console.concise(emsg)
                 return
 
-        flags = [0, 0, 0, 0, 0, 0, 0, self.stack.main] # stack operation mode flags
+        # stack operation mode flags, piggybacked acks and gapped resend
+        # requests always understood
+        flags = [0, 0, 0, 1, 1, self.stack.zipped, self.stack.authed,
+                 self.stack.main]
         operation = packByte(fmt='11111111', fields=flags)
         body = odict([ ('name', self.stack.local.name),
                        ('mode', operation),
@@ -1302,7 +1384,8 @@ class Joinent(Correspondent):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.response,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -1319,7 +1402,7 @@ class Joinent(Correspondent):
         '''
         Process ack pend to join packet
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
         pass
 
@@ -1327,7 +1410,7 @@ class Joinent(Correspondent):
         '''
         process ack to accept response
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
 
         console.terse("Joinent {0}. Done with {1} at {2}\n".format(
@@ -1347,7 +1430,7 @@ class Joinent(Correspondent):
         '''
         Process reject nack because keys rejected
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
 
         console.terse("Joinent {0}. Rejected by {1} at {2}\n".format(
@@ -1360,7 +1443,7 @@ class Joinent(Correspondent):
         '''
         Process refuse nack because join already in progress or stale
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
         console.terse("Joinent {0}. Refused by {1} at {2}\n".format(
                  self.stack.name, self.remote.name, self.stack.store.stamp))
@@ -1383,7 +1466,8 @@ class Joinent(Correspondent):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=kind,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -1427,6 +1511,8 @@ class Allower(Initiator):
     Timeout = 4.0
     RedoTimeoutMin = 0.25 # initial timeout
     RedoTimeoutMax = 1.0 # max timeout
+    Answers = {raeting.pcktKinds.hello: (raeting.pcktKinds.cookie, ),
+               raeting.pcktKinds.initiate: (raeting.pcktKinds.ack, )}
 
     def __init__(self, redoTimeoutMin=None, redoTimeoutMax=None,
                  cascade=False, **kwa):
@@ -1438,10 +1524,12 @@ class Allower(Initiator):
 
         self.cascade = cascade
 
-        self.redoTimeoutMax = redoTimeoutMax or self.RedoTimeoutMax
-        self.redoTimeoutMin = redoTimeoutMin or self.RedoTimeoutMin
-        self.redoTimer = aiding.StoreTimer(self.stack.store,
-                                           duration=self.redoTimeoutMin)
+        self.redoTimeoutMin, self.redoTimeoutMax = self.redoTimeouts(redoTimeoutMin,
+                                                                     redoTimeoutMax)
+        self.redoTimer = timing.StoreTimer(self.stack.store,
+                                           duration=self.redoTimeoutMin,
+                                           scheduler=self.stack.timers,
+                                           owner=self)
 
         self.sid = self.remote.sid
         self.tid = self.remote.nextTid()
@@ -1565,7 +1653,8 @@ class Allower(Initiator):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.hello,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -1666,7 +1755,8 @@ class Allower(Initiator):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.initiate,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -1685,10 +1775,11 @@ class Allower(Initiator):
         Perform allowment in response to ack to initiate packet
         Transmits ack to complete transaction so correspondent knows
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
 
         self.remote.allowed = True
+        self.remote.rebox() # precompute shared key for session
         self.ackFinal()
 
     def ackFinal(self):
@@ -1701,7 +1792,8 @@ class Allower(Initiator):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.ack,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -1731,7 +1823,8 @@ class Allower(Initiator):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=kind,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -1764,7 +1857,7 @@ class Allower(Initiator):
         '''
         Process nack refule to packet
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
         console.concise("Allower {0}. Refused by {1} at {2}\n".format(
                 self.stack.name, self.remote.name, self.stack.store.stamp))
@@ -1776,7 +1869,7 @@ class Allower(Initiator):
         Process nack reject to packet
         terminate in response to nack
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
 
         self.remote.allowed = False
@@ -1790,7 +1883,7 @@ class Allower(Initiator):
         Process unjoin packet
         terminate in response to unjoin
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
         self.remote.joined = False
         self.remove()
@@ -1815,10 +1908,12 @@ class Allowent(Correspondent):
         kwa['kind'] = raeting.trnsKinds.allow
         super(Allowent, self).__init__(**kwa)
 
-        self.redoTimeoutMax = redoTimeoutMax or self.RedoTimeoutMax
-        self.redoTimeoutMin = redoTimeoutMin or self.RedoTimeoutMin
-        self.redoTimer = aiding.StoreTimer(self.stack.store,
-                                           duration=self.redoTimeoutMin)
+        self.redoTimeoutMin, self.redoTimeoutMax = self.redoTimeouts(redoTimeoutMin,
+                                                                     redoTimeoutMax)
+        self.redoTimer = timing.StoreTimer(self.stack.store,
+                                           duration=self.redoTimeoutMin,
+                                           scheduler=self.stack.timers,
+                                           owner=self)
 
         self.oreo = None #keep locally generated oreo around for redos
         self.prep() # prepare .txData
@@ -2011,7 +2106,8 @@ class Allowent(Correspondent):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.cookie,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -2118,7 +2214,8 @@ class Allowent(Correspondent):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.ack,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -2138,6 +2235,7 @@ class Allowent(Correspondent):
         Perform allowment
         '''
         self.remote.allowed = True
+        self.remote.rebox() # precompute shared key for session
         self.remote.nextSid() # start new session always on successful allow
         self.remote.replaceStaleInitiators()
         self.stack.dumpRemote(self.remote)
@@ -2148,7 +2246,7 @@ class Allowent(Correspondent):
         So that both sides are waiting on acks at the end so does not restart
         transaction if ack initiate is dropped
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
 
         self.remove()
@@ -2161,7 +2259,7 @@ class Allowent(Correspondent):
         '''
         Process nack refuse packet
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
 
         self.remove()
@@ -2174,7 +2272,7 @@ class Allowent(Correspondent):
         Process nack packet
         terminate in response to nack
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
 
         self.remote.allowed = False
@@ -2191,7 +2289,8 @@ class Allowent(Correspondent):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=kind,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -2232,6 +2331,7 @@ class Aliver(Initiator):
     Timeout = 2.0
     RedoTimeoutMin = 0.25 # initial timeout
     RedoTimeoutMax = 1.0 # max timeout
+    Answers = {raeting.pcktKinds.request: (raeting.pcktKinds.ack, )}
 
     def __init__(self, redoTimeoutMin=None, redoTimeoutMax=None,
                 cascade=False, **kwa):
@@ -2243,10 +2343,12 @@ class Aliver(Initiator):
 
         self.cascade = cascade
 
-        self.redoTimeoutMax = redoTimeoutMax or self.RedoTimeoutMax
-        self.redoTimeoutMin = redoTimeoutMin or self.RedoTimeoutMin
-        self.redoTimer = aiding.StoreTimer(self.stack.store,
-                                           duration=self.redoTimeoutMin)
+        self.redoTimeoutMin, self.redoTimeoutMax = self.redoTimeouts(redoTimeoutMin,
+                                                                     redoTimeoutMax)
+        self.redoTimer = timing.StoreTimer(self.stack.store,
+                                           duration=self.redoTimeoutMin,
+                                           scheduler=self.stack.timers,
+                                           owner=self)
 
         self.sid = self.remote.sid
         self.tid = self.remote.nextTid()
@@ -2348,7 +2450,8 @@ class Aliver(Initiator):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.request,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -2364,7 +2467,7 @@ class Aliver(Initiator):
         '''
         Process ack packet. Complete transaction and remove
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
         self.remote.refresh(alived=True) # restart timer mark as alive
         self.remove()
@@ -2377,7 +2480,7 @@ class Aliver(Initiator):
         Process nack refuse packet
         terminate in response to nack
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
         self.remote.refresh(alived=None) # restart timer do not change status
         self.remove()
@@ -2390,7 +2493,7 @@ class Aliver(Initiator):
         Process nack reject packet
         terminate in response to nack
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
         self.remote.refresh(alived=False) # restart timer set status to False
         self.remove()
@@ -2403,7 +2506,7 @@ class Aliver(Initiator):
         Process unjoin packet
         terminate in response to unjoin
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
         self.remote.refresh(alived=None) # restart timer do not change status
         self.remote.joined = False
@@ -2418,7 +2521,7 @@ class Aliver(Initiator):
         Process unallow nack packet
         terminate in response to unallow
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
         self.remote.refresh(alived=None) # restart timer do not change status
         self.remote.allowed = False
@@ -2486,7 +2589,7 @@ class Alivent(Correspondent):
         '''
         Process alive packet
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
 
         if not self.remote.joined:
@@ -2509,14 +2612,12 @@ class Alivent(Correspondent):
 
         self.add()
 
-        data = self.rxPacket.data
-        body = self.rxPacket.body.data
-
         body = odict()
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.ack,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -2542,7 +2643,8 @@ class Alivent(Correspondent):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=kind,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -2582,33 +2684,66 @@ class Messenger(Initiator):
     '''
     RAET protocol Messenger Initiator class Dual of Messengent
     Generic messages
+
+    When .window is set segments are sent within a congestion window that
+    grows by one segment per ack until .ssthresh (slow start) and by one
+    segment per window of acks thereafter (congestion avoidance). A resend
+    request or redo timeout is taken as loss and shrinks the window
+    (multiplicative decrease).
     '''
     Timeout = 10.0
     RedoTimeoutMin = 1.0 # initial timeout
     RedoTimeoutMax = 3.0 # max timeout
+    Answers = {raeting.pcktKinds.message: (raeting.pcktKinds.ack, )}
+    Window = 2.0 # initial congestion window in segments
+    WindowMin = 1.0 # min congestion window in segments
+    WindowMax = 256.0 # max congestion window in segments
 
-    def __init__(self, redoTimeoutMin=None, redoTimeoutMax=None, **kwa):
+    def __init__(self, redoTimeoutMin=None, redoTimeoutMax=None, callback=None,
+                 window=False, **kwa):
         '''
         Setup instance
+
+        callback is called once with True when message completes
+        or with False when transaction is removed without completing
+        window is flag to send segments with congestion window, implies wait
         '''
         kwa['kind'] = raeting.trnsKinds.message
+        if window:
+            kwa['wait'] = True # correspondent must ack every segment
         super(Messenger, self).__init__(**kwa)
 
-        self.redoTimeoutMax = redoTimeoutMax or self.RedoTimeoutMax
-        self.redoTimeoutMin = redoTimeoutMin or self.RedoTimeoutMin
-        self.redoTimer = aiding.StoreTimer(self.stack.store,
-                                           duration=self.redoTimeoutMin)
+        self.window = window
+        self.cwnd = self.Window # congestion window in segments
+        self.ssthresh = self.WindowMax # slow start threshold in segments
+        self.recover = 0 # segments sent before last window decrease
+        self.acked = set() # segment numbers acked when windowed
+        self.base = 0 # segments below base are all acked when windowed
+        self.losts = set() # segment numbers deemed lost awaiting resend
+        self.sents = dict() # first send stamps of unacked segments keyed by sn
+
+        self.redoTimeoutMin, self.redoTimeoutMax = self.redoTimeouts(redoTimeoutMin,
+                                                                     redoTimeoutMax)
+        self.redoTimer = timing.StoreTimer(self.stack.store,
+                                           duration=self.redoTimeoutMin,
+                                           scheduler=self.stack.timers,
+                                           owner=self)
+        self.callback = callback
 
         self.sid = self.remote.sid
         self.tid = self.remote.nextTid()
         self.prep() # prepare .txData
-        self.tray = packeting.TxTray(stack=self.stack)
+        self.tray = packeting.TxTray(stack=self.stack,
+                                     template=self.template,
+                                     fec=self.stack.fec)
 
     def transmit(self, packet):
         '''
         Augment transmit with restart of redo timer
         '''
         super(Messenger, self).transmit(packet)
+        if self.window: # round trip sampled per segment by .acknowledge
+            self.rttStamp = None
         self.redoTimer.restart()
 
     def receive(self, packet):
@@ -2642,8 +2777,13 @@ class Messenger(Initiator):
                               self.redoTimer.duration * 2.0),
                          self.redoTimeoutMax)
             self.redoTimer.restart(duration=duration)
-            if self.txPacket:
+            if self.window:
+                self.redoWindow()
+            elif self.txPacket:
                 if self.txPacket.data['pk'] == raeting.pcktKinds.message:
+                    sn, sc = self.txPacket.data['sn'], self.txPacket.data['sc']
+                    if sn >= sc: # parity is dropped once done so redo last segment
+                        self.txPacket = self.tray.packets[sc - 1]
                     self.transmit(self.txPacket) # redo
                     console.concise("Messenger {0}. Redo Segment {1} with {2} at {3}\n".format(
                             self.stack.name, self.tray.last, self.remote.name, self.stack.store.stamp))
@@ -2705,6 +2845,10 @@ class Messenger(Initiator):
             self.remove()
             return
 
+        if self.window:
+            self.slide()
+            return
+
         burst = 1 if self.wait else len(self.tray.packets) - self.tray.current
 
         for packet in self.tray.packets[self.tray.current:self.tray.current + burst]:
@@ -2719,19 +2863,170 @@ class Messenger(Initiator):
         '''
         Process ack packet send next one
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=not self.window):
             return
 
         self.remote.refresh(alived=True)
 
+        if self.window:
+            self.acknowledge()
+            return
+
+        self.piggybacked(self.rxPacket.body.data)
         if self.tray.current >= len(self.tray.packets):
             self.complete()
         else:
             self.message()
 
+    @property
+    def flight(self):
+        '''
+        Property is number of segments sent but neither acked nor deemed lost
+        '''
+        return self.tray.current - len(self.acked) - len(self.losts)
+
+    def slide(self):
+        '''
+        Send lost segments then new segments while congestion window has room
+        '''
+        burst = int(self.cwnd) - self.flight
+        if burst > 0 and self.losts:
+            for sn in sorted(self.losts)[:burst]:
+                self.losts.discard(sn)
+                self.sents.pop(sn, None) # resent so not sampled
+                self.transmit(self.tray.packets[sn])
+                self.stack.incStat("message_segment_tx")
+                console.concise("Messenger {0}. Resend Message Segment {1} with {2} at {3}\n".format(
+                        self.stack.name, sn, self.remote.name, self.stack.store.stamp))
+                burst -= 1
+
+        while burst > 0 and self.tray.current < len(self.tray.packets):
+            self.sents[self.tray.current] = self.stack.store.stamp
+            self.transmit(self.tray.packets[self.tray.current])
+            self.tray.last = self.tray.current
+            self.stack.incStat("message_segment_tx")
+            console.concise("Messenger {0}. Do Message Segment {1} with {2} at {3}\n".format(
+                    self.stack.name, self.tray.last, self.remote.name, self.stack.store.stamp))
+            self.tray.current += 1
+            burst -= 1
+
+    def acknowledge(self):
+        '''
+        Process windowed ack of segment sn and cumulative ack of segments
+        below cum if any, grow congestion window and slide
+        Completes when all segments acked or correspondent is done
+        '''
+        body = self.rxPacket.body.data
+        self.piggybacked(body)
+        self.ackSegments(body.get('sn'), body.get('cum'))
+        if body.get('done') or len(self.acked) >= len(self.tray.packets):
+            self.complete()
+        else:
+            self.slide()
+
+    def ackSegments(self, sn, cum=None):
+        '''
+        Mark segment sn and all segments below cum acked and grow congestion
+        window by one step per newly acked segment. Round trip is sampled
+        from sn only since delayed cumulative acks are late for the others
+        Returns list of newly acked segment numbers
+        '''
+        sns = []
+        if isinstance(cum, (int, long)) and cum > self.base:
+            cum = min(cum, self.tray.current)
+            sns.extend(s for s in xrange(self.base, cum) if s not in self.acked)
+            self.base = max(self.base, cum)
+        if (isinstance(sn, (int, long)) and 0 <= sn < self.tray.current and
+                sn not in self.acked and sn not in sns):
+            sns.append(sn)
+        for s in sns:
+            self.acked.add(s)
+            self.losts.discard(s)
+            stamp = self.sents.pop(s, None)
+            if stamp is not None and s == sn:
+                self.remote.sampleRtt(self.stack.store.stamp - stamp)
+            if self.cwnd < self.ssthresh: # slow start
+                self.cwnd += 1.0
+            else: # congestion avoidance
+                self.cwnd += 1.0 / self.cwnd
+        self.cwnd = min(self.cwnd, self.WindowMax)
+        return sns
+
+    def advance(self, sn, cum=None):
+        '''
+        Process ack of segment sn and segments below cum piggybacked on a
+        packet of another message from .remote
+        '''
+        if self.window:
+            self.ackSegments(sn, cum)
+            if len(self.acked) >= len(self.tray.packets):
+                self.complete()
+            else:
+                self.slide()
+        elif sn == self.tray.last and self.tray.current > self.tray.last:
+            if self.tray.current >= len(self.tray.packets):
+                self.complete()
+            else:
+                self.message()
+
+    def piggybacked(self, body):
+        '''
+        Dispatch acks in body for other messages to .remote given as list acks
+        of [si, ti, sn, cum] to their Messengers
+        '''
+        acks = body.get('acks')
+        if not isinstance(acks, list):
+            return
+        messengers = dict(((transaction.sid, transaction.tid), transaction)
+                          for transaction in self.remote.transactions.values()
+                          if isinstance(transaction, Messenger) and
+                          transaction is not self)
+        for ack in acks:
+            try:
+                si, ti, sn, cum = ack
+                messenger = messengers.get((si, ti))
+            except (TypeError, ValueError) as ex:
+                console.terse("Invalid piggybacked ack {0}\n".format(ack))
+                self.stack.incStat("invalid_piggyback")
+                continue
+            if messenger:
+                self.stack.incStat("message_ack_piggyback_rx")
+                messenger.advance(sn, cum)
+
+    def decrease(self, sn):
+        '''
+        Halve congestion window on loss of segment sn
+        Only once per window of segments so one loss burst counts once
+        '''
+        if sn < self.recover:
+            return
+        self.ssthresh = max(self.flight / 2.0, self.WindowMin * 2.0)
+        self.cwnd = self.ssthresh
+        self.recover = self.tray.current
+        self.stack.incStat("message_window_decrease")
+
+    def redoWindow(self):
+        '''
+        Redo timed out windowed message by deeming all unacked segments lost
+        and collapsing congestion window to minimum so slow start resends them
+        '''
+        unackeds = set(range(self.tray.current)) - self.acked
+        if not unackeds:
+            return
+        self.sents.clear()
+        self.ssthresh = max(self.flight / 2.0, self.WindowMin * 2.0)
+        self.cwnd = self.WindowMin
+        self.recover = self.tray.current
+        self.losts = unackeds
+        console.concise("Messenger {0}. Redo Segments from {1} with {2} at {3}\n".format(
+                self.stack.name, min(unackeds), self.remote.name, self.stack.store.stamp))
+        self.stack.incStat('redo_segment')
+        self.slide()
+
     def resend(self):
         '''
-        Process resend packet and send misseds list of missing packets
+        Process resend packet and send missing packets given by gaps list of
+        [first, stop] ranges or older misseds list of packet numbers
         '''
         if not self.stack.parseInner(self.rxPacket):
             return
@@ -2740,8 +3035,23 @@ class Messenger(Initiator):
 
         data = self.rxPacket.data
         body = self.rxPacket.body.data
+        self.piggybacked(body)
+        if self.window and 'cum' in body: # delayed ack rides on resend
+            self.ackSegments(body.get('sn'), body.get('cum'))
 
         misseds = body.get('misseds')
+        gaps = body.get('gaps')
+        if gaps:
+            misseds = []
+            for gap in gaps:
+                try:
+                    first, stop = gap
+                    misseds.extend(xrange(max(first, 0),
+                                          min(stop, len(self.tray.packets))))
+                except (TypeError, ValueError) as ex:
+                    console.terse("Invalid gaps segment range {0}\n".format(gap))
+                    self.stack.incStat("invalid_gaps")
+                    return
         if misseds:
             if not self.tray.packets:
                 emsg = "Invalid resend request '{0}'\n".format(misseds)
@@ -2749,6 +3059,15 @@ class Messenger(Initiator):
                 self.stack.incStat('invalid_resend')
                 return
 
+            if self.window: # not yet sent or already acked are not lost
+                misseds = [m for m in misseds if isinstance(m, (int, long)) and
+                           0 <= m < self.tray.current and m not in self.acked]
+                if misseds:
+                    self.decrease(max(misseds))
+                    self.losts.update(misseds)
+                self.slide()
+                return
+
             for m in misseds:
                 try:
                     packet = self.tray.packets[m]
@@ -2762,11 +3081,34 @@ class Messenger(Initiator):
                 self.stack.incStat("message_segment_tx")
                 console.concise("Messenger {0}. Resend Message Segment {1} with {2} at {3}\n".format(
                         self.stack.name, m, self.remote.name, self.stack.store.stamp))
+            self.rttStamp = None # ack is ambiguous after resends
+
+    def remove(self, remote=None, index=None):
+        '''
+        Augment remove with failure notice to .callback if not completed
+        Unacked session dictionary definition is abandoned so redefined
+        '''
+        super(Messenger, self).remove(remote=remote, index=index)
+        if self.tray.zv is not None and self.remote.zipper:
+            self.remote.zipper.abandon(self.tray.zv)
+        self.notify(False)
+
+    def notify(self, success):
+        '''
+        Call .callback once with success
+        '''
+        if self.callback:
+            callback, self.callback = self.callback, None
+            callback(success)
 
     def complete(self):
         '''
         Complete transaction and remove
+        Acked message delivered any session dictionary it defined
         '''
+        if self.tray.zv is not None and self.remote.zipper:
+            self.remote.zipper.confirm(self.tray.zv)
+        self.notify(True)
         self.remove()
         console.concise("Messenger {0}. Done with {1} at {2}\n".format(
                 self.stack.name, self.remote.name, self.stack.store.stamp))
@@ -2777,7 +3119,7 @@ class Messenger(Initiator):
         Process nack packet
         terminate in response to nack
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
 
         self.remote.refresh(alived=True)
@@ -2795,7 +3137,8 @@ class Messenger(Initiator):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.nack,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -2810,14 +3153,151 @@ class Messenger(Initiator):
                 self.stack.name, self.remote.name, self.stack.store.stamp))
         self.stack.incStat(self.statKey())
 
+class Streamer(Messenger):
+    '''
+    RAET protocol Streamer Initiator class Dual of Messengent
+    Streams raw message from file like or chunk iterator source with the
+    congestion window so only sent but unacked segments are held in memory
+
+    Timeout is reset by each ack that advances the stream so large streams
+    are not bounded by an overall time
+    '''
+    def __init__(self, source=None, length=None, **kwa):
+        '''
+        Setup instance
+        source is file like with .read or iterable of string chunks
+        length is number of bytes in source, found by seeking if None
+        '''
+        kwa['window'] = True
+        super(Streamer, self).__init__(**kwa)
+        self.tray = packeting.TxStream(stack=self.stack,
+                                       source=source,
+                                       length=length,
+                                       template=self.template)
+
+    def slide(self):
+        '''
+        Augment slide to abort when stream source fails
+        '''
+        try:
+            super(Streamer, self).slide()
+        except raeting.PacketError as ex:
+            console.terse(str(ex) + '\n')
+            self.stack.incStat("packing_error")
+            self.remove()
+
+    def ackSegments(self, sn, cum=None):
+        '''
+        Augment ackSegments to release acked segments and restart timeout
+        '''
+        sns = super(Streamer, self).ackSegments(sn, cum)
+        for s in sns:
+            self.tray.packets.release(s)
+        if sns and self.timeout > 0.0:
+            self.timer.restart()
+        return sns
+
+class Broadcast(object):
+    '''
+    Fan out of one message body to many remotes with a Messenger per remote
+    The body is serialized once and each Messenger encrypts and signs only
+    its own packets. At most .pace Messengers are in flight at once and each
+    completion starts the next so a large fan out is paced by its remotes
+    instead of bursting every remote's segments in one service pass.
+
+        .results is odict of success keyed by remote uid, None while pending
+        .callback is called once with this Broadcast when all have completed
+    '''
+    Pace = 64 # max messengers in flight
+
+    def __init__(self, stack=None, body=None, uids=None, timeout=None,
+                 callback=None, pace=None):
+        '''
+        Setup instance
+        uids is list of remote uids to send body to
+        '''
+        self.stack = stack
+        self.body = packeting.PackedBody(data=body, bk=self.stack.Bk)
+        self.timeout = timeout
+        self.callback = callback
+        self.pace = max(1, pace if pace is not None else self.Pace)
+        uids = uids or []
+        self.results = odict((uid, None) for uid in uids)
+        self.pending = deque(self.results.keys()) # uids not yet started
+        self.flight = 0 # messengers started but not completed
+        self.starting = False # True while start is starting messengers
+
+    @property
+    def done(self):
+        '''
+        Property is True once every remote has a result
+        '''
+        return all(result is not None for result in self.results.values())
+
+    @property
+    def succeeded(self):
+        '''
+        Property is list of uids of remotes that acked the message
+        '''
+        return [uid for uid, result in self.results.items() if result]
+
+    @property
+    def failed(self):
+        '''
+        Property is list of uids of remotes the message failed to reach
+        '''
+        return [uid for uid, result in self.results.items() if result is False]
+
+    def start(self):
+        '''
+        Start Messengers while fewer than .pace are in flight
+        '''
+        self.starting = True
+        while self.pending and self.flight < self.pace:
+            uid = self.pending.popleft()
+            self.flight += 1
+            self.stack.message(body=self.body,
+                               uid=uid,
+                               timeout=self.timeout,
+                               callback=functools.partial(self.finish, uid))
+        self.starting = False
+        self.notify()
+
+    def finish(self, uid, success):
+        '''
+        Record result of Messenger to remote uid and start next
+        '''
+        self.results[uid] = success
+        self.flight -= 1
+        self.stack.incStat('broadcast_complete' if success else 'broadcast_failed')
+        if not self.starting: # failed inside start so start loop continues
+            self.start()
+
+    def notify(self):
+        '''
+        Call .callback once with self when done
+        '''
+        if self.done and self.callback:
+            callback, self.callback = self.callback, None
+            callback(self)
+
 class Messengent(Correspondent):
     '''
     RAET protocol Messengent Correspondent class Dual of Messenger
     Generic Messages
+
+    When stack .delayed waiting segments are acked by one cumulative ack of
+    the segments received in order once .AckCount segments are unacked or
+    after .AckDelay so at the latest when the stack next processes timers
+    in the same service pass. Gaps and duplicates are acked at once. Pending
+    acks of other messages from the same remote are piggybacked on any ack
+    or resend sent to it.
     '''
     Timeout = 10.0
     RedoTimeoutMin = 1.0 # initial timeout
     RedoTimeoutMax = 3.0 # max timeout
+    AckDelay = 0.0 # max seconds to delay ack
+    AckCount = 2 # max segments per delayed ack
 
     def __init__(self, redoTimeoutMin=None, redoTimeoutMax=None, **kwa):
         '''
@@ -2826,13 +3306,23 @@ class Messengent(Correspondent):
         kwa['kind'] = raeting.trnsKinds.message
         super(Messengent, self).__init__(**kwa)
 
-        self.redoTimeoutMax = redoTimeoutMax or self.RedoTimeoutMax
-        self.redoTimeoutMin = redoTimeoutMin or self.RedoTimeoutMin
-        self.redoTimer = aiding.StoreTimer(self.stack.store,
-                                           duration=self.redoTimeoutMin)
+        self.redoTimeoutMin, self.redoTimeoutMax = self.redoTimeouts(redoTimeoutMin,
+                                                                     redoTimeoutMax)
+        self.redoTimer = timing.StoreTimer(self.stack.store,
+                                           duration=self.redoTimeoutMin,
+                                           scheduler=self.stack.timers,
+                                           owner=self)
 
         self.prep() # prepare .txData
-        self.tray = packeting.RxTray(stack=self.stack)
+        self.tray = packeting.RxTray(stack=self.stack,
+                                     lazy=self.stack.lazy,
+                                     sink=self.target if self.stack.sink else None)
+        self.high = -1 # highest segment number received
+        self.unacked = 0 # segments received since last ack when delayed
+        self.ackTimer = timing.StoreTimer(self.stack.store,
+                                          duration=self.AckDelay,
+                                          scheduler=self.stack.timers,
+                                          owner=self)
 
     def transmit(self, packet):
         '''
@@ -2865,6 +3355,9 @@ class Messengent(Correspondent):
                     self.stack.name, self.remote.name, self.stack.store.stamp))
             return
 
+        if self.unacked and self.ackTimer.expired:
+            self.ackMessage()
+
         if self.redoTimer.expired:
             duration = min(
                          max(self.redoTimeoutMin,
@@ -2872,9 +3365,10 @@ class Messengent(Correspondent):
                          self.redoTimeoutMax)
             self.redoTimer.restart(duration=duration)
 
-            misseds = self.tray.missing()
-            if misseds:
-                self.resend(misseds)
+            # waiting initiator has not yet sent segments above .high
+            gaps = self.tray.gaps(end=self.high + 1 if self.wait else None)
+            if gaps:
+                self.resend(gaps)
 
     def prep(self):
         '''
@@ -2893,6 +3387,12 @@ class Messengent(Correspondent):
                             si=self.sid,
                             ti=self.tid,)
 
+    def target(self, data):
+        '''
+        Returns stream target from stack .sink for message from .remote
+        '''
+        return self.stack.sink(self.remote, data)
+
     def message(self):
         '''
         Process message packet. Called repeatedly for each packet in message
@@ -2905,6 +3405,7 @@ class Messengent(Correspondent):
             self.nack()
             return
 
+        count = self.tray.count
         try:
             body = self.tray.parse(self.rxPacket)
         except raeting.PacketError as ex:
@@ -2913,6 +3414,9 @@ class Messengent(Correspondent):
             self.nack()
             return
 
+        if self.wait and self.tray.count > count and self.timeout > 0.0:
+            self.timer.restart() # paced by initiator so time out when idle
+
         if self.index not in self.remote.transactions:
             self.add()
         elif self.remote.transactions[self.index] != self:
@@ -2932,26 +3436,97 @@ class Messengent(Correspondent):
             console.verbose("{0} received message body\n{1}\n".format(
                     self.stack.name, body))
             # application layer authorizaiton needs to know who sent the message
-            self.stack.rxMsgs.append((body, self.remote.name))
+            if self.rxPacket.data['mc']: # coalesced bodies so split
+                for item in body:
+                    self.stack.rxMsgs.append((item, self.remote.name))
+            else:
+                self.stack.rxMsgs.append((body, self.remote.name))
             self.complete()
 
         elif self.wait:
+            high = self.high
+            self.high = max(high, self.tray.last)
+            gaps = []
+            if self.tray.last > high + 1: # gap so segments since high lost
+                gaps = self.tray.gaps(begin=high + 1, end=self.tray.last)
+            if self.stack.delayed:
+                self.delay(fresh=self.tray.count > count, gaps=gaps)
+                return
             self.ackMessage()
+            if gaps:
+                self.resend(gaps)
+
+        elif self.tray.pb: # parity rebuilds one lost segment per block
+            if self.tray.last >= self.tray.sc: # so request only what it cannot
+                misseds = self.tray.unrepaired(self.tray.last - self.tray.sc)
+                if misseds:
+                    self.resend([(m, m + 1) for m in misseds])
+            elif self.tray.count == 1 and self.tray.last == self.tray.sc - 1:
+                gaps = self.tray.gaps() # redo after lost ack so no parity follows
+                if gaps:
+                    self.resend(gaps)
 
         else:
-            misseds = self.tray.missing(begin=self.tray.prev, end=self.tray.last)
-            if misseds:
-                self.resend(misseds)
+            gaps = self.tray.gaps(begin=self.tray.prev, end=self.tray.last)
+            if gaps:
+                self.resend(gaps)
+
+    def delay(self, fresh, gaps):
+        '''
+        Delay ack of fresh waiting segment until .AckCount are unacked or
+        .ackTimer expires. Resend request for gaps carries the ack instead
+        A duplicate segment is acked at once since initiator redid it
+        '''
+        self.unacked += 1
+        if gaps:
+            self.resend(gaps)
+        elif not fresh or self.unacked >= self.AckCount:
+            self.ackMessage()
+        elif self.unacked == 1:
+            self.ackTimer.restart()
+            self.stack.incStat("message_ack_delay")
+
+    def acks(self, body):
+        '''
+        Update body with waiting ack fields when delayed and piggyback pending
+        acks of other messages from .remote then mark them all acked
+        Only piggybacks when .remote advertised it understands acks at join
+        '''
+        if not self.stack.delayed:
+            return
+        if self.wait:
+            body.update(sn=self.tray.last, cum=self.tray.contiguous)
+            self.unacked = 0
+        if not self.remote.acking: # pending acks go on their own ack packets
+            return
+        acks = []
+        for transaction in self.remote.transactions.values():
+            if (isinstance(transaction, Messengent) and
+                    transaction is not self and transaction.unacked):
+                acks.append([transaction.sid, transaction.tid,
+                             transaction.tray.last, transaction.tray.contiguous])
+                transaction.unacked = 0
+        if acks:
+            body.update(acks=acks)
+            self.stack.incStat("message_ack_piggyback_tx", len(acks))
 
     def ackMessage(self):
         '''
         Send ack to message
+        When waiting ack says which segment sn and if message is done
+        When delayed also cum count of segments received in order
         '''
         body = odict()
+        if self.wait:
+            body.update(sn=self.tray.last)
+            if self.tray.complete:
+                body.update(done=True)
+        self.acks(body)
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.ack,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
@@ -2964,22 +3539,31 @@ class Messengent(Correspondent):
         console.concise("Messengent {0}. Do Ack Segment {1} with {2} at {3}\n".format(
                 self.stack.name, self.tray.last, self.remote.name, self.stack.store.stamp))
 
-    def resend(self, misseds):
+    def resend(self, gaps):
         '''
         Send resend request(s) for missing packets
-        '''
-        while misseds:
-            if len(misseds) > 64:
-                remainders = misseds[64:] # only do at most 64 at a time
-                misseds = misseds[:64]
+        gaps is list of (first, stop) ranges of missing packet numbers
+        Sent as misseds list of packet numbers unless remote advertised gaps
+        '''
+        if not self.remote.gapped:
+            gaps = [(m, m + 1) for first, stop in gaps for m in xrange(first, stop)]
+        while gaps:
+            if len(gaps) > 64:
+                remainders = gaps[64:] # only do at most 64 ranges at a time
+                gaps = gaps[:64]
             else:
                 remainders = []
 
-            body = odict(misseds=misseds)
+            if self.remote.gapped:
+                body = odict(gaps=[[first, stop] for first, stop in gaps])
+            else:
+                body = odict(misseds=[first for first, stop in gaps])
+            self.acks(body)
             packet = packeting.TxPacket(stack=self.stack,
                                         kind=raeting.pcktKinds.resend,
                                         embody=body,
-                                        data=self.txData)
+                                        data=self.txData,
+                                        template=self.template)
             try:
                 packet.pack()
             except raeting.PacketError as ex:
@@ -2990,8 +3574,18 @@ class Messengent(Correspondent):
             self.transmit(packet)
             self.stack.incStat("message_resend")
             console.concise("Messengent {0}. Do Resend Segments {1} with {2} at {3}\n".format(
-                    self.stack.name, misseds, self.remote.name, self.stack.store.stamp))
-            misseds = remainders
+                    self.stack.name, gaps, self.remote.name, self.stack.store.stamp))
+            gaps = remainders
+
+    def remove(self, remote=None, index=None):
+        '''
+        Augment remove with abort of incomplete stream target
+        '''
+        super(Messengent, self).remove(remote=remote, index=index)
+        if self.tray.abort():
+            console.concise("Messengent {0}. Aborted stream with {1} at {2}\n".format(
+                    self.stack.name, self.remote.name, self.stack.store.stamp))
+            self.stack.incStat("stream_aborted")
 
     def complete(self):
         '''
@@ -3007,7 +3601,7 @@ class Messengent(Correspondent):
         Process nack packet
         terminate in response to nack
         '''
-        if not self.stack.parseInner(self.rxPacket):
+        if not self.stack.parseInner(self.rxPacket, lazy=True):
             return
 
         self.remote.refresh(alived=True)
@@ -3025,7 +3619,8 @@ class Messengent(Correspondent):
         packet = packeting.TxPacket(stack=self.stack,
                                     kind=raeting.pcktKinds.nack,
                                     embody=body,
-                                    data=self.txData)
+                                    data=self.txData,
+                                    template=self.template)
         try:
             packet.pack()
         except raeting.PacketError as ex:
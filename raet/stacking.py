@@ -500,6 +500,20 @@ class Stack(object):
         '''
         pass
 
+    def remaining(self):
+        '''
+        Returns seconds until timer based processing is next due
+        or None if no timer based processing is pending
+        '''
+        return None
+
+    def remainingManage(self):
+        '''
+        Returns seconds until .manage of remote presence is next due
+        or None if stack has no presence to manage
+        '''
+        return None
+
 class KeepStack(Stack):
     '''
     RAET protocol base stack object with persistance via Keep attribute.
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+'''
+Microbenchmark of nonce generation for encrypted packets
+Compares the former random nonce of libnacl.randombytes per call with the
+current counter based nonce both alone and within Boxer.encrypt
+
+Run as script
+    python bench_nacling.py
+'''
+from __future__ import print_function
+# pylint: skip-file
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+import time
+
+import libnacl
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+from raet import nacling
+
+def setUpModule():
+    console.reinit(verbosity=console.Wordage.concise)
+
+def tearDownModule():
+    pass
+
+class BenchTestCase(unittest.TestCase):
+    """
+    Benchmark nonce generation
+    """
+    Count = 100000 # nonces generated per run
+
+    def setUp(self):
+        self.priverBob = nacling.Privateer()
+        self.priverPam = nacling.Privateer()
+        self.boxer = nacling.Boxer(self.priverBob, self.priverPam.pubhex)
+
+    def tearDown(self):
+        pass
+
+    def randomNonce(self):
+        '''
+        Former nonce with one getrandom syscall per call
+        '''
+        return libnacl.randombytes(nacling.Box.NONCE_SIZE)
+
+    def generate(self, nonce):
+        '''
+        Returns seconds per call of nonce
+        '''
+        start = time.time()
+        for i in range(self.Count):
+            nonce()
+        return (time.time() - start) / self.Count
+
+    def encrypt(self, msg, nonce):
+        '''
+        Returns seconds per Boxer.encrypt of msg with nonce generator nonce
+        '''
+        self.priverBob.nonce = nonce
+        count = self.Count // 10
+        start = time.time()
+        for i in range(count):
+            self.boxer.encrypt(msg)
+        elapsed = (time.time() - start) / count
+        del self.priverBob.nonce
+        return elapsed
+
+    def testBenchmark(self):
+        '''
+        Report time per nonce and per encryption for random and counter nonces
+        '''
+        console.terse("{0}\n".format(self.testBenchmark.__doc__))
+        console.reinit(verbosity=console.Wordage.terse)
+
+        random = self.generate(self.randomNonce)
+        counter = self.generate(self.priverBob.nonce)
+        console.terse("Nonce: random {0:.2f}us counter {1:.2f}us\n".format(
+                      random * 1e6, counter * 1e6))
+
+        for size in [64, 1024]:
+            msg = "".ljust(size, 'x')
+            random = self.encrypt(msg, self.randomNonce)
+            counter = self.encrypt(msg, self.priverBob.nonce)
+            console.terse("Encrypt {0} bytes: random nonce {1:.2f}us counter "
+                          "nonce {2:.2f}us\n".format(size, random * 1e6,
+                                                     counter * 1e6))
+
+def runAll():
+    """ Unittest runner """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(BenchTestCase))
+
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+if __name__ == '__main__' and __package__ is None:
+
+    runAll()
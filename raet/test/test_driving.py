@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of event driven stack servicing
+
+'''
+# pylint: skip-file
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+import os
+import time
+import tempfile
+import shutil
+
+from ioflo.base.odicting import odict
+from ioflo.base import storing
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+from raet import raeting, driving
+from raet.road import keeping, estating, stacking
+from raet.lane import yarding
+from raet.lane import stacking as lanestacking
+
+def setUpModule():
+    console.reinit(verbosity=console.Wordage.concise)
+
+def tearDownModule():
+    pass
+
+class RoadTestCase(unittest.TestCase):
+    """
+    Test driver servicing road stacks
+    """
+
+    def setUp(self):
+        self.store = storing.Store(stamp=0.0)
+        self.baseDirpath=tempfile.mkdtemp(prefix="raet",  suffix="base", dir='/tmp')
+        stacking.RoadStack.Bk = raeting.bodyKinds.json
+
+        mainDirpath = os.path.join(self.baseDirpath, 'road', 'keep', 'main')
+        otherDirpath = os.path.join(self.baseDirpath, 'road', 'keep', 'other')
+        keeping.clearAllKeep(mainDirpath)
+        keeping.clearAllKeep(otherDirpath)
+
+        self.main = stacking.RoadStack(store=self.store,
+                                       name='main',
+                                       main=True,
+                                       auto=raeting.autoModes.once,
+                                       dirpath=mainDirpath,
+                                       )
+
+        self.other = stacking.RoadStack(store=self.store,
+                                        name='other',
+                                        auto=raeting.autoModes.once,
+                                        ha=("", raeting.RAET_TEST_PORT),
+                                        dirpath=otherDirpath,
+                                        )
+        self.driver = driving.Driver(stacks=[self.main, self.other], timeout=0.5)
+
+    def tearDown(self):
+        self.driver.close()
+        self.main.server.close()
+        self.other.server.close()
+
+        self.main.clearAllDir()
+        self.other.clearAllDir()
+
+        if os.path.exists(self.baseDirpath):
+            shutil.rmtree(self.baseDirpath)
+
+    def service(self, duration=2.0):
+        '''
+        Drive until no transactions remain or duration expires
+        '''
+        end = time.time() + duration
+        self.driver.serviceOnce(timeout=0.0)
+        while ((self.main.transactions or self.other.transactions) and
+                time.time() < end):
+            self.driver.serviceOnce()
+
+    def testBootstrap(self):
+        '''
+        Test join allow and message driven by Driver
+        '''
+        console.terse("{0}\n".format(self.testBootstrap.__doc__))
+        self.other.addRemote(estating.RemoteEstate(stack=self.other,
+                                                   fuid=0,
+                                                   sid=0,
+                                                   ha=self.main.local.ha))
+        self.other.join()
+        self.service()
+        self.assertTrue(self.other.remotes.values()[0].joined)
+        self.assertTrue(self.main.remotes.values()[0].joined)
+
+        self.other.allow()
+        self.service()
+        self.assertTrue(self.other.remotes.values()[0].allowed)
+        self.assertTrue(self.main.remotes.values()[0].allowed)
+
+        bloat = "".join(str(i).rjust(100, " ") for i in range(300))
+        mains = [odict(house="Main", queue="gig stuff", bloat=bloat)]
+        others = [odict(house="Other", queue="big stuff")]
+        for msg in mains:
+            self.main.transmit(msg)
+        for msg in others:
+            self.other.transmit(msg)
+        self.service()
+
+        self.assertEqual(len(self.main.transactions), 0)
+        self.assertEqual(len(self.other.transactions), 0)
+        self.assertEqual(len(self.main.rxMsgs), 1)
+        self.assertDictEqual(self.main.rxMsgs[0][0], others[0])
+        self.assertEqual(len(self.other.rxMsgs), 1)
+        self.assertDictEqual(self.other.rxMsgs[0][0], mains[0])
+
+    def testManage(self):
+        '''
+        Test driver manages presence so keep alives run when due
+        '''
+        console.terse("{0}\n".format(self.testManage.__doc__))
+        self.other.addRemote(estating.RemoteEstate(stack=self.other,
+                                                   fuid=0,
+                                                   sid=0,
+                                                   ha=self.main.local.ha))
+        self.other.join()
+        self.service()
+        self.other.allow()
+        self.service()
+        self.assertTrue(self.other.remotes.values()[0].allowed)
+        self.assertIsNot(self.other.remainingManage(), None)
+        self.assertIs(self.other.stats.get('alive_complete'), None)
+
+        self.driver.service(duration=self.other.period * 1.5)
+        self.assertTrue(self.other.stats.get('alive_complete') >= 1)
+        self.assertTrue(self.main.stats.get('alive_complete') >= 1)
+        self.assertIn('main', self.other.availables)
+        self.assertIn('other', self.main.availables)
+
+    def testIdle(self):
+        '''
+        Test idle driver sleeps for timeout and wakes on timer due
+        '''
+        console.terse("{0}\n".format(self.testIdle.__doc__))
+        self.assertIs(self.main.remaining(), None)
+        self.assertIs(self.other.remaining(), None)
+
+        start = time.time()
+        self.driver.serviceOnce(timeout=0.3)
+        elapsed = time.time() - start
+        self.assertTrue(elapsed >= 0.25)
+        self.assertTrue(self.store.stamp >= 0.25)
+
+        # joiner with redo timer wakes the driver before timeout
+        self.other.addRemote(estating.RemoteEstate(stack=self.other,
+                                                   fuid=0,
+                                                   sid=0,
+                                                   ha=('127.0.0.1', 65000)))
+        self.other.join() # to nowhere so only redos and timeout
+        remaining = self.other.remaining()
+        self.assertTrue(remaining is not None and remaining <= 5.0)
+        redos = self.other.stats.get('redo_join', 0)
+        self.driver.service(duration=2.0)
+        self.assertTrue(self.other.stats.get('redo_join', 0) > redos)
+
+class LaneTestCase(unittest.TestCase):
+    """
+    Test driver servicing lane stacks
+    """
+
+    def setUp(self):
+        self.baseDirpath=tempfile.mkdtemp(prefix="raet",  suffix="base", dir='/tmp')
+        self.main = lanestacking.LaneStack(name='main',
+                                           uid=1,
+                                           lanename='cherry',
+                                           sockdirpath=self.baseDirpath)
+        self.other = lanestacking.LaneStack(name='other',
+                                            uid=1,
+                                            lanename='cherry',
+                                            sockdirpath=self.baseDirpath)
+        self.main.addRemote(yarding.RemoteYard(stack=self.main, ha=self.other.ha))
+        self.other.addRemote(yarding.RemoteYard(stack=self.other, ha=self.main.ha))
+        self.driver = driving.Driver(stacks=[self.main, self.other], timeout=0.5)
+
+    def tearDown(self):
+        self.driver.close()
+        self.main.server.close()
+        self.other.server.close()
+        if os.path.exists(self.baseDirpath):
+            shutil.rmtree(self.baseDirpath)
+
+    def testMessage(self):
+        '''
+        Test lane messages driven by Driver
+        '''
+        console.terse("{0}\n".format(self.testMessage.__doc__))
+        mains = [odict(what="This is a message to other", extra="Hi")]
+        others = [odict(what="This is a message to main", extra="Ho")]
+        for msg in mains:
+            self.main.transmit(msg=msg)
+        for msg in others:
+            self.other.transmit(msg=msg)
+
+        end = time.time() + 1.0
+        while (not (self.main.rxMsgs and self.other.rxMsgs) and
+                time.time() < end):
+            self.driver.serviceOnce()
+
+        self.assertEqual(len(self.main.rxMsgs), 1)
+        self.assertDictEqual(self.main.rxMsgs[0][0], others[0])
+        self.assertEqual(len(self.other.rxMsgs), 1)
+        self.assertDictEqual(self.other.rxMsgs[0][0], mains[0])
+
+    def testRemove(self):
+        '''
+        Test add and remove of driven stacks
+        '''
+        console.terse("{0}\n".format(self.testRemove.__doc__))
+        self.assertRaises(raeting.StackError, self.driver.add, self.main)
+        self.driver.remove(self.main)
+        self.assertEqual(self.driver.stacks.values(), [self.other])
+        self.driver.add(self.main)
+        self.assertEqual(len(self.driver.stacks), 2)
+
+def runSome():
+    """ Unittest runner """
+    tests = []
+    names = ['testBootstrap',
+             'testManage',
+             'testIdle', ]
+    tests.extend(map(RoadTestCase, names))
+
+    names = ['testMessage',
+             'testRemove', ]
+    tests.extend(map(LaneTestCase, names))
+
+    suite = unittest.TestSuite(tests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+def runAll():
+    """ Unittest runner """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(RoadTestCase))
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(LaneTestCase))
+
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+if __name__ == '__main__' and __package__ is None:
+
+    #console.reinit(verbosity=console.Wordage.concise)
+
+    runAll() #run all unittests
+
+    #runSome()#only run some
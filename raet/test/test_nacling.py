@@ -88,6 +88,19 @@ class BasicTestCase(unittest.TestCase):
         self.assertTrue(verified)
         console.terse("Verified by Pam = {0}\n".format(verified))
 
+        # verifying bytearray in place and rejecting tampered or bad signature
+        buf = bytearray(msg)
+        self.assertTrue(verferPam.verify(signature, buf))
+        self.assertEqual(buf, bytearray(msg))
+        buf[0] = 'J'
+        self.assertFalse(verferPam.verify(signature, buf))
+        self.assertFalse(verferPam.verify(signature, msg[1:]))
+        self.assertFalse(verferPam.verify(signature[:-1] + 'x', msg))
+        self.assertFalse(verferPam.verify(signature[:-1], msg)) # truncated
+        self.assertFalse(verferPam.verify(signature[:8], buf))
+        self.assertFalse(verferPam.verify('', msg))
+        self.assertFalse(verferPam.verify(signature + 'x', msg))
+
     def testEncrypt(self):
         '''
         Test encryption decryption with public private remote local key pairs
@@ -219,6 +232,86 @@ class BasicTestCase(unittest.TestCase):
         self.assertEqual(len(demsg), 50)
         self.assertEqual(demsg, enmsg)
 
+    def testBoxer(self):
+        '''
+        Test precomputed shared key encryption with Boxer
+        '''
+        console.terse("{0}\n".format(self.testBoxer.__doc__))
+        priverBob = nacling.Privateer()
+        priverPam = nacling.Privateer()
+
+        boxerBob = nacling.Boxer(priverBob, priverPam.pubhex)
+        boxerPam = nacling.Boxer(priverPam, priverBob.pubraw)
+
+        enmsg = "Hello its me Bob, Did you get my last message Pam?"
+        cipher, nonce = boxerBob.encrypt(enmsg)
+        self.assertEqual(len(cipher), 66)
+        self.assertEqual(len(nonce), 24)
+
+        # interoperates with unprecomputed Privateer
+        demsg = boxerPam.decrypt(cipher, nonce)
+        self.assertEqual(demsg, enmsg)
+        demsg = priverPam.decrypt(cipher, nonce, priverBob.pubhex)
+        self.assertEqual(demsg, enmsg)
+
+        cipher, nonce = priverPam.encrypt(enmsg, priverBob.pubhex)
+        demsg = boxerBob.decrypt(cipher, nonce)
+        self.assertEqual(demsg, enmsg)
+
+        cipher, nonce = boxerBob.encrypt(enmsg, enhex=True)
+        self.assertEqual(len(cipher), 132)
+        self.assertEqual(len(nonce), 48)
+        demsg = boxerPam.decrypt(cipher, nonce, dehex=True)
+        self.assertEqual(demsg, enmsg)
+
+        # session authenticator either end can verify
+        authenticator = boxerBob.auth(enmsg)
+        self.assertEqual(len(authenticator), 32)
+        self.assertEqual(boxerPam.auth(enmsg), authenticator)
+        self.assertTrue(boxerPam.verify(authenticator, enmsg))
+        self.assertFalse(boxerPam.verify(authenticator, enmsg + " "))
+        self.assertFalse(boxerPam.verify(authenticator[:-1], enmsg))
+        boxerTom = nacling.Boxer(nacling.Privateer(), priverBob.pubraw)
+        self.assertFalse(boxerTom.verify(authenticator, enmsg))
+
+    def testNonce(self):
+        '''
+        Test counter based nonce generation
+        '''
+        console.terse("{0}\n".format(self.testNonce.__doc__))
+        priverBob = nacling.Privateer()
+        priverPam = nacling.Privateer()
+        self.assertEqual(len(priverBob.noncePrefix), 16)
+        self.assertNotEqual(priverBob.noncePrefix, priverPam.noncePrefix)
+
+        nonces = [priverBob.nonce() for i in range(1000)]
+        self.assertEqual(len(set(nonces)), 1000)
+        for nonce in nonces:
+            self.assertEqual(len(nonce), 24)
+            self.assertTrue(nonce.startswith(priverBob.noncePrefix))
+        self.assertEqual(nonces[0][16:], '\x00' * 8)
+        self.assertEqual(nonces[1][16:], '\x00' * 7 + '\x01')
+        self.assertEqual(priverBob.nonceCount, 1000)
+
+        # encryption consumes nonces from counter
+        boxerBob = nacling.Boxer(priverBob, priverPam.pubhex)
+        boxerPam = nacling.Boxer(priverPam, priverBob.pubraw)
+        enmsg = "Hello its me Bob, Did you get my last message Pam?"
+        cipher, nonce = boxerBob.encrypt(enmsg)
+        self.assertEqual(nonce, priverBob.noncePrefix + '\x00' * 6 + '\x03\xe8')
+        self.assertEqual(boxerPam.decrypt(cipher, nonce), enmsg)
+        cipher, nonce = priverBob.encrypt(enmsg, priverPam.pubhex)
+        self.assertEqual(nonce[16:], '\x00' * 6 + '\x03\xe9')
+
+        # counter exhaustion draws fresh prefix rather than wrap
+        prefix = priverBob.noncePrefix
+        priverBob.nonceCount = nacling.NONCE_COUNTER_MAX
+        nonce = priverBob.nonce()
+        self.assertEqual(nonce, prefix + '\xff' * 8)
+        nonce = priverBob.nonce()
+        self.assertNotEqual(priverBob.noncePrefix, prefix)
+        self.assertEqual(nonce, priverBob.noncePrefix + '\x00' * 8)
+
     def testUuid(self):
         '''
         Test uuid generation
@@ -316,6 +409,8 @@ def runSome():
     tests = []
     names = ['testSign',
              'testEncrypt'
+             'testBoxer',
+             'testNonce',
              'testUuid', ]
     tests.extend(map(BasicTestCase, names))
 
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of timer scheduling
+
+'''
+# pylint: skip-file
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+from ioflo.base import storing
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+from raet import timing
+
+def setUpModule():
+    console.reinit(verbosity=console.Wordage.concise)
+
+def tearDownModule():
+    pass
+
+class Owner(object):
+    '''
+    Hashable timer owner
+    '''
+    def __init__(self, name):
+        self.name = name
+
+class BasicTestCase(unittest.TestCase):
+    """
+    Test Scheduler and scheduled StoreTimer
+    """
+
+    def setUp(self):
+        self.store = storing.Store(stamp=0.0)
+
+    def tearDown(self):
+        pass
+
+    def testScheduler(self):
+        '''
+        Test push peek and pop of scheduler
+        '''
+        console.terse("{0}\n".format(self.testScheduler.__doc__))
+        scheduler = timing.Scheduler()
+        self.assertEqual(len(scheduler), 0)
+        self.assertIs(scheduler.peek(), None)
+        self.assertEqual(scheduler.pop(10.0), [])
+
+        alpha = Owner('alpha')
+        beta = Owner('beta')
+        gamma = Owner('gamma')
+        scheduler.push(2.0, beta)
+        scheduler.push(1.0, alpha)
+        scheduler.push(3.0, gamma)
+        scheduler.push(1.5, beta)
+        self.assertEqual(len(scheduler), 4)
+        self.assertEqual(scheduler.peek(), 1.0)
+
+        self.assertEqual(scheduler.pop(0.5), [])
+        self.assertEqual(scheduler.pop(2.0), [alpha, beta]) # beta once
+        self.assertEqual(len(scheduler), 1)
+        self.assertEqual(scheduler.peek(), 3.0)
+        self.assertEqual(scheduler.pop(3.0), [gamma])
+        self.assertEqual(len(scheduler), 0)
+
+        scheduler.push(1.0, alpha)
+        scheduler.clear()
+        self.assertIs(scheduler.peek(), None)
+
+    def testStoreTimer(self):
+        '''
+        Test StoreTimer schedules owner on every restart superseding last
+        '''
+        console.terse("{0}\n".format(self.testStoreTimer.__doc__))
+        scheduler = timing.Scheduler()
+        owner = Owner('alpha')
+        timer = timing.StoreTimer(self.store, duration=1.0,
+                                  scheduler=scheduler, owner=owner)
+        self.assertEqual(scheduler.peek(), 1.0)
+        self.assertFalse(timer.expired)
+
+        self.store.advanceStamp(0.5)
+        timer.restart()
+        self.assertEqual(len(scheduler), 2)
+
+        self.store.advanceStamp(0.5)
+        self.assertFalse(timer.expired)
+        self.assertEqual(scheduler.pop(self.store.stamp), []) # stale entry
+        self.assertEqual(len(scheduler), 1)
+        self.assertFalse(timer.expired)
+
+        self.store.advanceStamp(0.5)
+        self.assertTrue(timer.expired)
+        self.assertEqual(scheduler.pop(self.store.stamp), [owner])
+        self.assertEqual(len(scheduler), 0)
+
+        timer.extend(1.0)
+        self.assertEqual(scheduler.peek(), timer.stop)
+
+        # many restarts keep heap bounded by live timers
+        other = timing.StoreTimer(self.store, duration=3600.0,
+                                  scheduler=scheduler, owner=Owner('beta'))
+        for i in range(1000):
+            self.store.advanceStamp(1.0)
+            timer.restart()
+            other.restart()
+            self.assertTrue(len(scheduler) <= 5)
+        self.assertEqual(scheduler.peek(), timer.stop)
+        self.assertEqual(scheduler.pop(timer.stop), [owner])
+        self.assertEqual(scheduler.peek(), other.stop)
+
+        other.cancel()
+        self.assertIs(scheduler.peek(), None)
+        self.assertEqual(scheduler.pop(other.stop), [])
+        self.assertEqual(len(scheduler), 0)
+
+        # unscheduled timer behaves as ioflo StoreTimer
+        timer = timing.StoreTimer(self.store, duration=1.0)
+        self.assertIs(timer.scheduler, None)
+        timer.restart()
+        self.assertEqual(timer.stop, self.store.stamp + 1.0)
+
+def runSome():
+    """ Unittest runner """
+    tests = []
+    names = ['testScheduler',
+             'testStoreTimer', ]
+    tests.extend(map(BasicTestCase, names))
+
+    suite = unittest.TestSuite(tests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+def runAll():
+    """ Unittest runner """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(BasicTestCase))
+
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+if __name__ == '__main__' and __package__ is None:
+
+    #console.reinit(verbosity=console.Wordage.concise)
+
+    runAll() #run all unittests
+
+    #runSome()#only run some
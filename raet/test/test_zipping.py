@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+'''
+Tests of body compression codecs and session dictionaries
+
+'''
+# pylint: skip-file
+import sys
+if sys.version_info < (2, 7):
+    import unittest2 as unittest
+else:
+    import unittest
+
+try:
+    import simplejson as json
+except ImportError:
+    import json
+
+from ioflo.base.odicting import odict
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+from raet import raeting, zipping
+
+def setUpModule():
+    console.reinit(verbosity=console.Wordage.concise)
+
+def tearDownModule():
+    pass
+
+def returns(count):
+    '''
+    Returns list of count small structurally identical json job returns
+    '''
+    msgs = []
+    for i in range(count):
+        body = odict([('route', odict([('src', ['minion{0:03d}'.format(i), 'jobber', None]),
+                                       ('dst', ['master', 'manor', None])])),
+                      ('load', odict([('fun', 'test.ping'),
+                                      ('jid', '20141017{0:06d}'.format(i)),
+                                      ('return', True),
+                                      ('id', 'minion{0:03d}'.format(i))]))])
+        msgs.append(json.dumps(body, separators=(',', ':')))
+    return msgs
+
+class BasicTestCase(unittest.TestCase):
+    """
+    Test stateless codecs and Zipper
+    """
+
+    def setUp(self):
+        pass
+
+    def tearDown(self):
+        pass
+
+    def testCompress(self):
+        '''
+        Test stateless compress and decompress
+        '''
+        console.terse("{0}\n".format(self.testCompress.__doc__))
+        msg = "Hello Raet World"
+        packed = zipping.compress(msg)
+        self.assertEqual(packed, chr(raeting.zipKinds.nada) + msg)
+        self.assertEqual(zipping.decompress(packed), msg)
+
+        msg = "".ljust(1000, 'x')
+        packed = zipping.compress(msg)
+        self.assertEqual(packed[0], chr(raeting.zipKinds.zlib))
+        self.assertTrue(len(packed) < 100)
+        self.assertEqual(zipping.decompress(packed), msg)
+
+        self.assertRaises(ValueError, zipping.decompress, packed, 999)
+        self.assertRaises(ValueError, zipping.decompress, '')
+        self.assertRaises(ValueError, zipping.decompress, chr(200) + msg)
+        self.assertRaises(ValueError, zipping.decompress, packed[:-1] + 'X')
+        self.assertRaises(ValueError, zipping.register, raeting.zipKinds.nada,
+                          None, None)
+
+    def testZipper(self):
+        '''
+        Test session dictionary training, definition and confirmation
+        '''
+        console.terse("{0}\n".format(self.testZipper.__doc__))
+        txZipper = zipping.Zipper(train=8, retrain=16)
+        rxZipper = zipping.Zipper()
+        msgs = returns(40)
+
+        for msg in msgs[:7]: # untrained so stateless
+            packed = txZipper.compress(msg)
+            self.assertEqual(packed[0], chr(raeting.zipKinds.nada))
+            self.assertEqual(rxZipper.decompress(packed), msg)
+        self.assertIs(txZipper.version, None)
+
+        packed = txZipper.compress(msgs[7]) # trained so defines until acked
+        self.assertEqual(txZipper.version, 0)
+        self.assertEqual(zipping.defined(packed), 0)
+        self.assertEqual(rxZipper.decompress(packed), msgs[7])
+        self.assertEqual(txZipper.stats['defined'], 1)
+
+        # burst before ack is stateless so never larger than without dictionary
+        for msg in msgs[8:12]:
+            packed = txZipper.compress(msg)
+            self.assertEqual(packed, zipping.compress(msg))
+            self.assertEqual(rxZipper.decompress(packed), msg)
+        self.assertEqual(txZipper.stats['defined'], 1)
+
+        # failed definition is redefined by next body
+        txZipper.abandon(0)
+        packed = txZipper.compress(msgs[12])
+        self.assertEqual(zipping.defined(packed), 0)
+        self.assertEqual(txZipper.stats['defined'], 2)
+
+        txZipper.confirm(0)
+        self.assertTrue(txZipper.confirmed)
+        txZipper.abandon(0) # confirmed so ignored
+        for msg in msgs[13:22]:
+            packed = txZipper.compress(msg)
+            self.assertEqual(packed[0], chr(raeting.zipKinds.zdict))
+            self.assertTrue(len(packed) < len(msg) // 4)
+            self.assertEqual(rxZipper.decompress(packed), msg)
+
+        # retrained version in flight while prior version still decodable
+        old = txZipper.compress(msgs[22])
+        self.assertEqual(txZipper.version, 0)
+        packed = txZipper.compress(msgs[23])
+        self.assertEqual(txZipper.version, 1)
+        self.assertEqual(zipping.defined(packed), 1)
+        self.assertFalse(txZipper.confirmed)
+        txZipper.confirm(0) # stale confirmation ignored
+        self.assertFalse(txZipper.confirmed)
+        self.assertEqual(rxZipper.decompress(packed), msgs[23])
+        self.assertEqual(rxZipper.decompress(old), msgs[22])
+        self.assertEqual(rxZipper.primers.keys(), [0, 1])
+
+        # unknown version fails on fresh session
+        self.assertRaises(ValueError, zipping.Zipper().decompress, old)
+
+        # definitions amortized over session
+        txZipper.confirm(1)
+        for msg in msgs[24:39]:
+            packed = txZipper.compress(msg)
+            self.assertEqual(packed[0], chr(raeting.zipKinds.zdict))
+            self.assertEqual(rxZipper.decompress(packed), msg)
+        self.assertEqual(txZipper.stats['raw'], sum(len(msg) for msg in msgs[:39]))
+        self.assertEqual(txZipper.stats['defined'], 3)
+        self.assertTrue(txZipper.ratio < 1.0)
+
+def runSome():
+    """ Unittest runner """
+    tests = []
+    names = ['testCompress',
+             'testZipper', ]
+    tests.extend(map(BasicTestCase, names))
+
+    suite = unittest.TestSuite(tests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+def runAll():
+    """ Unittest runner """
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.TestLoader().loadTestsFromTestCase(BasicTestCase))
+
+    unittest.TextTestRunner(verbosity=2).run(suite)
+
+if __name__ == '__main__' and __package__ is None:
+
+    #console.reinit(verbosity=console.Wordage.concise)
+
+    runAll() #run all unittests
+
+    #runSome()#only run some
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+'''
+timing.py raet protocol timer scheduling classes
+
+Timers register their owner with a Scheduler heap every time they are
+(re)started so a stack only has to touch owners whose timers have come due
+instead of walking every remote and transaction on every service pass.
+'''
+# pylint: skip-file
+# pylint: disable=W0611
+
+# Import python libs
+import heapq
+
+# Import ioflo libs
+from ioflo.base import aiding
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+class Scheduler(object):
+    '''
+    Heap of (stop, seq, owner, key) entries ordered by timer stop time
+
+    Entries are never updated in place. Pushing with the key of a timer
+    supersedes the earlier entry of that key which becomes stale and is
+    skipped when popped. The heap is compacted once stale entries outnumber
+    live ones so restarted timers neither grow it nor keep removed owners
+    referenced. Owners are expected to check their own timers when processed.
+    '''
+    def __init__(self):
+        '''
+        Setup instance
+        '''
+        self.heap = []
+        self.seq = 0 # tie breaker so owners are never compared
+        self.lives = {} # seq of live entry keyed by key
+        self.stale = 0 # number of superseded entries still in heap
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, stop, owner, key=None):
+        '''
+        Schedule owner to be due at store stamp stop
+        key if not None supersedes any entry pushed earlier with key
+        '''
+        self.seq += 1
+        if key is not None:
+            if key in self.lives:
+                self.stale += 1
+            self.lives[key] = self.seq
+        heapq.heappush(self.heap, (stop, self.seq, owner, key))
+        if self.stale * 2 > len(self.heap):
+            self.compact()
+
+    def discard(self, key):
+        '''
+        Make entry of key if any stale so its owner is not scheduled by it
+        '''
+        if self.lives.pop(key, None) is not None:
+            self.stale += 1
+            if self.stale * 2 > len(self.heap):
+                self.compact()
+
+    def live(self, entry):
+        '''
+        Returns True if heap entry is not superseded
+        '''
+        stop, seq, owner, key = entry
+        return (key is None or self.lives.get(key) == seq)
+
+    def compact(self):
+        '''
+        Remove stale entries from heap
+        '''
+        self.heap = [entry for entry in self.heap if self.live(entry)]
+        heapq.heapify(self.heap)
+        self.stale = 0
+
+    def peek(self):
+        '''
+        Returns earliest scheduled stop or None if nothing scheduled
+        '''
+        while self.heap and not self.live(self.heap[0]):
+            heapq.heappop(self.heap)
+            self.stale -= 1
+        return self.heap[0][0] if self.heap else None
+
+    def pop(self, stamp):
+        '''
+        Remove and return list of unique owners of live entries with stop at
+        or before stamp in order of stop
+        '''
+        owners = []
+        seen = set()
+        while self.heap and self.heap[0][0] <= stamp:
+            entry = heapq.heappop(self.heap)
+            if not self.live(entry):
+                self.stale -= 1
+                continue
+            stop, seq, owner, key = entry
+            if key is not None:
+                del self.lives[key]
+            if id(owner) not in seen:
+                seen.add(id(owner))
+                owners.append(owner)
+        return owners
+
+    def clear(self):
+        '''
+        Remove all entries
+        '''
+        self.heap = []
+        self.lives = {}
+        self.stale = 0
+
+class StoreTimer(aiding.StoreTimer):
+    '''
+    StoreTimer that pushes its owner onto scheduler whenever restarted
+    superseding the entry of its previous start
+    '''
+    def __init__(self, store, duration=0.0, scheduler=None, owner=None):
+        '''
+        Setup instance
+
+        scheduler is Scheduler instance or None to not schedule
+        owner is object pushed onto scheduler when timer restarts
+        '''
+        self.scheduler = scheduler
+        self.owner = owner
+        super(StoreTimer, self).__init__(store, duration=duration)
+
+    def restart(self, start=None, duration=None):
+        '''
+        Augment restart to schedule owner at new stop
+        '''
+        result = super(StoreTimer, self).restart(start=start, duration=duration)
+        if self.scheduler is not None:
+            self.scheduler.push(self.stop, self.owner, key=self)
+        return result
+
+    def cancel(self):
+        '''
+        Unschedule owner from this timer's current entry if any
+        '''
+        if self.scheduler is not None:
+            self.scheduler.discard(self)
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+'''
+zipping.py raet protocol body compression codecs for the compressed body kinds
+
+Compressed packed body is one codec kind byte followed by the codec output.
+Bodies smaller than the threshold or that do not shrink use the nada codec so
+are sent as is after the codec byte.
+Further codecs are added with register().
+
+Zipper adds per session preset dictionaries for small repetitive bodies.
+'''
+# pylint: skip-file
+# pylint: disable=W0611
+
+# Import python libs
+import zlib
+import struct
+from collections import deque
+
+from ioflo.base.odicting import odict
+
+from ioflo.base.consoling import getConsole
+console = getConsole()
+
+from . import raeting
+
+def _zlibDecompress(packed, limit):
+    '''
+    Returns zlib decompressed packed, at most limit bytes
+    Raises ValueError if more than limit bytes or corrupt
+    '''
+    decompressor = zlib.decompressobj()
+    try:
+        msg = decompressor.decompress(packed, limit)
+    except zlib.error as ex:
+        raise ValueError(str(ex))
+    if decompressor.unconsumed_tail:
+        raise ValueError("Decompressed size exceeds {0}".format(limit))
+    return msg
+
+ZDEF_PACKER = struct.Struct('!H') # dictionary length of zdef kind
+
+# codec kind to duple of (compress(msg), decompress(packed, limit))
+CODECS = odict()
+
+def register(zk, compress, decompress):
+    '''
+    Register codec functions for zip kind zk
+    compress(msg) returns compressed string
+    decompress(packed, limit) returns string of at most limit bytes or raises
+    ValueError
+    '''
+    if zk not in raeting.ZIP_KIND_NAMES or zk == raeting.zipKinds.nada:
+        emsg = "Invalid zip kind '{0}'".format(zk)
+        raise ValueError(emsg)
+    CODECS[zk] = (compress, decompress)
+
+register(raeting.zipKinds.zlib, zlib.compress, _zlibDecompress)
+
+def compress(msg, zk=raeting.zipKinds.zlib, threshold=raeting.ZIP_THRESHOLD):
+    '''
+    Returns packed of codec kind byte followed by msg compressed with codec zk
+    Uses nada codec when msg shorter than threshold or not shrunk
+    '''
+    if zk != raeting.zipKinds.nada and len(msg) >= threshold:
+        if zk not in CODECS:
+            emsg = "Unregistered zip kind '{0}'".format(zk)
+            raise ValueError(emsg)
+        packed = CODECS[zk][0](msg)
+        if len(packed) < len(msg):
+            return "".join([chr(zk), packed])
+    return "".join([chr(raeting.zipKinds.nada), msg])
+
+def decompress(packed, limit=raeting.MAX_MESSAGE_SIZE):
+    '''
+    Returns msg from packed of codec kind byte followed by codec output
+    Raises ValueError if unknown codec, corrupt or larger than limit
+    '''
+    if not packed:
+        emsg = "Missing zip kind"
+        raise ValueError(emsg)
+    zk = ord(packed[0])
+    if zk == raeting.zipKinds.nada:
+        return packed[1:]
+    if zk not in CODECS:
+        emsg = "Unregistered zip kind '{0}'".format(zk)
+        raise ValueError(emsg)
+    return CODECS[zk][1](packed[1:], limit)
+
+class Zipper(object):
+    '''
+    Session compression of small repetitive bodies with a preset dictionary
+    trained from recent tx bodies to one remote.
+
+    Python 2 zlib has no zdict so the dictionary is emulated by priming a
+    compressor and decompressor with the dictionary, sync flushed, and
+    copying the primed one for each body.
+
+    zdef packed is kind byte, version byte, two byte dictionary length,
+    dictionary then output of primed compressor. Used by one message at a
+    time until the remote acks it, bodies meanwhile are compressed stateless
+    so a burst after training does not carry the dictionary in every body.
+    zdict packed is kind byte, version byte then output of primed compressor.
+
+        .samples is deque of recent tx bodies to train from
+        .count is number of tx bodies since last training
+        .version is tx dictionary version, None until trained
+        .zdict is tx dictionary
+        .primer is compressor primed with .zdict
+        .confirmed is True once remote acked a message defining .version
+        .defining is True while a message defining .version is unacked
+        .primers is odict of (zdict, primed decompressor) keyed by rx version
+        .stats is odict of tx body counters
+    '''
+    Size = 4096 # max dictionary bytes
+    Train = 16 # tx bodies before first training
+    Retrain = 1024 # tx bodies between retraining
+    Versions = 2 # rx dictionary versions kept for messages in flight
+
+    def __init__(self, size=None, train=None, retrain=None):
+        '''
+        Setup instance
+        '''
+        self.size = size if size is not None else self.Size
+        self.train = train if train is not None else self.Train
+        self.retrain = retrain if retrain is not None else self.Retrain
+        self.samples = deque(maxlen=max(self.train, 1))
+        self.count = 0
+        self.version = None
+        self.zdict = ''
+        self.primer = None
+        self.confirmed = False
+        self.defining = False
+        self.primers = odict()
+        self.stats = odict([('raw', 0), ('zipped', 0), ('defined', 0),
+                            ('trained', 0)])
+
+    @property
+    def ratio(self):
+        '''
+        Property is tx compressed bytes over raw bytes, 1.0 if none
+        '''
+        if not self.stats['raw']:
+            return 1.0
+        return self.stats['zipped'] / float(self.stats['raw'])
+
+    @staticmethod
+    def prime(zdict):
+        '''
+        Returns duple (compressor, decompressor) primed with zdict
+        '''
+        compressor = zlib.compressobj()
+        primed = compressor.compress(zdict) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        decompressor = zlib.decompressobj()
+        if decompressor.decompress(primed) != zdict:
+            raise ValueError("Failed priming dictionary")
+        return (compressor, decompressor)
+
+    def sample(self, msg):
+        '''
+        Add msg to training samples and retrain when due
+        Bodies longer than the dictionary are not representative so skipped
+        '''
+        if len(msg) > self.size:
+            return
+        self.samples.append(msg)
+        self.count += 1
+        if self.count >= (self.train if self.version is None else self.retrain):
+            self.learn()
+
+    def learn(self):
+        '''
+        Train new tx dictionary version from samples
+        Most recent samples are last so nearest to the compressed data
+        '''
+        self.zdict = "".join(self.samples)[-self.size:]
+        self.primer, decompressor = self.prime(self.zdict)
+        self.version = 0 if self.version is None else (self.version + 1) % 256
+        self.confirmed = False
+        self.defining = False
+        self.count = 0
+        self.stats['trained'] += 1
+
+    def confirm(self, version):
+        '''
+        Remote acked message defining dictionary version
+        '''
+        if version == self.version:
+            self.confirmed = True
+
+    def abandon(self, version):
+        '''
+        Message defining dictionary version failed so next body defines it
+        '''
+        if version == self.version and not self.confirmed:
+            self.defining = False
+
+    def compress(self, msg, threshold=raeting.ZIP_THRESHOLD):
+        '''
+        Returns packed of msg compressed with session dictionary if trained
+        else stateless as per compress()
+        '''
+        self.sample(msg)
+        packed = compress(msg, threshold=threshold)
+        if self.primer is not None and (self.confirmed or not self.defining):
+            compressor = self.primer.copy()
+            zipped = compressor.compress(msg) + compressor.flush()
+            if self.confirmed:
+                if len(zipped) + 2 < len(packed):
+                    packed = "".join([chr(raeting.zipKinds.zdict),
+                                      chr(self.version), zipped])
+            else: # define once at a time until acked
+                self.defining = True
+                packed = "".join([chr(raeting.zipKinds.zdef),
+                                  chr(self.version),
+                                  ZDEF_PACKER.pack(len(self.zdict)),
+                                  self.zdict,
+                                  zipped])
+                self.stats['defined'] += 1
+        self.stats['raw'] += len(msg)
+        self.stats['zipped'] += len(packed)
+        return packed
+
+    def decompress(self, packed, limit=raeting.MAX_MESSAGE_SIZE):
+        '''
+        Returns msg from packed of session dictionary or stateless kinds
+        Raises ValueError if unknown version, codec, corrupt or larger than limit
+        '''
+        if not packed:
+            return decompress(packed, limit)
+        zk = ord(packed[0])
+        if zk not in (raeting.zipKinds.zdict, raeting.zipKinds.zdef):
+            return decompress(packed, limit)
+
+        if len(packed) < 2:
+            raise ValueError("Missing dictionary version")
+        version = ord(packed[1])
+        offset = 2
+        if zk == raeting.zipKinds.zdef:
+            if len(packed) < offset + ZDEF_PACKER.size:
+                raise ValueError("Missing dictionary length")
+            size, = ZDEF_PACKER.unpack_from(packed, offset)
+            offset += ZDEF_PACKER.size
+            if size > len(packed) - offset:
+                raise ValueError("Truncated dictionary")
+            zdict = packed[offset:offset + size]
+            if version not in self.primers or self.primers[version][0] != zdict:
+                compressor, decompressor = self.prime(zdict)
+                self.primers.pop(version, None)
+                self.primers[version] = (zdict, decompressor)
+                while len(self.primers) > self.Versions:
+                    del self.primers[self.primers.keys()[0]]
+            offset += size
+
+        if version not in self.primers:
+            raise ValueError("Unknown dictionary version '{0}'".format(version))
+        decompressor = self.primers[version][1].copy()
+        try:
+            msg = decompressor.decompress(packed[offset:], limit)
+        except zlib.error as ex:
+            raise ValueError(str(ex))
+        if decompressor.unconsumed_tail:
+            raise ValueError("Decompressed size exceeds {0}".format(limit))
+        return msg
+
+def defined(packed):
+    '''
+    Returns dictionary version defined by packed if zdef kind else None
+    '''
+    if len(packed) >= 2 and ord(packed[0]) == raeting.zipKinds.zdef:
+        return ord(packed[1])
+    return None